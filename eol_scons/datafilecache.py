@@ -54,10 +54,201 @@ away when the source tree is removed.  Other possibilities are to use a
 common directory like $HOME/.datafilecache, something more obvious or
 conventional like $HOME/Data/cache, or at least allow the cache directory
 to be overridden with an environment variable.
+
+If the remote prefix is a http:// or https:// URL, files are downloaded
+in-process by a HttpFetcher rather than by spawning a download command for
+each file.  The fetcher keeps one persistent connection per host, resumes
+partial downloads, and makes conditional requests for files which already
+exist in the cache, so an unchanged file costs a single 304 response.
 """
 
 import subprocess as sp
 import os
+import shutil
+import threading
+import http.client
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlsplit, urljoin
+
+from eol_scons.utils import clone_file, copy_file, reflinks_supported
+
+# Ways a locally visible master file can be materialized in the cache.
+MATERIALIZE_POLICIES = ('auto', 'symlink', 'hardlink', 'reflink', 'copy')
+
+
+class HttpFetcher(object):
+    """
+    Download URLs into local files over persistent HTTP/1.1 connections.
+
+    Connections are kept open per (scheme, host) and per thread, since SCons
+    may run several download actions at once in parallel builds and
+    http.client connections cannot be shared between threads.
+
+    The body is streamed to a temporary file next to the destination, named
+    with a '.part' suffix, which is renamed over the destination only once
+    the transfer completes.  If a '.part' file is left over from an
+    interrupted transfer, the download resumes with a Range request.  When
+    the destination already exists, the request includes If-Modified-Since
+    with the file's modification time and If-None-Match with the ETag saved
+    from the previous download, if any.  The ETag is kept in a file next to
+    the destination with an '.etag' suffix.  Like curl --remote-time, the
+    modification time of the downloaded file is set from Last-Modified.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+    MAX_REDIRECTS = 10
+    REDIRECTS = (301, 302, 303, 307, 308)
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self._local = threading.local()
+        # The status of the last response received, mostly for testing.
+        self.last_status = None
+
+    def _connections(self):
+        conns = getattr(self._local, 'connections', None)
+        if conns is None:
+            conns = {}
+            self._local.connections = conns
+        return conns
+
+    def _connection(self, scheme, netloc):
+        conns = self._connections()
+        conn = conns.get((scheme, netloc))
+        if conn is None:
+            if scheme == 'https':
+                conn = http.client.HTTPSConnection(netloc,
+                                                   timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(netloc,
+                                                  timeout=self.timeout)
+            conns[(scheme, netloc)] = conn
+        return conn
+
+    def close(self):
+        "Close all the connections opened by the calling thread."
+        conns = self._connections()
+        for conn in conns.values():
+            conn.close()
+        conns.clear()
+
+    def _get(self, conn, path, headers):
+        # A server may close an idle persistent connection at any time, so
+        # if the request fails on a connection which was already open, try
+        # again once on a fresh connection.
+        reused = conn.sock is not None
+        try:
+            conn.request('GET', path, headers=headers)
+            return conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError,
+                BrokenPipeError, http.client.CannotSendRequest,
+                http.client.ResponseNotReady):
+            conn.close()
+            if not reused:
+                raise
+        conn.request('GET', path, headers=headers)
+        return conn.getresponse()
+
+    def _request(self, url, headers):
+        """
+        Send a GET request for @p url, following redirects, and return the
+        final response.
+        """
+        for _ in range(self.MAX_REDIRECTS):
+            parts = urlsplit(url)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+            conn = self._connection(parts.scheme, parts.netloc)
+            response = self._get(conn, path, headers)
+            if response.status not in self.REDIRECTS:
+                return response
+            location = response.getheader('Location')
+            # Drain the body so the connection can be reused.
+            response.read()
+            if not location:
+                return response
+            url = urljoin(url, location)
+        raise http.client.HTTPException("Too many redirects: %s" % (url))
+
+    def fetch(self, url, destpath):
+        """
+        Download @p url to @p destpath, returning destpath if the file is
+        now current and None if the download failed.
+        """
+        partpath = destpath + '.part'
+        etagpath = destpath + '.etag'
+        etag = None
+        if os.path.exists(etagpath):
+            with open(etagpath) as ef:
+                etag = ef.read().strip() or None
+        headers = {}
+        offset = 0
+        if os.path.exists(partpath):
+            # Resume the interrupted transfer, but only if the remote file
+            # has not changed since, as identified by the ETag or else the
+            # Last-Modified time which was applied to the partial file.
+            offset = os.path.getsize(partpath)
+            if offset:
+                headers['Range'] = 'bytes=%d-' % (offset)
+                headers['If-Range'] = etag or formatdate(
+                    os.path.getmtime(partpath), usegmt=True)
+        elif os.path.exists(destpath):
+            headers['If-Modified-Since'] = formatdate(
+                os.path.getmtime(destpath), usegmt=True)
+            if etag:
+                headers['If-None-Match'] = etag
+        try:
+            response = self._request(url, headers)
+            self.last_status = response.status
+            if response.status == 304:
+                response.read()
+                print("Not modified: %s" % (url))
+                return destpath
+            if response.status == 416 and offset:
+                # The partial file cannot be resumed, so start over.
+                response.read()
+                os.unlink(partpath)
+                return self.fetch(url, destpath)
+            if response.status not in (200, 206):
+                response.read()
+                print("*** HTTP %d %s: %s" %
+                      (response.status, response.reason, url))
+                return None
+            self._receive(response, partpath, etagpath,
+                          response.status == 206)
+        except (http.client.HTTPException, OSError) as ex:
+            print("*** HTTP download failed: %s: %s" % (url, ex))
+            self.close()
+            return None
+        os.replace(partpath, destpath)
+        return destpath
+
+    def _receive(self, response, partpath, etagpath, append):
+        etag = response.getheader('ETag')
+        if etag:
+            with open(etagpath, 'w') as ef:
+                ef.write(etag)
+        elif os.path.exists(etagpath):
+            os.unlink(etagpath)
+        mtime = None
+        lastmod = response.getheader('Last-Modified')
+        if lastmod:
+            try:
+                mtime = parsedate_to_datetime(lastmod).timestamp()
+            except (TypeError, ValueError):
+                mtime = None
+        with open(partpath, 'ab' if append else 'wb') as pf:
+            # Set the remote time right away, so an interrupted transfer
+            # can be resumed with the Last-Modified time as the validator.
+            if mtime is not None:
+                os.utime(partpath, (mtime, mtime))
+            chunk = response.read(self.CHUNK_SIZE)
+            while chunk:
+                pf.write(chunk)
+                chunk = response.read(self.CHUNK_SIZE)
+        if mtime is not None:
+            os.utime(partpath, (mtime, mtime))
 
 
 class DataFileCache(object):
@@ -72,12 +263,19 @@ class DataFileCache(object):
         if cachepath:
             self._cachepaths = [cachepath]
         self._cached_paths = {}
+        # Directory listings read so far from the cache directories, mapping
+        # each directory path to the set of names in it, or None if it is
+        # not a directory.
+        self._listings = {}
         self._enable_download = True
         # full rsync command last run
         self.rsync_command = None
-        self.curl_command = None
+        # url last requested over http
+        self.http_url = None
+        self._fetcher = None
         # echo rsync command instead of executing it
         self.echo = False
+        self._materialize = 'auto'
 
     def getCachePath(self):
         "Return the current cache path list."
@@ -113,6 +311,26 @@ class DataFileCache(object):
     # Backwards compatible but deprecated method.
     setPrefix = setRemotePrefix
 
+    def setMaterializePolicy(self, policy):
+        """
+        Set how master files which are visible on the local filesystem are
+        placed into the cache: one of 'symlink', 'hardlink', 'reflink',
+        'copy', or 'auto'.  The default is 'auto', which clones the file
+        with a reflink when the master is on the same filesystem as the
+        cache and the filesystem supports it, and otherwise copies it, so
+        that reads come from local disk instead of across a network
+        filesystem.  Since a hard link shares the master file, writes
+        through it modify the master, so 'hardlink' is never chosen
+        automatically.
+        """
+        if policy not in MATERIALIZE_POLICIES:
+            raise Exception("Unknown data file materialize policy: %s" %
+                            (policy))
+        self._materialize = policy
+
+    def getMaterializePolicy(self):
+        return self._materialize
+
     def sync(self):
         """
         Sync all the files known about in the cache map.  Since this is
@@ -127,6 +345,75 @@ class DataFileCache(object):
                 ok = False
         return ok
 
+    def refreshIndex(self):
+        """
+        Forget the directory listings cached from the cache directories, so
+        subsequent lookups see files added or removed outside of this
+        DataFileCache.  Files already registered keep their local paths.
+        """
+        self._listings.clear()
+
+    def _listdir(self, path):
+        """
+        Return a (names, links) pair of sets for directory @p path, where
+        @p links holds the names which are symlinks not yet known to
+        resolve, or None if @p path is not a directory.  The directory is
+        read only the first time, and symlinks are not followed, so a cache
+        of symlinks to masters on a network filesystem can be indexed
+        without a stat of each master.
+        """
+        if path in self._listings:
+            return self._listings[path]
+        listing = None
+        try:
+            with os.scandir(path) as it:
+                names = set()
+                links = set()
+                for entry in it:
+                    names.add(entry.name)
+                    if entry.is_symlink():
+                        links.add(entry.name)
+                listing = (names, links)
+        except OSError:
+            pass
+        self._listings[path] = listing
+        return listing
+
+    def _exists(self, cdir, filepath):
+        """
+        Return True if relative @p filepath exists under cache directory
+        @p cdir, using the cached directory listings instead of a stat.
+        Only a symlink in the path is checked, the first time it is found,
+        and a broken symlink does not exist as far as os.path.exists() is
+        concerned.
+        """
+        parts = os.path.normpath(filepath).split(os.sep)
+        if os.path.isabs(filepath) or parts[0] == os.pardir:
+            return os.path.exists(os.path.join(cdir, filepath))
+        path = cdir
+        for name in parts:
+            listing = self._listdir(path)
+            if listing is None or name not in listing[0]:
+                return False
+            path = os.path.join(path, name)
+            names, links = listing
+            if name in links:
+                links.discard(name)
+                if not os.path.exists(path):
+                    names.discard(name)
+                    return False
+        return True
+
+    def _forget(self, path):
+        "Drop the cached listings of the directories containing @p path."
+        path = os.path.dirname(path)
+        while path and path not in ('/', os.curdir):
+            self._listings.pop(path, None)
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+
     def enableDownload(self, enable):
         self._enable_download = enable
 
@@ -143,11 +430,11 @@ class DataFileCache(object):
         If the file exists locally at the master path (ie, with any
         hostname specifier stripped), assume that's the source data file
         and that we're running on the data host itself or else the file is
-        mounted here.  If so, symbolically link the file into the cache.
-        We want to be careful not to do anything that might expose the data
-        file to accidental modification, so that's why it is not just used
-        in place.  Actually copying the file into the cache would be safer
-        still, but for now I'll consider a link to be safe enough.
+        mounted here.  If so, materialize the file in the cache according
+        to the policy set with setMaterializePolicy().  We want to be
+        careful not to do anything that might expose the data file to
+        accidental modification, so that's why it is not just used in
+        place.
 
         Stripping the hostname when the file already exists locally helps
         the data cache work in batch operations like jenkins when it is not
@@ -164,6 +451,7 @@ class DataFileCache(object):
                 self._remote_prefix.startswith('https://'))
         if not os.path.isdir(destdir):
             os.makedirs(destdir)
+        self._forget(destpath)
         filepath = os.path.join(self._remote_prefix, filepath)
         (host, colon, lpath) = filepath.partition(':')
         if not http and colon and os.path.exists(lpath):
@@ -175,7 +463,7 @@ class DataFileCache(object):
         # no host specifier but the source file does not exist, in which
         # case we fail saying just that.
         if http:
-            destpath = self._curl(filepath, destpath)
+            destpath = self._http(filepath, destpath)
         elif colon:
             destpath = self._rsync(filepath, destpath)
         elif not os.path.exists(filepath):
@@ -199,37 +487,131 @@ class DataFileCache(object):
             print("*** rsync failed to download: %s" % (filepath))
         return None
 
-    def _curl(self, filepath, destpath):
-        args = ['curl', '--remote-time', '-C', '-', '--output', destpath,
-                '-L', filepath]
-        self.curl_command = " ".join(args)
-        print(self.curl_command)
+    def getHttpFetcher(self):
+        "Return the HttpFetcher used for http downloads, creating it first."
+        if not self._fetcher:
+            self._fetcher = HttpFetcher()
+        return self._fetcher
+
+    def _http(self, filepath, destpath):
+        self.http_url = filepath
+        print("GET %s -> %s" % (filepath, destpath))
         if not self.echo:
-            retcode = sp.call(args, shell=False)
-            if retcode == 0 and os.path.isfile(destpath):
+            if self.getHttpFetcher().fetch(filepath, destpath):
                 return destpath
-            print("*** curl failed to download: %s" % (filepath))
+            print("*** http failed to download: %s" % (filepath))
         return None
 
     def _link(self, filepath, destpath):
-        # See if link exists and is already correct.
+        policy = self._materialize
+        if policy == 'auto':
+            policy = self._auto_policy(filepath, destpath)
+        # See if the cache entry already exists and is current.
         if os.path.islink(destpath):
-            if os.path.realpath(destpath) == os.path.realpath(filepath):
+            if (policy == 'symlink' and
+                    os.path.realpath(destpath) == os.path.realpath(filepath)):
                 print("Link already exists: %s" % (destpath))
                 return destpath
             print("Removing and fixing link: %s" % (destpath))
             os.unlink(destpath)
+        elif os.path.isfile(destpath) and policy != 'symlink':
+            if self._is_current(filepath, destpath):
+                print("File already exists: %s" % (destpath))
+                return destpath
+            print("Replacing out of date file: %s" % (destpath))
+        elif (os.path.isfile(destpath) and
+              not os.path.samefile(filepath, destpath) and
+              self._is_current(filepath, destpath)):
+            # A current copy left by another policy is safe to replace with a
+            # link, but not the master itself or a file which is not a copy.
+            print("Replacing file with link: %s" % (destpath))
+            os.unlink(destpath)
         elif os.path.exists(destpath):
-            # Entry is not a link.  Do not remove it automatically in case
-            # it's important.
+            # Entry is not what is expected.  Do not remove it automatically
+            # in case it's important.
             print("*** File exists where link needs to be created: %s ***" %
                   (destpath))
             return None
-        # Create the link.
+        # Under the auto policy, fall back to a copy if the filesystem does
+        # not support reflinks, like ext4.  A hard link would share the
+        # master, so it is only used when chosen explicitly.
+        policies = [policy]
+        if self._materialize == 'auto' and policy == 'reflink':
+            policies = ['reflink', 'copy']
+        materialize = {'symlink': self._symlink,
+                       'hardlink': self._hardlink,
+                       'reflink': self._reflink,
+                       'copy': self._copy}
+        error = None
+        for policy in policies:
+            try:
+                return materialize[policy](filepath, destpath)
+            except OSError as ex:
+                error = ex
+        print("*** Failed to %s %s to %s: %s" %
+              (policy, filepath, destpath, error))
+        return None
+
+    def _auto_policy(self, filepath, destpath):
+        """
+        Choose the materialize policy for 'auto': reflink (with fallback to
+        copy) when the master is on the same filesystem as the cache
+        directory, otherwise copy.
+        """
+        try:
+            srcdev = os.stat(filepath).st_dev
+            destdev = os.stat(os.path.dirname(destpath)).st_dev
+        except OSError:
+            return 'symlink'
+        return 'reflink' if srcdev == destdev else 'copy'
+
+    def _is_current(self, filepath, destpath):
+        src = os.stat(filepath)
+        dest = os.stat(destpath)
+        if (src.st_dev, src.st_ino) == (dest.st_dev, dest.st_ino):
+            return True
+        # Copies and reflinks keep the modification time of the master.
+        return (src.st_size == dest.st_size and
+                int(src.st_mtime) == int(dest.st_mtime))
+
+    def _symlink(self, filepath, destpath):
         print("ln -s %s %s" % (filepath, destpath))
         os.symlink(filepath, destpath)
         return destpath
 
+    def _hardlink(self, filepath, destpath):
+        print("ln %s %s" % (filepath, destpath))
+        tmppath = destpath + '.tmp'
+        if os.path.lexists(tmppath):
+            os.unlink(tmppath)
+        os.link(filepath, tmppath)
+        os.replace(tmppath, destpath)
+        return destpath
+
+    def _reflink(self, filepath, destpath):
+        if not reflinks_supported():
+            raise OSError("reflinks are not supported on this platform")
+        print("cp --reflink %s %s" % (filepath, destpath))
+        return self._write_copy(filepath, destpath, clone_file)
+
+    def _copy(self, filepath, destpath):
+        print("cp -p %s %s" % (filepath, destpath))
+        return self._write_copy(filepath, destpath, copy_file)
+
+    def _write_copy(self, filepath, destpath, copier):
+        # Write to a temporary file and rename it, so an interrupted copy
+        # never looks like a complete file in the cache.
+        tmppath = destpath + '.tmp'
+        try:
+            with open(filepath, 'rb') as src, open(tmppath, 'wb') as dest:
+                copier(src, dest)
+            shutil.copystat(filepath, tmppath)
+            os.replace(tmppath, destpath)
+        finally:
+            if os.path.exists(tmppath):
+                os.unlink(tmppath)
+        return destpath
+
     def getFile(self, filepath):
         """
         Convert the canonical filepath to the local cache path, without trying
@@ -244,7 +626,7 @@ class DataFileCache(object):
         """
         cpaths = self.expandedCachePaths()
         for cdir in cpaths:
-            if os.path.exists(cdir):
+            if self._listdir(cdir) is not None:
                 return cdir
             else:
                 print("skipped non-existent local cache dir: %s" % (cdir))
@@ -269,13 +651,18 @@ class DataFileCache(object):
 
         Files are registered using the relative filepath, and that maps to
         the full path within a data file cache directory.
+
+        The cache directories are searched through listings which are read
+        once per directory and then kept in memory, so registering many
+        files does not stat every file under every cache directory.  Call
+        refreshIndex() if the cache directories change outside of this
+        instance.
         """
         path = self._cached_paths.get(filepath)
         if not path:
             for cdir in self.expandedCachePaths():
-                tpath = os.path.join(cdir, filepath)
-                if os.path.exists(tpath):
-                    path = tpath
+                if self._exists(cdir, filepath):
+                    path = os.path.join(cdir, filepath)
                     break
             if not path:
                 path = os.path.join(self.localDownloadPath(), filepath)
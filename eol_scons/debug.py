@@ -54,7 +54,7 @@ Include a tool name to enable extra debugging in that tool, if it supports it, e
 
 # A list of tools which have extra debugging, so they should not be
 # treated as variables to dump when in the debug key list.
-_debug_tools = ['doxygen', 'parseconfig']
+_debug_tools = ['doxygen', 'parseconfig', 'gitinfo']
 
 
 def Watches(env: Environment):
@@ -0,0 +1,217 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+"""
+Support for the distcompile tool: a spawner which limits how many local
+commands run at once while compiles are dispatched to remote workers, and a
+loopback stand-in for a distcc-style launcher.
+
+The loopback launcher works like distcc in its plain mode: the source is
+preprocessed locally, then the preprocessed source is compiled by a
+"worker" in a private temporary directory with no include or define
+options, and the object is copied back.  Run this module as a script with
+the compile command as arguments:
+
+    python distcompile.py g++ -o x.o -c -Iinclude x.cc
+
+Commands which are not single compiles, like links, are run unchanged.  The
+-j option prints the number of worker slots, like distcc -j, which is the
+number of slots in DISTCC_HOSTS entries like localhost/4, or else the
+number of processors.
+"""
+
+import contextlib
+import os
+import re
+import shlex
+import shutil
+import subprocess as sp
+import sys
+import tempfile
+import threading
+
+
+class LocalPool:
+    """
+    A limit of @p local_jobs commands running at once on the build host.
+    A thread which holds a slot does not wait for another one, so a Python
+    action may run commands of its own.
+    """
+
+    def __init__(self, local_jobs):
+        self.local_jobs = local_jobs
+        self._slots = threading.BoundedSemaphore(local_jobs)
+        self._held = threading.local()
+
+    @contextlib.contextmanager
+    def slot(self):
+        "Hold a local slot while the context runs."
+        if getattr(self._held, 'slot', False):
+            yield
+            return
+        with self._slots:
+            self._held.slot = True
+            try:
+                yield
+            finally:
+                self._held.slot = False
+
+
+class LocalPoolSpawner:
+    """
+    Spawn commands through @p spawn, but let at most @p local_jobs commands
+    run at once unless they start with one of the @p distributed command
+    prefixes.  Assign an instance to SPAWN so scons can run many remote
+    compiles in parallel without also running that many links or other
+    local commands.  Pass a LocalPool in @p pool to share the limit between
+    the spawners of several environments.
+    """
+
+    def __init__(self, spawn, local_jobs, distributed, pool=None):
+        self.spawn = spawn
+        self.distributed = [shlex.split(prefix) for prefix in distributed
+                            if prefix]
+        self.pool = pool or LocalPool(local_jobs)
+
+    def is_distributed(self, args):
+        # The arguments have been escaped for the shell, and a launcher
+        # path with spaces may have been split into several of them.
+        try:
+            words = shlex.split(" ".join(args))
+        except ValueError:
+            words = [_unquote(arg) for arg in args]
+        for prefix in self.distributed:
+            if words[:len(prefix)] == prefix:
+                return True
+        return False
+
+    def __call__(self, sh, escape, cmd, args, env):
+        if self.is_distributed(args):
+            return self.spawn(sh, escape, cmd, args, env)
+        with self.pool.slot():
+            return self.spawn(sh, escape, cmd, args, env)
+
+
+def _unquote(arg):
+    "Remove the quotes scons adds around arguments with spaces."
+    if len(arg) > 1 and arg[0] == arg[-1] and arg[0] in '"\'':
+        return arg[1:-1]
+    return arg
+
+
+def host_slots(hosts):
+    """
+    Return the total number of slots in a DISTCC_HOSTS string, where each
+    host can be suffixed with /N for N slots, and otherwise has 2.  Return 0
+    if there are no hosts.
+    """
+    slots = 0
+    for host in hosts.split():
+        if host.startswith('-') or host.startswith('#'):
+            continue
+        match = re.search(r'/(\d+)', host)
+        slots += int(match.group(1)) if match else 2
+    return slots
+
+
+_c_suffixes = ['.c']
+_cxx_suffixes = ['.cpp', '.cc', '.cxx', '.c++', '.C']
+
+# Options which only matter to the preprocessor, and whether they take a
+# separate argument.
+_preprocess_options = {'-I': True, '-D': True, '-U': True,
+                       '-include': True, '-isystem': True,
+                       '-iquote': True, '-idirafter': True,
+                       '-MF': True, '-MT': True, '-MQ': True,
+                       '-MD': False, '-MMD': False, '-MP': False,
+                       '-Winvalid-pch': False}
+
+
+def split_compile(args):
+    """
+    Split the compiler command @p args into the commands to preprocess the
+    source and to compile the preprocessed source.  Return a tuple of the
+    preprocess arguments without output options, the compile arguments
+    without the source and output, the source, and the output, or None if
+    the command is not a single compile of a C or C++ source.
+    """
+    if '-c' not in args or '-E' in args or '-S' in args:
+        return None
+    preprocess = [args[0]]
+    compile = [args[0]]
+    sources = []
+    output = None
+    i = 1
+    while i < len(args):
+        arg = args[i]
+        if arg == '-o':
+            if i + 1 >= len(args) or output:
+                return None
+            output = args[i + 1]
+            i += 2
+            continue
+        if arg == '-c':
+            i += 1
+            continue
+        option = None
+        for opt, separate in _preprocess_options.items():
+            if arg == opt or (separate and len(opt) == 2 and
+                              arg.startswith(opt)):
+                option = (opt, separate and arg == opt)
+                break
+        if option:
+            count = 2 if option[1] else 1
+            preprocess.extend(args[i:i + count])
+            i += count
+            continue
+        if not arg.startswith('-') and \
+                os.path.splitext(arg)[1] in _c_suffixes + _cxx_suffixes:
+            sources.append(arg)
+        else:
+            preprocess.append(arg)
+            compile.append(arg)
+        i += 1
+    if len(sources) != 1 or not output:
+        return None
+    return preprocess, compile, sources[0], output
+
+
+def loopback_compile(args):
+    """
+    Preprocess the compile command @p args locally, compile the result in a
+    temporary directory standing in for a remote worker, and copy the
+    object to the output.  Return the exit status.
+    """
+    parts = split_compile(args)
+    if parts is None:
+        return sp.call(args)
+    preprocess, compile, source, output = parts
+    ext = '.ii' if os.path.splitext(source)[1] in _cxx_suffixes else '.i'
+    workdir = tempfile.mkdtemp(prefix='distcompile-')
+    try:
+        ifile = os.path.join(workdir, 'source' + ext)
+        status = sp.call(preprocess + ['-E', source, '-o', ifile])
+        if status:
+            return status
+        # The worker only sees the preprocessed source.
+        status = sp.call(compile + ['-c', 'source' + ext, '-o', 'source.o'],
+                         cwd=workdir)
+        if status:
+            return status
+        shutil.copyfile(os.path.join(workdir, 'source.o'), output)
+        return 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv):
+    if argv[1:] == ['-j']:
+        slots = host_slots(os.environ.get('DISTCC_HOSTS', ''))
+        print(slots or os.cpu_count() or 1)
+        return 0
+    return loopback_compile(argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -45,10 +45,19 @@ Example generated header file text:
     #endif
 
 Notes:
-Git commands are used to extract the information.
+Where possible the information is read directly from the files in the git
+directory: HEAD, the refs and packed-refs, and the config.  The tag, commit
+count, and commit date come from a single git log command, and the result
+is cached in a file in the git directory, keyed on the HEAD commit and the
+tag refs, so it only needs to be run again when either changes.  Git
+commands are used for anything which cannot be read directly.
 """
 
+import os
 import re
+import json
+import time
+import threading
 import subprocess as sp
 from pathlib import Path
 
@@ -62,6 +71,185 @@ def pdebug(msg):
         print(msg)
 
 
+_SHA1 = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+
+# The name of the file in the git directory which caches the describe and
+# log results for the HEAD commit.
+CACHE_FILE = "eol_scons_gitinfo.json"
+
+# Options which can be combined to make the dirty check faster on large
+# working trees.  See GitInfo.
+DIRTY_CHECKS = ['tracked', 'cached', 'workdir']
+
+
+class GitRepo:
+    """
+    Read repository details directly from the files in a git directory,
+    without running git.  Methods return None when the answer cannot be
+    read directly, such as for reftable repositories or configs with
+    includes, so that callers can fall back to running git.
+    """
+
+    def __init__(self, gitdir, workdir):
+        self.gitdir = gitdir
+        self.workdir = workdir
+        # Linked worktrees keep their HEAD and index in their own git
+        # directory but share the refs and config in the common directory.
+        self.commondir = gitdir
+        commondir = os.path.join(gitdir, 'commondir')
+        if os.path.isfile(commondir):
+            with open(commondir) as cf:
+                self.commondir = os.path.normpath(
+                    os.path.join(gitdir, cf.read().strip()))
+
+    @classmethod
+    def find(cls, path=None):
+        """
+        Search up from @p path for the git directory like git does and
+        return a GitRepo, or None if not found or if GIT_DIR is set.
+        """
+        if 'GIT_DIR' in os.environ or 'GIT_WORK_TREE' in os.environ:
+            return None
+        path = os.path.realpath(str(path) if path else os.getcwd())
+        while True:
+            dotgit = os.path.join(path, '.git')
+            if os.path.isdir(dotgit):
+                return cls(dotgit, path)
+            if os.path.isfile(dotgit):
+                # a gitfile, as in submodules and linked worktrees
+                with open(dotgit) as gf:
+                    line = gf.read().strip()
+                if not line.startswith('gitdir:'):
+                    return None
+                gitdir = os.path.join(path, line[len('gitdir:'):].strip())
+                return cls(os.path.normpath(gitdir), path)
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+    def _read(self, *parts):
+        try:
+            with open(os.path.join(*parts)) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def packed_refs(self):
+        refs = {}
+        text = self._read(self.commondir, 'packed-refs') or ''
+        for line in text.splitlines():
+            if line.startswith('#') or line.startswith('^'):
+                continue
+            fields = line.split(' ', 1)
+            if len(fields) == 2:
+                refs[fields[1]] = fields[0]
+        return refs
+
+    def resolve_ref(self, ref, depth=0):
+        "Return the object name for @p ref, following symbolic refs."
+        if depth > 5:
+            return None
+        base = self.gitdir
+        if ref.startswith('refs/') and not ref.startswith('refs/bisect'):
+            base = self.commondir
+        text = self._read(base, ref)
+        if text is None:
+            return self.packed_refs().get(ref)
+        text = text.strip()
+        if text.startswith('ref:'):
+            return self.resolve_ref(text[4:].strip(), depth + 1)
+        return text if _SHA1.match(text) else None
+
+    def head(self):
+        """
+        Return a tuple (branch, hash) for HEAD.  The branch is 'HEAD' when
+        detached, like git rev-parse --abbrev-ref HEAD.
+        """
+        text = self._read(self.gitdir, 'HEAD')
+        if text is None:
+            return None, None
+        text = text.strip()
+        branch = 'HEAD'
+        if text.startswith('ref:'):
+            ref = text[4:].strip()
+            if not ref.startswith('refs/heads/'):
+                return None, None
+            branch = ref[len('refs/heads/'):]
+            return branch, self.resolve_ref(ref)
+        return branch, (text if _SHA1.match(text) else None)
+
+    def tags_signature(self):
+        """
+        Return a string which changes whenever a tag is added, removed, or
+        changed, from the modification times of the loose tag refs and the
+        packed-refs file.
+        """
+        stamps = []
+        tagdir = os.path.join(self.commondir, 'refs', 'tags')
+        for dirpath, dirnames, filenames in os.walk(tagdir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stamps.append("%s:%d" % (os.path.relpath(path, tagdir),
+                                             os.stat(path).st_mtime_ns))
+                except OSError:
+                    pass
+        try:
+            st = os.stat(os.path.join(self.commondir, 'packed-refs'))
+            stamps.append("packed-refs:%d:%d" % (st.st_mtime_ns, st.st_size))
+        except OSError:
+            pass
+        return ",".join(sorted(stamps))
+
+    def config(self):
+        """
+        Return a dictionary of the simple config settings, keyed by tuples
+        of (section, subsection, key), like ('remote', 'origin', 'url').
+        Section and key names are lower case.  Return None if the config
+        cannot be read or uses includes.
+        """
+        text = self._read(self.commondir, 'config')
+        if text is None:
+            return None
+        config = {}
+        current = None
+        rxsection = re.compile(r'^\[\s*([^\s\]"]+)(?:\s+"(.*)")?\s*\]')
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or line[0] in '#;':
+                continue
+            rx = rxsection.match(line)
+            if rx:
+                current = (rx.group(1).lower(), rx.group(2))
+                if current[0] in ('include', 'includeif'):
+                    return None
+                continue
+            if current and '=' in line:
+                k, v = line.split('=', 1)
+                v = v.strip()
+                if len(v) > 1 and v[0] == '"' and v[-1] == '"':
+                    v = v[1:-1]
+                config[current + (k.strip().lower(),)] = v
+        return config
+
+    def load_cache(self):
+        text = self._read(self.gitdir, CACHE_FILE)
+        try:
+            return json.loads(text) if text else {}
+        except ValueError:
+            return {}
+
+    def save_cache(self, cache):
+        path = os.path.join(self.gitdir, CACHE_FILE)
+        try:
+            with open(path + '.tmp', 'w') as cf:
+                json.dump(cache, cf)
+            os.replace(path + '.tmp', path)
+        except OSError as ex:
+            pdebug("gitinfo: could not write %s: %s" % (path, ex))
+
+
 class GitInfo:
     """
     Encapsulate the repository characteristics, making them available via a
@@ -98,6 +286,37 @@ class GitInfo:
       stored in the REPO_DIRTY key.  If this is not empty, then the git
       revision will have the suffix 'M'.
 
+    When the git directory can be read directly (see GitRepo), the URL,
+    branch, hash, and top directory are read from its files instead, and
+    the describe and log commands are replaced by a single command:
+
+    git log -1 --pretty=format:%cd%n%H%n%(describe:match=[vV][0-9]*):
+
+      Get the date, hash, and describe output for the last commit.  The
+      result is saved in the git directory keyed on the HEAD commit and the
+      tag refs, and the command is only run when they change.  The status
+      command is always run, since working tree changes do not show up in
+      any of the git files.
+
+    On large working trees git status can take a long time, mostly to look
+    for untracked files.  The GIT_DIRTY_CHECK setting is a list of options
+    (or a comma-separated string) to make it faster:
+
+    tracked:
+      Only look for modified tracked files, with --untracked-files=no.
+
+    cached:
+      Enable git's untracked cache and the builtin fsmonitor daemon, where
+      supported, with core.untrackedCache and core.fsmonitor.  The first run
+      populates the caches and later runs only stat changed directories.
+
+    workdir:
+      Only check files under the working directory given to GitInfo, rather
+      than the whole repository.
+
+    The time taken by each git command is recorded in the timings member,
+    and dumpTimings() prints them.
+
     The following keys are available. If the details are not available, the
     value will be None.  Values of None are translated as 'unknown' in
     generated header files.
@@ -164,6 +383,21 @@ class GitInfo:
             env = {}
         self.gitcmd = env.get('GIT', 'git')
         self.match = env.get('GIT_DESCRIBE_MATCH', '[vV][0-9]*')
+        self.dirty_check = env.get('GIT_DIRTY_CHECK', [])
+        if isinstance(self.dirty_check, str):
+            self.dirty_check = [c.strip() for c in
+                                self.dirty_check.split(',')]
+        if 'all' in self.dirty_check:
+            self.dirty_check = DIRTY_CHECKS
+        self.dirty_check = [c for c in self.dirty_check
+                            if c and c != 'none']
+        for check in self.dirty_check:
+            if check not in DIRTY_CHECKS:
+                raise ValueError("unknown GIT_DIRTY_CHECK option: %s" %
+                                 (check))
+        # Seconds taken by each git command run, keyed by the git
+        # subcommand name.
+        self.timings = {}
         self.repopath = repopath
         # If loaded from a header file, this is the path to that file.
         self.header = None
@@ -187,9 +421,13 @@ class GitInfo:
         output = ()
         try:
             pdebug("gitinfo: running '%s'" % (" ".join(cmd)))
+            start = time.time()
             child = sp.Popen(cmd, stdout=sp.PIPE, stderr=sp.PIPE,
                              cwd=self.repopath)
             output = child.communicate()
+            subcmd = [c for c in cmd[1:] if c != '-c' and '=' not in c][0]
+            self.timings[subcmd] = (self.timings.get(subcmd, 0) +
+                                    time.time() - start)
             sout = output[0].decode().strip()
             eout = output[1].decode().strip()
             pdebug("gitinfo output: %s" % (sout))
@@ -218,14 +456,176 @@ class GitInfo:
             return False
         return True
 
+    # Describe and log results for each git directory, keyed on the HEAD
+    # commit and tags, so every workdir in the same repository shares them.
+    _commit_cache = {}
+    _commit_lock = threading.Lock()
+
+    def _parse_describe(self, cmd_out):
+        """
+        Split describe output into the tag and number of commits.  Extract
+        the hyphenated fields from right to left, in case the tag portion
+        itself contains hyphens.  Output without the commit count and object
+        name means the tag names the commit exactly.
+        """
+        rx = re.match(r"^(.+)-(\d+)-g[0-9a-f]+$", cmd_out)
+        if rx:
+            return rx.group(1), rx.group(2)
+        return cmd_out, '0'
+
+    def _commit_info(self, repo, githash):
+        """
+        Return a dictionary with the tag, commits, and date for the HEAD
+        commit @p githash, from the cache if the HEAD commit and tags have
+        not changed, otherwise from one git log command.
+        """
+        key = "%s|%s|%s" % (githash, self.match, repo.tags_signature())
+        with GitInfo._commit_lock:
+            cached = GitInfo._commit_cache.get(repo.gitdir)
+            if cached is None:
+                cached = repo.load_cache()
+            if cached.get('key') == key:
+                pdebug("gitinfo: using cached commit info for %s" % (key))
+                GitInfo._commit_cache[repo.gitdir] = cached
+                return cached
+        info = {'key': key, 'describe': None, 'date': None}
+        describe = ''
+        if ',' not in self.match and ')' not in self.match:
+            # commas and parentheses would end the placeholder option early
+            describe = '%(describe:match=' + self.match + ')'
+        cmd_out = self._get_output([self.gitcmd, 'log', '-1',
+                                    '--pretty=format:%cd%n%H%n' + describe])
+        if 'Git error:' in cmd_out:
+            return None
+        lines = cmd_out.split('\n') + ['', '']
+        if lines[1] != githash:
+            # HEAD moved since it was read, so do not cache anything.
+            return None
+        info['date'] = lines[0]
+        describe = lines[2]
+        if not describe or describe.startswith('%(describe'):
+            # git before 2.32 does not have the describe placeholder, and
+            # without a matching tag the describe command provides the
+            # error message.
+            describe = self._get_output([self.gitcmd, 'describe', '--long',
+                                         '--match', self.match])
+        info['describe'] = describe
+        with GitInfo._commit_lock:
+            GitInfo._commit_cache[repo.gitdir] = info
+            repo.save_cache(info)
+        return info
+
     def _git_info(self):
         """
-        Return a dictionary of repository information.
+        Return a dictionary of repository information, reading the git
+        directory directly where possible and otherwise running git
+        commands.
+        """
+        repo = GitRepo.find(self.repopath)
+        if repo is None:
+            return self._git_info_commands()
+        gitbranch, githash = repo.head()
+        if not githash:
+            return self._git_info_commands()
+        info = self._commit_info(repo, githash)
+        if info is None:
+            return self._git_info_commands()
+        error = []
+        gittag = None
+        gitcommits = None
+        if self._cmd_out_ok(info['describe'], error):
+            gittag, gitcommits = self._parse_describe(info['describe'])
+        giturl = None
+        config = repo.config()
+        if config is None:
+            cmd_out = self._get_output([self.gitcmd, 'config', '--get',
+                                        'remote.origin.url'])
+            if self._cmd_out_ok(cmd_out, error):
+                giturl = cmd_out
+        elif ('remote', 'origin', 'url') in config:
+            giturl = config[('remote', 'origin', 'url')]
+        else:
+            # git config fails without a message when the setting does not
+            # exist, so record the same error.
+            error.append("Git error: ")
+        if giturl is not None:
+            giturl = giturl.replace('\\', '/').strip()
+        gitworkdir = repo.workdir.replace('\\', '/')
+        gitdirty = self._git_dirty(error)
+        return self._make_dict(error, gittag, gitcommits, info['date'],
+                               githash, giturl, gitworkdir, gitbranch,
+                               gitdirty)
+
+    def _git_dirty(self, error):
+        "Return the list of modified and unknown files as a string."
+        gitdirty = None
+        cmd = [self.gitcmd]
+        if 'cached' in self.dirty_check:
+            cmd += ['-c', 'core.untrackedCache=true']
+            if self._fsmonitor_supported():
+                cmd += ['-c', 'core.fsmonitor=true']
+        cmd += ['status', '--porcelain']
+        if 'tracked' in self.dirty_check:
+            cmd += ['--untracked-files=no']
+        if 'workdir' in self.dirty_check:
+            cmd += ['--', '.']
+        cmd_out = self._get_output(cmd)
+        if self._cmd_out_ok(cmd_out, error):
+            gitdirty = ",".join(cmd_out.splitlines()).replace('"', '\\"')
+        return gitdirty
+
+    _fsmonitor = None
+
+    def _fsmonitor_supported(self):
+        """
+        The builtin fsmonitor daemon is only available in git 2.36 and
+        later on Windows and macOS, so check for it once.
+        """
+        if GitInfo._fsmonitor is None:
+            try:
+                child = sp.run([self.gitcmd, 'fsmonitor--daemon', 'status'],
+                               stdout=sp.PIPE, stderr=sp.PIPE,
+                               cwd=self.repopath)
+                err = child.stderr.decode()
+                GitInfo._fsmonitor = (child.returncode == 0 or
+                                      'not running' in err)
+            except OSError:
+                GitInfo._fsmonitor = False
+        return GitInfo._fsmonitor
+
+    def _make_dict(self, error, gittag, gitcommits, gitdate, githash,
+                   giturl, gitworkdir, gitbranch, gitdirty):
+        # Derive the revision string which describes the state of the current
+        # checkout.  If the current commit exactly matches a tag, then leave
+        # off the -0.  If the checkout is not clean, add the 'M' modifier.
+        gitrevision = gittag
+        if gittag and gitcommits != '0':
+            gitrevision = gittag + "-" + gitcommits
+        if gitrevision and gitdirty:
+            gitrevision += "M"
+
+        git_dict = {
+            'REPO_REVISION': gitrevision,
+            'REPO_DATE': gitdate,
+            'REPO_URL': giturl,
+            'REPO_WORKDIR': gitworkdir,
+            'REPO_ERROR': str(error) if error else '',
+            'REPO_TAG': gittag,
+            'REPO_COMMITS': gitcommits,
+            'REPO_HASH': githash,
+            'REPO_BRANCH': gitbranch,
+            'REPO_DIRTY': gitdirty
+        }
+        return git_dict
+
+    def _git_info_commands(self):
+        """
+        Return a dictionary of repository information by running git
+        commands for all of it.
         """
         error = []
 
         # Use the collected git details to populate the dicitionary items
-        gitrevision = None
         gitdate = None
         giturl = None
         gitworkdir = None
@@ -274,33 +674,9 @@ class GitInfo:
         if self._cmd_out_ok(cmd_out, error):
             gitbranch = cmd_out.strip()
 
-        gitdirty = None
-        cmd_out = self._get_output([self.gitcmd, 'status', '--porcelain'])
-        if self._cmd_out_ok(cmd_out, error):
-            gitdirty = ",".join(cmd_out.splitlines()).replace('"', '\\"')
-
-        # Derive the revision string which describes the state of the current
-        # checkout.  If the current commit exactly matches a tag, then leave
-        # off the -0.  If the checkout is not clean, add the 'M' modifier.
-        gitrevision = gittag
-        if gittag and gitcommits != '0':
-            gitrevision = gittag + "-" + gitcommits
-        if gitrevision and gitdirty:
-            gitrevision += "M"
-
-        git_dict = {
-            'REPO_REVISION': gitrevision,
-            'REPO_DATE': gitdate,
-            'REPO_URL': giturl,
-            'REPO_WORKDIR': gitworkdir,
-            'REPO_ERROR': str(error) if error else '',
-            'REPO_TAG': gittag,
-            'REPO_COMMITS': gitcommits,
-            'REPO_HASH': githash,
-            'REPO_BRANCH': gitbranch,
-            'REPO_DIRTY': gitdirty
-        }
-        return git_dict
+        gitdirty = self._git_dirty(error)
+        return self._make_dict(error, gittag, gitcommits, gitdate, githash,
+                               giturl, gitworkdir, gitbranch, gitdirty)
 
     def _set_values(self, gitdict):
         pdebug('GitInfo._set_values:')
@@ -394,18 +770,27 @@ class GitInfo:
             v = v if v is not None else 'unknown'
             print('%s="%s"' % (k, v))
 
+    def dumpTimings(self):
+        "Print the time taken by each git command."
+        for k, v in self.timings.items():
+            print("git %s: %.3f seconds" % (k, v))
+
 
 def main():
     import sys
     repopath = None
     if len(sys.argv) > 1:
         repopath = Path(sys.argv[1])
-    gitinfo = GitInfo()
+    env = {}
+    if len(sys.argv) > 2:
+        env['GIT_DIRTY_CHECK'] = sys.argv[2]
+    gitinfo = GitInfo(env)
     if repopath and repopath.is_file():
         gitinfo.loadFromHeader(repopath)
     else:
         gitinfo.getRepoInfo(repopath)
     gitinfo.dump()
+    gitinfo.dumpTimings()
     headertxt = gitinfo.generateHeader()
     print("\n%s" % (headertxt))
 
@@ -2,40 +2,340 @@
 #
 # This source code is licensed under the MIT license found in the LICENSE
 # file in the root directory of this source tree.
+"""
+Resolve the shared library dependencies of programs and libraries.
+
+Rather than running ldd on each file, the dynamic section of ELF files is
+read directly to get the DT_NEEDED, DT_RPATH, DT_RUNPATH and DT_SONAME
+entries, and the needed libraries are located using the same search rules
+as the glibc dynamic loader:
+
+  1. the DT_RPATH of the loading object and then of the objects which
+     loaded it, only if the loading object has no DT_RUNPATH
+  2. LD_LIBRARY_PATH
+  3. the DT_RUNPATH of the loading object
+  4. the directories listed in /etc/ld.so.conf
+  5. the default system library directories
+
+Parsed ELF files are memoized by path and modification time, and the
+resolved dependencies of each file are memoized for the whole build, so
+shared libraries common to many programs are only read once.  If a file
+cannot be parsed as ELF, then ldd is run on it instead.
+"""
 
 import subprocess as sp
+import os
 import re
+import glob
+import struct
 
-def ldd(node, env, names=None):
+# ELF header identification and dynamic section constants.
+_ELFMAG = b'\x7fELF'
+_ELFCLASS32 = 1
+_ELFCLASS64 = 2
+_ELFDATA2LSB = 1
+_PT_LOAD = 1
+_PT_DYNAMIC = 2
+_DT_NULL = 0
+_DT_NEEDED = 1
+_DT_STRTAB = 5
+_DT_SONAME = 14
+_DT_RPATH = 15
+_DT_RUNPATH = 29
+
+
+class ElfInfo(object):
     """
-    Return a map with the name of each shared library dependency and its
-    resolved location.  If a list of names is specified, then only include
-    the libraries matching those names.  Node is a scons file node for any
-    shared executable, including shared libraries.  Any matched
-    dependencies will themselves be searched for dependencies.
+    The dynamic linking information of an ELF file: the ELF class and
+    machine, which must match between a program and its libraries, and
+    lists of needed libraries, rpath and runpath directories, and the
+    soname, if any.
     """
+
+    def __init__(self, path):
+        self.path = path
+        self.elfclass = None
+        self.machine = None
+        self.needed = []
+        self.rpath = []
+        self.runpath = []
+        self.soname = None
+
+    def compatible(self, other):
+        "Return True if @p other could be loaded with this object."
+        return (self.elfclass == other.elfclass and
+                self.machine == other.machine)
+
+
+def _expand_dirs(value, origin, elfclass):
+    "Split a rpath or runpath string and substitute $ORIGIN and $LIB."
+    lib = 'lib64' if elfclass == _ELFCLASS64 else 'lib'
+    dirs = []
+    for d in value.split(':'):
+        if not d:
+            continue
+        d = d.replace('${ORIGIN}', origin).replace('$ORIGIN', origin)
+        d = d.replace('${LIB}', lib).replace('$LIB', lib)
+        dirs.append(d)
+    return dirs
+
+
+def read_elf(path):
+    """
+    Read the dynamic section of ELF file @p path and return an ElfInfo, or
+    None if the file is not an ELF file.  A static executable returns an
+    ElfInfo with no dependencies.
+    """
+    try:
+        with open(path, 'rb') as f:
+            ident = f.read(16)
+            if len(ident) < 16 or ident[:4] != _ELFMAG:
+                return None
+            elfclass = ident[4]
+            if elfclass not in (_ELFCLASS32, _ELFCLASS64):
+                return None
+            endian = '<' if ident[5] == _ELFDATA2LSB else '>'
+            info = ElfInfo(path)
+            info.elfclass = elfclass
+            if elfclass == _ELFCLASS64:
+                hdr = struct.unpack(endian + 'HHIQQQIHHHHHH', f.read(48))
+                phdr_fmt = endian + 'IIQQQQQQ'
+                dyn_fmt = endian + 'qQ'
+            else:
+                hdr = struct.unpack(endian + 'HHIIIIIHHHHHH', f.read(36))
+                phdr_fmt = endian + 'IIIIIIII'
+                dyn_fmt = endian + 'iI'
+            info.machine = hdr[1]
+            phoff, phentsize, phnum = hdr[4], hdr[8], hdr[9]
+            loads = []
+            dynamic = None
+            for i in range(phnum):
+                f.seek(phoff + i * phentsize)
+                ph = struct.unpack(phdr_fmt,
+                                   f.read(struct.calcsize(phdr_fmt)))
+                if elfclass == _ELFCLASS64:
+                    ptype, offset, vaddr, filesz = ph[0], ph[2], ph[3], ph[5]
+                else:
+                    ptype, offset, vaddr, filesz = ph[0], ph[1], ph[2], ph[4]
+                if ptype == _PT_LOAD:
+                    loads.append((vaddr, offset, filesz))
+                elif ptype == _PT_DYNAMIC:
+                    dynamic = (offset, filesz)
+            if dynamic is None:
+                return info
+            f.seek(dynamic[0])
+            data = f.read(dynamic[1])
+            entries = []
+            strtab = None
+            for tag, val in struct.iter_unpack(
+                    dyn_fmt, data[:len(data) - len(data) %
+                                  struct.calcsize(dyn_fmt)]):
+                if tag == _DT_NULL:
+                    break
+                if tag == _DT_STRTAB:
+                    strtab = val
+                entries.append((tag, val))
+            # DT_STRTAB is a virtual address, so map it to a file offset
+            # through the loadable segments.
+            stroff = None
+            for vaddr, offset, filesz in loads:
+                if strtab is not None and vaddr <= strtab < vaddr + filesz:
+                    stroff = strtab - vaddr + offset
+                    break
+            if stroff is None:
+                return info
+
+            def string(index):
+                f.seek(stroff + index)
+                chunk = f.read(4096)
+                return chunk[:chunk.find(b'\0')].decode('utf-8', 'replace')
+
+            origin = os.path.dirname(os.path.abspath(path))
+            for tag, val in entries:
+                if tag == _DT_NEEDED:
+                    info.needed.append(string(val))
+                elif tag == _DT_SONAME:
+                    info.soname = string(val)
+                elif tag == _DT_RPATH:
+                    info.rpath = _expand_dirs(string(val), origin, elfclass)
+                elif tag == _DT_RUNPATH:
+                    info.runpath = _expand_dirs(string(val), origin,
+                                                elfclass)
+            return info
+    except (OSError, struct.error):
+        return None
+
+
+_elf_cache = {}
+
+
+def elf_info(path):
+    """
+    Return the ElfInfo for @p path, memoized by path and modification time.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    key = (path, mtime)
+    if key not in _elf_cache:
+        _elf_cache[key] = read_elf(path)
+    return _elf_cache[key]
+
+
+def _parse_ld_so_conf(path, dirs, seen):
+    if path in seen:
+        return
+    seen.add(path)
+    try:
+        with open(path) as conf:
+            lines = conf.readlines()
+    except OSError:
+        return
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith('include'):
+            pattern = line.split(None, 1)[1] if ' ' in line else ''
+            if not os.path.isabs(pattern):
+                pattern = os.path.join(os.path.dirname(path), pattern)
+            for inc in sorted(glob.glob(pattern)):
+                _parse_ld_so_conf(inc, dirs, seen)
+        elif not line.startswith('hwcap'):
+            dirs.append(line)
+
+
+_system_dirs = None
+
+
+def system_library_dirs():
+    """
+    Return the directories searched after LD_LIBRARY_PATH and runpath: the
+    directories in /etc/ld.so.conf followed by the loader defaults.
+    """
+    global _system_dirs
+    if _system_dirs is None:
+        dirs = []
+        _parse_ld_so_conf('/etc/ld.so.conf', dirs, set())
+        dirs.extend(['/lib64', '/usr/lib64', '/lib', '/usr/lib'])
+        _system_dirs = []
+        for d in dirs:
+            if d not in _system_dirs:
+                _system_dirs.append(d)
+    return _system_dirs
+
+
+_resolve_cache = {}
+
+
+def _find_library(name, dirs, loader):
+    key = (name, tuple(dirs), loader.elfclass, loader.machine)
+    if key in _resolve_cache:
+        return _resolve_cache[key]
+    found = None
+    if '/' in name:
+        candidates = [name]
+    else:
+        candidates = [os.path.join(d, name) for d in dirs]
+    for path in candidates:
+        if not os.path.isfile(path):
+            continue
+        info = elf_info(path)
+        # The loader skips libraries built for a different architecture,
+        # like 32-bit libraries found in a 64-bit search path.
+        if info is None or not loader.compatible(info):
+            continue
+        found = path
+        break
+    _resolve_cache[key] = found
+    return found
+
+
+_deps_cache = {}
+
+
+def shared_dependencies(path, ld_library_path=None):
+    """
+    Return a dict which maps each shared library needed directly or
+    indirectly by @p path to its resolved location, or to None if it could
+    not be found, in the breadth-first order the loader would load them.
+    Return None if @p path is not an ELF file.  @p ld_library_path is the
+    LD_LIBRARY_PATH setting to use in the search.
+    """
+    path = os.path.abspath(path)
+    root = elf_info(path)
+    if root is None:
+        return None
+    key = (path, os.stat(path).st_mtime_ns, ld_library_path)
+    if key in _deps_cache:
+        return _deps_cache[key]
+    envdirs = [d for d in (ld_library_path or '').split(':') if d]
     libraries = {}
+    # Each entry in the queue is an object to load and the chain of rpath
+    # directories inherited from the objects which loaded it.
+    queue = [(root, [])]
+    while queue:
+        info, inherited = queue.pop(0)
+        rpath = []
+        if not info.runpath:
+            rpath = info.rpath + inherited
+        dirs = rpath + envdirs + info.runpath + system_library_dirs()
+        for name in info.needed:
+            if name in libraries:
+                continue
+            found = _find_library(name, dirs, info)
+            libraries[name] = found
+            if found:
+                queue.append((elf_info(found), info.rpath + inherited))
+    _deps_cache[key] = libraries
+    return libraries
+
+
+def _ldd_command(node, env):
+    "Run ldd on @p node and return a dict of library names and paths."
     lddEnv = {}
     # if LD_LIBRARY_PATH is set in ENV, use it when running ldd
     if 'LD_LIBRARY_PATH' in env['ENV']:
         lddEnv['LD_LIBRARY_PATH'] = env['ENV']['LD_LIBRARY_PATH']
-    # Run ldd on the program
     lddcmd = ["ldd", node.get_abspath()]
     env.LogDebug(lddcmd)
     lddprocess = sp.Popen(lddcmd, stdout=sp.PIPE, env=lddEnv)
     lddout = lddprocess.communicate()[0].decode()
     env.LogDebug(lddout)
+    deps = {}
     for line in lddout.splitlines():
-        # add second group to regex to exclude version number from libname
-        match = re.search(r"lib(.+?)(-[\d.]*)?\.so.*=> (.+) \(.*\)", line)
+        match = re.search(r"^\s*(\S+) => (.+) \(.*\)", line)
         if match:
-            libname = match.group(1)
-            lib = env.File(match.group(3))
-            if ((names is None or libname in names) and
+            deps[match.group(1)] = match.group(2)
+    return deps
+
+
+def ldd(node, env, names=None):
+    """
+    Return a map with the name of each shared library dependency and its
+    resolved location.  If a list of names is specified, then only include
+    the libraries matching those names.  Node is a scons file node for any
+    shared executable, including shared libraries.  Dependencies are
+    resolved recursively, so the map includes the dependencies of
+    dependencies.
+    """
+    deps = shared_dependencies(node.get_abspath(),
+                               env['ENV'].get('LD_LIBRARY_PATH'))
+    if deps is None:
+        deps = _ldd_command(node, env)
+    libraries = {}
+    for needed, path in deps.items():
+        # add second group to regex to exclude version number from libname
+        match = re.search(r"lib(.+?)(-[\d.]*)?\.so", needed)
+        if not match or not path:
+            continue
+        libname = match.group(1)
+        if ((names is None or libname in names) and
                 libname not in libraries):
-                env.LogDebug("Found %s" % (str(lib)))
-                libraries[libname] = lib
-                libraries.update (ldd(lib, env, names))
+            lib = env.File(path)
+            env.LogDebug("Found %s" % (str(lib)))
+            libraries[libname] = lib
     return libraries
 
 
@@ -0,0 +1,159 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+"""
+Memory profiling for the SConscript reading phase.
+
+Pass eolsconsmemprofile=1 on the scons command line to trace python memory
+allocations with tracemalloc while the SConscript files are read.  The
+memory and the number of nodes allocated while reading each SConscript file
+and applying each tool are accumulated by directory and by tool name, and
+the top consumers are printed when scons exits, followed by the source
+lines which allocated the most memory still in use.  A number larger than 1
+sets how many rows to print:
+
+    scons eolsconsmemprofile=30
+
+Inclusive totals count everything allocated inside the scope, including
+nested SConscript files and tools, while exclusive totals subtract the
+nested scopes.  The memory is the net change in traced memory, so it is
+what the scope left allocated, not what it freed again.
+
+Tracing memory slows down the read phase, so this is only meant for finding
+where the memory goes, not for every build.  The profile can also be
+started from a SConstruct file with eol_scons.memprofile.Start(), before
+the SConscript files to be profiled are read.
+"""
+
+import atexit
+import os
+import tracemalloc
+
+from SCons.Script import ARGUMENTS
+
+import eol_scons.profiling as esp
+
+memprofile = ARGUMENTS.get('eolsconsmemprofile', None)
+
+_default_rows = 20
+
+_profile = None
+
+
+def _size(nbytes):
+    if abs(nbytes) < 1024 * 1024:
+        return "%.1f KiB" % (nbytes / 1024.0)
+    return "%.1f MiB" % (nbytes / (1024.0 * 1024.0))
+
+
+class ScopeTotals:
+    "The memory and nodes allocated in all the scopes with the same key."
+
+    def __init__(self):
+        self.count = 0
+        self.inclusive = 0
+        self.exclusive = 0
+        self.nodes = 0
+        self.exclusive_nodes = 0
+
+
+class MemoryProfile:
+    """
+    Accumulate the traced memory and the number of nodes allocated in
+    nested scopes, keyed by the kind of scope and its name.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        # Each frame on the stack is the key, the memory and node count
+        # when the scope was entered, and the totals of nested scopes.
+        self._stack = []
+
+    def enter(self, kind, name):
+        if kind == 'sconscript':
+            # Attribute SConscript files to their directories.
+            name = os.path.dirname(name) or '.'
+        current, _ = tracemalloc.get_traced_memory()
+        self._stack.append([(kind, name), current, esp.counters.nodes, 0, 0])
+
+    def exit(self):
+        key, memory, nodes, child_memory, child_nodes = self._stack.pop()
+        current, _ = tracemalloc.get_traced_memory()
+        memory = current - memory
+        nodes = esp.counters.nodes - nodes
+        totals = self.totals.setdefault(key, ScopeTotals())
+        totals.count += 1
+        totals.inclusive += memory
+        totals.exclusive += memory - child_memory
+        totals.nodes += nodes
+        totals.exclusive_nodes += nodes - child_nodes
+        if self._stack:
+            self._stack[-1][3] += memory
+            self._stack[-1][4] += nodes
+
+    def report(self, rows=_default_rows, snapshot=None):
+        "Return the top @p rows consumers as lines of text."
+        _, peak = tracemalloc.get_traced_memory()
+        lines = ["eol_scons memory profile: peak %s traced, %d nodes" %
+                 (_size(peak), esp.counters.nodes)]
+        lines.append("%12s %12s %8s %8s %6s  %s" %
+                     ("inclusive", "exclusive", "nodes", "exclnode",
+                      "count", "scope"))
+        ranked = sorted(self.totals.items(),
+                        key=lambda item: item[1].exclusive, reverse=True)
+        for (kind, name), totals in ranked[:rows]:
+            lines.append("%12s %12s %8d %8d %6d  %s %s" %
+                         (_size(totals.inclusive), _size(totals.exclusive),
+                          totals.nodes, totals.exclusive_nodes,
+                          totals.count, kind, name))
+        if snapshot is not None:
+            lines.append("top allocation sites still in use:")
+            for stat in snapshot.statistics('lineno')[:rows]:
+                frame = stat.traceback[0]
+                lines.append("%12s %8d blocks  %s:%d" %
+                             (_size(stat.size), stat.count,
+                              frame.filename, frame.lineno))
+        return lines
+
+
+def AddVariables(variables):
+    variables.Add('eolsconsmemprofile', """
+Trace memory allocations while reading SConscript files and applying tools,
+and print the top consumers by directory and tool at exit.  Set it to a
+number greater than 1 to change how many rows are printed.
+""", None)
+
+
+def _rows():
+    try:
+        rows = int(memprofile)
+    except (TypeError, ValueError):
+        rows = 0
+    return rows if rows > 1 else _default_rows
+
+
+def _print_report():
+    snapshot = tracemalloc.take_snapshot()
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__)])
+    print("\n".join(_profile.report(_rows(), snapshot)))
+
+
+def Start():
+    """
+    Start tracing memory and attributing it to SConscript files and tools,
+    and print the report when scons exits.  Calling it again has no effect.
+    """
+    global _profile
+    if _profile:
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _profile = MemoryProfile()
+    esp.AddProfiler(_profile)
+    atexit.register(_print_report)
+
+
+if memprofile:
+    Start()
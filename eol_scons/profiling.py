@@ -0,0 +1,123 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+"""
+Hooks shared by the eol_scons profilers of the SConscript reading phase.
+
+A profiler calls AddProfiler() with an object which has enter(kind, name)
+and exit() methods.  From then on, every SConscript file read through SCons,
+including the tool_*.py files loaded by eol_scons, is read inside a Scope
+of kind 'sconscript' named by its path relative to the top directory, and
+every tool applied by the eol_scons Tool() method is applied inside a Scope
+of kind 'tool'.  The profilers can compare the counters of nodes and
+Environments created when each scope is entered and exited.
+"""
+
+import importlib
+
+import SCons.Environment
+import SCons.Node
+
+
+class Counters:
+    "Counts of the objects created since the hooks were installed."
+
+    def __init__(self):
+        self.nodes = 0
+        self.environments = 0
+        self.clones = 0
+
+    def values(self):
+        return (self.nodes, self.environments, self.clones)
+
+
+counters = Counters()
+
+_profilers = []
+
+
+class Scope:
+    """
+    Context manager which notifies the profilers, if any, when the work
+    for @p kind and @p name starts and ends.
+    """
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.profilers = []
+
+    def __enter__(self):
+        # Profilers added inside the scope did not see it start, so only
+        # these are notified when it ends.
+        self.profilers = list(_profilers)
+        for profiler in self.profilers:
+            profiler.enter(self.kind, self.name)
+        return self
+
+    def __exit__(self, *args):
+        for profiler in reversed(self.profilers):
+            profiler.exit()
+        return False
+
+
+def _sconscript_name(fs, fn):
+    "Return the path of SConscript @p fn relative to the top directory."
+    if fn == '-':
+        return 'stdin'
+    if not isinstance(fn, SCons.Node.Node):
+        fn = fs.File(str(fn))
+    return fn.get_path(fs.Top)
+
+
+def _install_hooks():
+    """
+    Wrap the SCons function which reads SConscript files, so each file is
+    read in its own scope, and count nodes and Environments as they are
+    created.
+    """
+    module = importlib.import_module('SCons.Script.SConscript')
+    read_sconscripts = module._SConscript
+
+    def _SConscript(fs, *files, **kw):
+        results = []
+        for fn in files:
+            with Scope('sconscript', _sconscript_name(fs, fn)):
+                results.append(read_sconscripts(fs, fn, **kw))
+        if len(results) == 1:
+            return results[0]
+        return tuple(results)
+
+    module._SConscript = _SConscript
+
+    node_init = SCons.Node.Node.__init__
+
+    def _count_node(self, *args, **kw):
+        counters.nodes += 1
+        node_init(self, *args, **kw)
+
+    SCons.Node.Node.__init__ = _count_node
+
+    env_init = SCons.Environment.Base.__init__
+
+    def _count_environment(self, *args, **kw):
+        counters.environments += 1
+        env_init(self, *args, **kw)
+
+    SCons.Environment.Base.__init__ = _count_environment
+
+    env_clone = SCons.Environment.Base.Clone
+
+    def _count_clone(self, *args, **kw):
+        counters.clones += 1
+        return env_clone(self, *args, **kw)
+
+    SCons.Environment.Base.Clone = _count_clone
+
+
+def AddProfiler(profiler):
+    "Install the hooks if needed, and notify @p profiler of every scope."
+    if not _profilers:
+        _install_hooks()
+    _profilers.append(profiler)
@@ -3,7 +3,13 @@ Helper functions for the Qt tools, so they do not need to be duplicated across
 Qt versions.
 """
 
+import os
+
+import SCons.Action
+import SCons.Util
+
 from eol_scons import Debug
+import eol_scons.parseconfig as pc
 
 
 def qualify_module_name(module, xprefix):
@@ -35,3 +41,102 @@ def replace_drive_specs(pathlist):
         if path != str(pathlist[i]):
             Debug("  replaced %s with %s" % (path, pathlist[i]))
     return None
+
+
+def append_emitters(env, **emitters):
+    """
+    Append each emitter to the construction variable list named by its
+    keyword, like AppendUnique(), but ahead of any emitter with a true
+    runs_last attribute, like the unity tool emitter, which needs to see the
+    objects added by the other emitters.
+    """
+    for key, emitter in emitters.items():
+        current = env.get(key) or []
+        if not SCons.Util.is_List(current):
+            current = [current]
+        current = list(current)
+        if emitter in current:
+            continue
+        index = len(current)
+        for i, other in enumerate(current):
+            if getattr(other, 'runs_last', False):
+                index = i
+                break
+        current.insert(index, emitter)
+        env[key] = current
+
+
+# Parsed pkg-config flags keyed by the pkg-config output.
+_parsed_flags = {}
+
+
+def pkgconfig_flags(env, packages):
+    """
+    Return the flags dictionary for all of the given pkg-config @p packages
+    from a single pkg-config command, or None if pkg-config fails for any
+    of them.  The command output is cached by parseconfig and the parsed
+    flags are cached here, so enabling the same set of modules again in any
+    environment neither runs pkg-config nor parses the output again.  The
+    returned dictionary is a copy which can be passed to MergeFlags().
+    """
+    pkgc = 'pkg-config --cflags --libs ' + ' '.join(packages)
+    if not pc.CheckConfig(env, pkgc):
+        return None
+    output = pc.RunConfig(env, pkgc)
+    if not output:
+        return None
+    flags = _parsed_flags.get(output)
+    if flags is None:
+        flags = env.ParseFlags(output)
+        _parsed_flags[output] = flags
+    return {key: list(value) for key, value in flags.items()}
+
+
+def _write_mocs_compilation(target, source, env):
+    with open(target[0].get_abspath(), 'w') as unit:
+        unit.write(source[0].read())
+    return None
+
+
+_mocs_compilation_action = SCons.Action.Action(
+    _write_mocs_compilation, "Generating $TARGET")
+
+
+def mocs_compilation(env, obj_builder, target, mocs, size, shared=False):
+    """
+    Compile the generated moc sources @p mocs for @p target in consolidated
+    units, like the CMake AUTOMOC mocs_compilation.cpp, instead of one
+    object per moc source.  Each unit is named after the target,
+    <target>_mocs_compilation_<N>.cpp, and includes at most @p size moc
+    sources.  Return the list of objects built with @p obj_builder.  If
+    @p shared is true, the units are named
+    <target>_shared_mocs_compilation_<N>.cpp instead, so a shared and a
+    static library with the same name have different units.
+
+    The unit contents are generated from a Value of the include lines, so a
+    unit is only rewritten when the set of moc sources changes, and the
+    objects depend on the moc sources they include.
+    """
+    tnode = target[0]
+    base = SCons.Util.splitext(tnode.name)[0]
+    if shared:
+        base += "_shared"
+    suffix = env.subst('$CXXFILESUFFIX')
+    objects = []
+    for n, start in enumerate(range(0, len(mocs), size)):
+        chunk = mocs[start:start + size]
+        unit = tnode.get_dir().File("%s_mocs_compilation_%d%s" %
+                                    (base, n, suffix))
+        udir = unit.get_dir().get_abspath()
+        lines = ["// Generated by eol_scons from the moc sources for %s." %
+                 (tnode.name)]
+        lines += ['#include "%s"' % (os.path.relpath(moc.get_abspath(), udir))
+                  for moc in chunk]
+        env.Command(unit, env.Value("\n".join(lines) + "\n"),
+                    _mocs_compilation_action)
+        obj = obj_builder(unit)
+        env.Depends(obj, chunk)
+        Debug("qt: compiling %s in %s" %
+              (",".join([str(moc) for moc in chunk]), str(unit)), env)
+        objects.extend(obj)
+    return objects
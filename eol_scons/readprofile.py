@@ -0,0 +1,190 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+"""
+Timing profile of the SConscript reading phase.
+
+Pass eolsconsreadprofile=1 on the scons command line to time every
+SConscript file as it is read, including the tool_*.py files loaded by
+eol_scons, and every tool applied with the eol_scons Tool() method.  When
+scons exits, a table of the slowest scopes is printed, and two files are
+written in the top directory:
+
+eol_scons_readprofile.tsv: A tab-separated table with a row for each
+  SConscript file and tool, with its inclusive and exclusive wall time in
+  seconds, the number of times it was read or applied, and the number of
+  Environments created, Environments cloned, and nodes created while it was
+  read, excluding nested scopes.  Sort it with something like:
+
+    sort -t$'\\t' -k3 -g -r eol_scons_readprofile.tsv
+
+eol_scons_readprofile.collapsed: The exclusive time in microseconds of each
+  stack of nested scopes, in the collapsed stack format read by flamegraph.pl
+  and speedscope.
+
+To write the files somewhere else, set eolsconsreadprofile to a path prefix
+instead of 1.  The profile can also be started from a SConstruct file with
+eol_scons.readprofile.Start(), before the SConscript files to be profiled
+are read.
+"""
+
+import atexit
+import os
+import time
+
+import SCons.Script
+from SCons.Script import ARGUMENTS
+
+import eol_scons.profiling as esp
+
+readprofile = ARGUMENTS.get('eolsconsreadprofile', None)
+
+_default_prefix = 'eol_scons_readprofile'
+
+_default_rows = 20
+
+_profile = None
+
+
+class ScopeTimes:
+    "The times and counts for all the scopes with the same key."
+
+    def __init__(self):
+        self.count = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        # The nodes, Environments and clones created, excluding nested
+        # scopes.
+        self.created = [0, 0, 0]
+
+
+class ReadProfile:
+    """
+    Accumulate the wall time and the objects created in nested scopes,
+    keyed by the kind of scope and its name, and the exclusive time of
+    each stack of scopes.
+    """
+
+    def __init__(self):
+        self.times = {}
+        self.stacks = {}
+        # The total time of the outermost scopes.
+        self.elapsed = 0.0
+        # Each frame on the stack is the key, the time and counters when
+        # the scope was entered, and the totals of nested scopes.
+        self._stack = []
+
+    def enter(self, kind, name):
+        self._stack.append([(kind, name), time.perf_counter(),
+                            esp.counters.values(), 0.0, (0, 0, 0)])
+
+    def exit(self):
+        key, start, counts, child_time, child_counts = self._stack[-1]
+        elapsed = time.perf_counter() - start
+        created = [now - then for now, then in
+                   zip(esp.counters.values(), counts)]
+        stack = tuple(_frame_name(frame[0]) for frame in self._stack)
+        self._stack.pop()
+        times = self.times.setdefault(key, ScopeTimes())
+        times.count += 1
+        times.inclusive += elapsed
+        times.exclusive += elapsed - child_time
+        times.created = [total + now - child for total, now, child in
+                         zip(times.created, created, child_counts)]
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + \
+            elapsed - child_time
+        if self._stack:
+            parent = self._stack[-1]
+            parent[3] += elapsed
+            parent[4] = tuple(total + now for total, now in
+                              zip(parent[4], created))
+        else:
+            self.elapsed += elapsed
+
+    def ranked(self):
+        "Return the (key, times) items with the largest exclusive time first."
+        return sorted(self.times.items(),
+                      key=lambda item: item[1].exclusive, reverse=True)
+
+    def table(self):
+        "Return the rows of the table as tab-separated lines."
+        lines = ["\t".join(["kind", "name", "exclusive", "inclusive",
+                            "count", "environments", "clones", "nodes"])]
+        for (kind, name), times in self.ranked():
+            nodes, environments, clones = times.created
+            lines.append("%s\t%s\t%.6f\t%.6f\t%d\t%d\t%d\t%d" %
+                         (kind, name, times.exclusive, times.inclusive,
+                          times.count, environments, clones, nodes))
+        return lines
+
+    def collapsed(self):
+        "Return the stacks in collapsed format, one line per stack."
+        return ["%s %d" % (";".join(stack), int(seconds * 1e6))
+                for stack, seconds in sorted(self.stacks.items())]
+
+    def report(self, rows=_default_rows):
+        "Return the summary of the slowest scopes as lines of text."
+        lines = ["eol_scons read profile: %.3fs, %d environments, "
+                 "%d clones, %d nodes" %
+                 (self.elapsed, esp.counters.environments,
+                  esp.counters.clones, esp.counters.nodes)]
+        lines.append("%10s %10s %6s %6s %6s %8s  %s" %
+                     ("exclusive", "inclusive", "count", "envs", "clones",
+                      "nodes", "scope"))
+        for (kind, name), times in self.ranked()[:rows]:
+            nodes, environments, clones = times.created
+            lines.append("%9.3fs %9.3fs %6d %6d %6d %8d  %s %s" %
+                         (times.exclusive, times.inclusive, times.count,
+                          environments, clones, nodes, kind, name))
+        return lines
+
+
+def _frame_name(key):
+    "Return the name of a frame, without the collapsed format separators."
+    kind, name = key
+    if kind != 'sconscript':
+        name = "%s:%s" % (kind, name)
+    return name.replace(';', '_').replace(' ', '_')
+
+
+def AddVariables(variables):
+    variables.Add('eolsconsreadprofile', """
+Time the reading of each SConscript file and the application of each tool,
+print the slowest, and write a table and collapsed stacks to files with
+this path prefix, or eol_scons_readprofile in the top directory if 1.
+""", None)
+
+
+def _prefix():
+    top = SCons.Script.Dir('#').get_abspath()
+    if not readprofile or readprofile == '1':
+        return os.path.join(top, _default_prefix)
+    return os.path.join(top, readprofile)
+
+
+def _write_profile():
+    prefix = _prefix()
+    with open(prefix + '.tsv', 'w') as tfile:
+        tfile.write("\n".join(_profile.table()) + "\n")
+    with open(prefix + '.collapsed', 'w') as cfile:
+        cfile.write("\n".join(_profile.collapsed()) + "\n")
+    print("\n".join(_profile.report()))
+    print("Wrote %s.tsv and %s.collapsed" % (prefix, prefix))
+
+
+def Start():
+    """
+    Start timing SConscript files and tools, and write the profile when
+    scons exits.  Calling it again has no effect.
+    """
+    global _profile
+    if _profile:
+        return
+    _profile = ReadProfile()
+    esp.AddProfiler(_profile)
+    atexit.register(_write_profile)
+
+
+if readprofile:
+    Start()
@@ -0,0 +1,254 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+"""
+Support for the timeline tool: a spawner which records when every build
+command ran, how much CPU and memory it used, and which target it built,
+then writes the records as a Chrome trace-event file and finds the critical
+path through the dependency graph.
+
+The trace file can be loaded into chrome://tracing or https://ui.perfetto.dev
+to see which commands ran in parallel and which ones kept the others waiting.
+Each command is drawn on the lowest numbered lane which was free when it
+started, so the lanes correspond to the job slots in use under -j.
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+
+import SCons.Errors
+import SCons.Node.FS
+import SCons.Platform.posix
+
+
+class CommandRecord:
+    """
+    The start and end times of one spawned command, in seconds since the
+    epoch, with its arguments, exit status, and when they could be measured,
+    the user and system CPU seconds and the maximum resident set size in
+    kilobytes.  The target is filled in by TimelineSpawner.resolve_targets().
+    """
+
+    def __init__(self, args, start):
+        self.args = args
+        self.start = start
+        self.end = start
+        self.status = None
+        self.cpu = None
+        self.maxrss = None
+        self.lane = 0
+        self.target = None
+
+    def duration(self):
+        return self.end - self.start
+
+
+class TimelineSpawner:
+    """
+    Spawn commands through @p spawn and keep a CommandRecord for each one.
+    Assign an instance to SPAWN, like a SpawnerLogger, to trace every command
+    run by the environments which use it.
+
+    When @p spawn is the default posix spawn, the commands are run here
+    instead, so the resource usage of each child can be collected with
+    os.wait4() while other commands run in parallel.  Otherwise only the
+    times are recorded.
+    """
+
+    def __init__(self, spawn):
+        self.spawn = spawn
+        self.records = []
+        self._lanes = []
+        self._lock = threading.Lock()
+        self._measure = (spawn is SCons.Platform.posix.subprocess_spawn and
+                         hasattr(os, 'wait4'))
+
+    def _start(self, args):
+        with self._lock:
+            record = CommandRecord(args, time.time())
+            if False in self._lanes:
+                record.lane = self._lanes.index(False)
+                self._lanes[record.lane] = True
+            else:
+                record.lane = len(self._lanes)
+                self._lanes.append(True)
+            self.records.append(record)
+        return record
+
+    def _finish(self, record, status):
+        with self._lock:
+            record.end = time.time()
+            record.status = status
+            self._lanes[record.lane] = False
+
+    def _wait4_spawn(self, sh, args, env, record):
+        proc = subprocess.Popen([sh, '-c', ' '.join(args)], env=env,
+                                close_fds=True)
+        _, status, usage = os.wait4(proc.pid, 0)
+        # The child has been reaped, so keep Popen from waiting on it.
+        proc.returncode = _exit_code(status)
+        record.cpu = usage.ru_utime + usage.ru_stime
+        record.maxrss = usage.ru_maxrss
+        return proc.returncode
+
+    def __call__(self, sh, escape, cmd, args, env):
+        record = self._start(args)
+        status = None
+        try:
+            if self._measure:
+                status = self._wait4_spawn(sh, args, env, record)
+            else:
+                status = self.spawn(sh, escape, cmd, args, env)
+            return status
+        finally:
+            self._finish(record, status)
+
+    def resolve_targets(self, fs=None):
+        """
+        Set the target of each record to the derived node named in its
+        arguments: the output of -o if there is one, else the first derived
+        node which the other derived nodes in the command do not depend on,
+        like the archive of an ar command.
+        Nodes are looked up without creating them, so this is done once the
+        build has finished.
+        """
+        if fs is None:
+            fs = SCons.Node.FS.get_default_fs()
+        for record in self.records:
+            if record.target is None:
+                record.target = _command_target(fs, record.args)
+
+
+def _exit_code(status):
+    "Convert a wait status to a returncode like subprocess does."
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _unquote(arg):
+    "Remove the quotes scons adds around arguments with spaces."
+    if len(arg) > 1 and arg[0] == arg[-1] and arg[0] in '"\'':
+        return arg[1:-1]
+    return arg
+
+
+def _lookup(fs, path):
+    try:
+        return fs._lookup(path, fs.Top, SCons.Node.FS.Entry, create=False)
+    except SCons.Errors.UserError:
+        return None
+
+
+def _command_target(fs, args):
+    args = [_unquote(str(arg)) for arg in args]
+    for i, arg in enumerate(args[:-1]):
+        if arg == '-o':
+            node = _lookup(fs, args[i + 1])
+            if node is not None:
+                return node
+    candidates = []
+    for arg in args[1:]:
+        if arg.startswith('-'):
+            continue
+        node = _lookup(fs, arg)
+        if node is not None and node.has_builder() and \
+                node not in candidates:
+            candidates.append(node)
+    # Derived sources of the command are dependencies of its target, so
+    # the target is the candidate which none of the others depend on.
+    for node in candidates:
+        if not any(node in other.children(scan=0) for other in candidates
+                   if other is not node):
+            return node
+    return None
+
+
+def critical_path(records):
+    """
+    Return the list of records along the longest chain of dependent
+    commands, from the first to run to the last.  The cost of a target is
+    the time of its own commands plus the most expensive target it depends
+    on, directly or through nodes which did not run a command, like
+    sources or aliases.
+    """
+    own = {}
+    for record in records:
+        if record.target is not None:
+            own.setdefault(record.target, []).append(record)
+    # Depth-first walk without recursion, since dependency chains through
+    # the directory tree can be deeper than the python stack.
+    cost = {}
+    best = {}
+    for root in own:
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in cost and not expanded:
+                continue
+            children = node.children(scan=0)
+            if not expanded:
+                cost[node] = None
+                stack.append((node, True))
+                stack.extend((child, False) for child in children
+                             if child not in cost)
+                continue
+            longest = 0.0
+            via = None
+            for child in children:
+                if cost.get(child) is not None and cost[child] > longest:
+                    longest = cost[child]
+                    via = child
+            own_time = sum(r.duration() for r in own.get(node, []))
+            cost[node] = own_time + longest
+            best[node] = via
+    if not cost:
+        return []
+    node = max(own, key=lambda n: cost[n])
+    path = []
+    while node is not None:
+        path[0:0] = own.get(node, [])
+        node = best.get(node)
+    return path
+
+
+def _record_name(record):
+    if record.target is not None:
+        return str(record.target)
+    return os.path.basename(_unquote(str(record.args[0])))
+
+
+def trace_events(records):
+    "Return a Chrome trace-event dictionary for @p records."
+    origin = min([record.start for record in records] or [0])
+    events = []
+    for record in records:
+        args = {'command': ' '.join(str(arg) for arg in record.args),
+                'status': record.status}
+        if record.cpu is not None:
+            args['cpu_seconds'] = round(record.cpu, 6)
+            args['max_rss_kb'] = record.maxrss
+        events.append({'name': _record_name(record), 'cat': 'command',
+                       'ph': 'X', 'pid': 1, 'tid': record.lane,
+                       'ts': int((record.start - origin) * 1e6),
+                       'dur': int(record.duration() * 1e6), 'args': args})
+    path = critical_path(records)
+    other = {'critical_path': [_record_name(record) for record in path],
+             'critical_path_seconds':
+             round(sum(record.duration() for record in path), 6)}
+    return {'traceEvents': events, 'displayTimeUnit': 'ms',
+            'otherData': other}
+
+
+def write_trace(path, records):
+    """
+    Write the trace of @p records to @p path and return the critical path.
+    """
+    trace = trace_events(records)
+    with open(path, 'w') as tfile:
+        json.dump(trace, tfile, indent=1)
+    return trace['otherData']
@@ -31,6 +31,7 @@ import eol_scons.library
 import eol_scons.methods
 import eol_scons.variables as esv
 import eol_scons.debug as esd
+import eol_scons.profiling as esp
 
 _tool_matches = None
 _global_tools = {}
@@ -284,7 +285,8 @@ def Tool(env, tool, toolpath=None, **kw):
 
     env.LogDebug("Applying tool %s" % name)
     _tool_stack.append("applying-%s" % (name))
-    tool(env)
+    with esp.Scope('tool', name):
+        tool(env)
     _tool_stack.pop()
     env.LogDebug("...after applying tool %s: %s" % (name, esd.Watches(env)))
     # We could regenerate the help text after each tool is loaded,
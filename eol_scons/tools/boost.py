@@ -3,6 +3,7 @@
 # This source code is licensed under the MIT license found in the LICENSE
 # file in the root directory of this source tree.
 import os
+import json
 import SCons.Util
 
 _options = None
@@ -36,11 +37,77 @@ def _append_boost_library(env, libname):
         env.Append(LIBS=[libname])
 
 
+# The directories searched for boost/version.hpp after CPPPATH, matching
+# the compiler's default include path.
+_sysincludes = ['/usr/local/include', '/usr/include']
+
+# BOOST_VERSION results keyed by the probe command, the compiler and the
+# version.hpp header, shared by all environments and saved in a file in
+# the scons configure directory so later runs do not need to probe.
+_version_cache = None
+_VERSION_CACHE_FILE = 'eol_scons_boost_version.json'
+
+
+def _version_cache_path(env):
+    return os.path.join(env.Dir('$CONFIGUREDIR').get_abspath(),
+                        _VERSION_CACHE_FILE)
+
+
+def _load_version_cache(env):
+    global _version_cache
+    if _version_cache is None:
+        _version_cache = {}
+        try:
+            with open(_version_cache_path(env)) as cf:
+                _version_cache = json.load(cf)
+        except (OSError, ValueError):
+            pass
+    return _version_cache
+
+
+def _save_version_cache(env):
+    path = _version_cache_path(env)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w') as cf:
+            json.dump(_version_cache, cf, indent=1)
+        os.replace(path + '.tmp', path)
+    except OSError as ex:
+        env.LogDebug("boost_version(): could not write %s: %s" % (path, ex))
+
+
+def _file_stamp(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except (OSError, TypeError):
+        return None
+
+
+def _version_cache_key(env, cmd):
+    """
+    Return the key for the boost version found with @p cmd: the command
+    itself, which includes the compiler, CCFLAGS and the CPPPATH options,
+    plus the modification times of the compiler and of the version.hpp
+    header the compiler will find.  Return None if the header cannot be
+    located, since then there is nothing to tell when boost changes.
+    """
+    header = env.FindFile(os.path.join('boost', 'version.hpp'),
+                          env.Flatten([env.get('CPPPATH', [])]) +
+                          _sysincludes)
+    if not header:
+        return None
+    header = header.get_abspath()
+    compiler = env.WhereIs(cmd[0]) or cmd[0]
+    return json.dumps([cmd, os.path.realpath(compiler), _file_stamp(compiler),
+                       header, _file_stamp(header)])
+
+
 def boost_version(env):
     """
     The detection of the boost version depends on an unconventional use of
     compiler options to query BOOST_VERSION from the boost/version.hpp header
-    file.
+    file.  The result is cached for the compiler, include options and
+    version.hpp, so the compiler only runs again when one of them changes.
     """
     version = env.get('BOOST_VERSION')
     if not version:
@@ -58,6 +125,14 @@ BOOST_VERSION
         # subst_list returns a list of CmdStringHolder instances inside a list,
         # so convert it to a simple argument list of strings.
         cmd = [str(arg) for arg in env.subst_list(command)[0]]
+        key = _version_cache_key(env, cmd)
+        cache = _load_version_cache(env)
+        if key and key in cache:
+            version = cache[key]
+            env.LogDebug("boost_version(): cached %s" % (version))
+            if version:
+                env['BOOST_VERSION'] = version
+            return version
         import subprocess as sp
         env.LogDebug("boost_version(): %s" % (cmd))
         subp = sp.Popen(cmd, shell=False, stdin=sp.PIPE, stdout=sp.PIPE,
@@ -73,6 +148,9 @@ BOOST_VERSION
         else:
             version = None
         env.PrintProgress("BOOST_VERSION=%s" % (version))
+        if key:
+            cache[key] = version
+            _save_version_cache(env)
     return version
 
 
@@ -0,0 +1,137 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+"""
+Run C and C++ compiles through a compiler cache like ccache, so objects
+compiled in another checkout, on another branch, or before a clean can be
+reused instead of compiled again.
+
+Add this tool to GLOBAL_TOOLS, after the compiler tools, to prefix the
+CCCOM, CXXCOM, SHCCCOM and SHCXXCOM commands with the COMPILERCACHE
+launcher.  COMPILERCACHE defaults to ccache if it is on the PATH, and it
+can be set on the command line, or to an empty string to disable the cache:
+
+    scons COMPILERCACHE=/usr/local/bin/ccache
+    scons COMPILERCACHE=
+
+These settings are passed to the cache in the process environment:
+
+COMPILERCACHE_BASEDIR: Absolute paths under this directory are rewritten
+  as relative paths before hashing, so builds in different checkouts share
+  results.  It defaults to the top directory, '#'.
+
+COMPILERCACHE_SLOPPINESS: The ccache sloppiness setting.  The default
+  ignores the modification times of include files, since headers like the
+  ones generated by the gitinfo tool are rewritten often, and allows
+  __DATE__ and __TIME__ and precompiled headers.
+
+COMPILERCACHE_HASHDIR: If false, which is the default, the current
+  directory is not included in the hash of compiles with debug info.
+
+When the launcher supports --print-stats, like ccache 4, the cache hits and
+misses for the build are printed when scons exits.
+"""
+
+import atexit
+import subprocess as sp
+
+import SCons.Util
+
+_compile_commands = ['CCCOM', 'CXXCOM', 'SHCCCOM', 'SHCXXCOM']
+
+_default_sloppiness = ('include_file_mtime,include_file_ctime,'
+                       'time_macros,pch_defines')
+
+# The launcher and its statistics counters when the build started, so the
+# difference can be reported at exit.
+_start_stats = {}
+
+
+def _read_stats(launcher, psenv):
+    """
+    Return a dictionary of the statistics counters reported by the cache
+    launcher, or None if it does not support --print-stats.
+    """
+    try:
+        child = sp.run([launcher, '--print-stats'], stdout=sp.PIPE,
+                       stderr=sp.DEVNULL, env=psenv,
+                       universal_newlines=True)
+    except OSError:
+        return None
+    if child.returncode != 0:
+        return None
+    stats = {}
+    for line in child.stdout.splitlines():
+        fields = line.split('\t')
+        if len(fields) == 2 and fields[1].isdigit():
+            stats[fields[0]] = int(fields[1])
+    return stats
+
+
+def _hit_rate(before, after):
+    "Return the hits and misses between two sets of counters."
+    def delta(key):
+        return after.get(key, 0) - before.get(key, 0)
+    hits = delta('direct_cache_hit') + delta('preprocessed_cache_hit')
+    misses = delta('cache_miss')
+    return hits, misses
+
+
+def _print_stats():
+    for launcher, (psenv, before) in _start_stats.items():
+        after = _read_stats(launcher, psenv)
+        if after is None:
+            continue
+        hits, misses = _hit_rate(before, after)
+        total = hits + misses
+        if total == 0:
+            continue
+        print("%s: %d hits, %d misses, %.0f%% hit rate" %
+              (launcher, hits, misses, 100.0 * hits / total))
+
+
+def _string_env(env):
+    return {key: str(value) for key, value in env['ENV'].items()}
+
+
+def generate(env):
+    variables = env.GlobalVariables()
+    if 'COMPILERCACHE' not in variables.keys():
+        variables.Add('COMPILERCACHE', """\
+Compiler cache launcher which prefixes compile commands, such as ccache.
+Set it empty to compile without a cache.""", env.WhereIs('ccache') or '')
+    variables.Update(env)
+    env.SetDefault(COMPILERCACHE_BASEDIR='#')
+    env.SetDefault(COMPILERCACHE_SLOPPINESS=_default_sloppiness)
+    env.SetDefault(COMPILERCACHE_HASHDIR=False)
+
+    for com in _compile_commands:
+        command = env.get(com)
+        if SCons.Util.is_String(command) and \
+                not command.startswith('$COMPILERCACHE '):
+            env[com] = '$COMPILERCACHE ' + command
+
+    launcher = env.subst('$COMPILERCACHE')
+    if not launcher:
+        return
+    env['ENV']['CCACHE_BASEDIR'] = \
+        env.Dir(env['COMPILERCACHE_BASEDIR']).get_abspath()
+    env['ENV']['CCACHE_SLOPPINESS'] = env.subst('$COMPILERCACHE_SLOPPINESS')
+    if not env['COMPILERCACHE_HASHDIR']:
+        env['ENV']['CCACHE_NOHASHDIR'] = '1'
+    # Pass through a cache directory from the user's environment, since the
+    # default in the home directory is not shared by other build accounts.
+    env.PassEnv(r'CCACHE_DIR$')
+
+    if launcher not in _start_stats:
+        psenv = _string_env(env)
+        stats = _read_stats(launcher, psenv)
+        if stats is not None:
+            if not _start_stats:
+                atexit.register(_print_stats)
+            _start_stats[launcher] = (psenv, stats)
+
+
+def exists(env):
+    return env.WhereIs('ccache')
@@ -60,6 +60,13 @@ This command will just check that all the files exist in the cache and fail
 if any do not:
 
     scons download=off datasync
+
+When the master copy of a data file is visible on the local filesystem, the
+'datalink' variable selects how it is placed in the cache: *auto*,
+*symlink*, *hardlink*, *reflink*, or *copy*.  The default *auto* clones or
+hard links the file when it is on the same filesystem as the cache and
+otherwise copies it, so tests read the data from local disk.  See
+DataFileCache.setMaterializePolicy().
 """
 
 import SCons
@@ -84,6 +91,7 @@ def _download_data_file(env, filepath):
     # Create a scons builder which downloads the source file into the cache.
     dfcache = env.DataFileCache()
     dfcache.enableDownload(env.get("download", "auto") in ["auto", "force"])
+    dfcache.setMaterializePolicy(env.get("datalink", "auto"))
     syncfile = env.Action(_sync_file, _sync_file_message)
     target = env.Command(
         dfcache.getFile(filepath), env.Value(filepath), syncfile
@@ -151,6 +159,17 @@ def generate(env):
                 ignorecase=2,
             )
         )
+        _options.Add(
+            EnumVariable(
+                "datalink",
+                "Set how data files available on the local filesystem "
+                "are placed in the data cache.",
+                "auto",
+                allowed_values=("auto", "symlink", "hardlink", "reflink",
+                                "copy"),
+                ignorecase=2,
+            )
+        )
     _options.Update(env)
     env.AddMethod(_get_cache_instance, "DataFileCache")
     env.AddMethod(_download_data_file, "DownloadDataFile")
@@ -2,18 +2,28 @@
 #
 # This source code is licensed under the MIT license found in the LICENSE
 # file in the root directory of this source tree.
+"""
+The DeployProgram builder copies a program into a deploy tree along with
+the shared libraries it needs, selected by name with DEPLOY_SHARED_LIBS.
+
+The program and each library are separate scons targets, so only the
+files which changed are deployed again, and a scons clean removes them
+all.  Files are hard linked into the deploy tree when possible, else cloned
+with a reflink or copied.  The libraries cannot be known until the program
+has been linked, so they are found by a target scanner on the deployed
+program, which scons runs again once the program has been built.  The
+dependencies are resolved by reading the program ELF headers, with results
+cached across all the programs in the build.
+"""
+
 import os
 import SCons
 from SCons.Builder import Builder
 from SCons.Action import Action
+from SCons.Scanner import Scanner
 
 from eol_scons.ldd import ldd
-
-# As of scons 1.2 the Mkdir action works even if the directory exists.
-# Until everyone is using that, we need to use our own action.
-# from SCons.Defaults import Mkdir
-from eol_scons.chdir import MkdirIfMissing
-Mkdir = MkdirIfMissing
+from eol_scons.utils import link_or_copy
 
 
 def makedirs(dirpath):
@@ -30,7 +40,8 @@ def deploy_program_emitter(target, source, env):
     # We don't know the dependencies until the program has been linked,
     # thus we can't use an emitter to calculate the targets that will
     # be copied into the deploy directory.  So the only target we can
-    # generate now is the copy of the program itself.
+    # generate now is the copy of the program itself.  The libraries are
+    # added by the target scanner.
     bindir = os.path.join(env['DEPLOY_DIRECTORY'], env['DEPLOY_BINDIR'])
     dest = os.path.join(bindir, source[0].name)
     # The target depends on the setting of DEPLOY_SHARED_LIBS, even though
@@ -44,42 +55,60 @@ def deploy_program_emitter(target, source, env):
     return target, source
 
 
-def deploy_program(target, source, env):
+def deploy_file(target, source, env):
+    """
+    Replace the target with the source file, using a hard link or reflink
+    if possible, otherwise a copy which preserves the file mode and times.
+    """
+    src = source[0].get_abspath()
+    dest = target[0].get_abspath()
+    if os.path.exists(dest) and os.path.samefile(src, dest):
+        return None
+    link_or_copy(src, dest)
+    return None
+
+
+def _deploy_file_message(target, source, env):
+    return "Deploying %s to %s" % (source[0], target[0])
+
+
+deploy_file_action = Action(deploy_file, _deploy_file_message)
+
+# Map the path of each deployed library to the node which deploys it, so
+# programs which need the same library share one target.
+_deployed_libraries = {}
+
+
+def deploy_libraries_scanner(node, env, path):
     """
-    Copy a program target into a deploy tree along with all of its dynamic
-    dependencies.
+    Return the deployed library nodes which the deployed program @p node
+    depends on.  Nothing can be found until the program exists, but scons
+    scans the target again after the program has been built.
     """
-    # Resolve any # notation in the deploy directory setting before using
-    # it.  The str() is in case the setting is a scons node and not a
-    # string.
+    program = node.sources[0]
+    if not os.path.exists(program.get_abspath()):
+        return []
+    libraries = ldd(program, env, env['DEPLOY_SHARED_LIBS'])
     dpath = env.Dir(str(env['DEPLOY_DIRECTORY'])).get_path()
-    bindir = os.path.join(dpath, env['DEPLOY_BINDIR'])
     libdir = os.path.join(dpath, "lib")
-    actions = [Mkdir(bindir), Mkdir(libdir)]
-    progdest = target[0]
-    libraries = ldd(source[0], env, env['DEPLOY_SHARED_LIBS'])
-    cp = 'cp -fp'
-    actions.append(f'{cp} "{source[0]}" "{progdest}"')
-    for k in libraries:
-        libfile = libraries[k]
-        libdest = os.path.join(libdir, libfile.name)
-        # Use an explicit cp command rather than Copy. Both the Copy() API
-        # and default behavior regarding deep/shallow copies changed in
-        # scons v2.3.5. This created a problem when copying symlinked
-        # objects such as system dynamic libraries.  This should be portable
-        # enough since deploy is not used on Windows.
-        actions.append(Action(f'{cp} "{libfile.get_abspath()}" "{libdest}"'))
-    return env.Execute(actions)
-
-
-# Ultimately, DeployProgram probably should be a wrapper which creates
-# individual builders for copying all the shared libraries and the program.
-# That way all the copied files would be targets which would be erased by a
-# scons clean, and they would be copied over if the system library source
-# changed.  Oh well, this works for now.
-
-deploy_program_builder = Builder(action=deploy_program,
-                                 emitter=deploy_program_emitter)
+    deps = []
+    for libfile in libraries.values():
+        libdest = env.File(os.path.join(libdir, libfile.name))
+        key = libdest.get_abspath()
+        if key not in _deployed_libraries:
+            _deployed_libraries[key] = env.Command(libdest, libfile,
+                                                   deploy_file_action)[0]
+        deps.append(_deployed_libraries[key])
+    env.LogDebug("deploying libraries for %s: %s" %
+                 (program, ",".join([str(d) for d in deps])))
+    return deps
+
+
+deploy_program_builder = Builder(action=deploy_file_action,
+                                 emitter=deploy_program_emitter,
+                                 target_scanner=Scanner(
+                                     deploy_libraries_scanner,
+                                     name='deploylibs'))
 
 
 class DeployWarning(SCons.Errors.UserError):
@@ -0,0 +1,176 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+"""
+Dispatch C and C++ compiles to remote workers through a distcc-style
+launcher, and raise the number of scons jobs to keep the workers busy.
+
+Add this tool to GLOBAL_TOOLS, after the compiler tools and after the
+compilercache tool if it is used, and set DISTCOMPILE to the launcher:
+
+    scons DISTCOMPILE=distcc DISTCOMPILE_HOSTS="buildhost1/8 buildhost2/8"
+
+The launcher prefixes CCCOM, CXXCOM, SHCCCOM and SHCXXCOM.  If the compile
+commands already run through the compilercache launcher, the distributed
+launcher is passed to ccache in CCACHE_PREFIX instead, so only cache misses
+are sent to the workers.  DISTCOMPILE_HOSTS is passed to the launcher as
+DISTCC_HOSTS.
+
+When -j is not given on the command line, the number of jobs is raised to
+the number of worker slots plus DISTCOMPILE_LOCAL_JOBS.  The slots are
+DISTCOMPILE_SLOTS if set, else what the launcher reports with -j, else the
+total of the DISTCC_HOSTS slots.  So that all those jobs do not run links
+and other local commands, like moc, at the same time, every command which
+does not start with a distributed launcher waits for one of
+DISTCOMPILE_LOCAL_JOBS local slots, which defaults to the number of
+processors.  Python function actions, like those of text2cc and gitinfo,
+are not spawned, so they wait for a local slot when they execute in an
+environment with this tool.  Each environment keeps the SPAWN it had, with
+the limit wrapped around it, but the local slots are shared by all of
+them.  Objects which must be compiled on the build host, like those with
+text2cc incbin stubs, which read the embedded file by its local path, can
+be built with DISTCOMPILE set to an empty string.
+
+Set DISTCOMPILE=loopback to use the stand-in launcher in
+eol_scons.distcompile, which preprocesses locally and compiles in a
+separate directory on the same machine, to test distributed builds without
+any workers.
+"""
+
+import os
+import shlex
+import subprocess as sp
+import sys
+
+import SCons.Action
+import SCons.Util
+from SCons.Script import GetOption, SetOption
+
+import eol_scons.distcompile as dc
+
+_compile_commands = ['CCCOM', 'CXXCOM', 'SHCCCOM', 'SHCXXCOM']
+
+# There is one pool of local slots for the whole build, so the local limit
+# applies to the commands from all environments.
+_pool = None
+
+_function_execute = None
+
+
+def _loopback_launcher():
+    return "%s %s" % (shlex.quote(sys.executable), shlex.quote(dc.__file__))
+
+
+def _jobs_given():
+    """
+    Return True if -j or --jobs was given on the command line or in
+    SCONSFLAGS, since GetOption('num_jobs') is 1 both by default and with
+    an explicit -j1.
+    """
+    args = shlex.split(os.environ.get('SCONSFLAGS', '')) + sys.argv[1:]
+    for arg in args:
+        if arg == '--':
+            break
+        if arg.startswith('-j') or arg.startswith('--jobs'):
+            return True
+    return False
+
+
+def _launcher_slots(env, launcher):
+    "Ask the launcher how many jobs it can run, like distcc -j."
+    try:
+        child = sp.run(SCons.Util.CLVar(launcher) + ['-j'], stdout=sp.PIPE,
+                       stderr=sp.DEVNULL, universal_newlines=True,
+                       env={k: str(v) for k, v in env['ENV'].items()})
+    except OSError:
+        return 0
+    output = child.stdout.strip()
+    if child.returncode == 0 and output.isdigit():
+        return int(output)
+    return 0
+
+
+def _slots(env, launcher):
+    slots = env.get('DISTCOMPILE_SLOTS')
+    if slots:
+        return int(slots)
+    slots = _launcher_slots(env, launcher)
+    if not slots:
+        slots = dc.host_slots(env['ENV'].get('DISTCC_HOSTS', ''))
+    return slots or os.cpu_count() or 1
+
+
+def _limit_function_actions():
+    """
+    Make Python function actions hold a local slot while they execute in
+    an environment whose SPAWN is a LocalPoolSpawner.
+    """
+    global _function_execute
+    if _function_execute is not None:
+        return
+    _function_execute = SCons.Action.FunctionAction.execute
+
+    def execute(self, target, source, env, *args, **kw):
+        spawn = env.get('SPAWN')
+        if not isinstance(spawn, dc.LocalPoolSpawner):
+            return _function_execute(self, target, source, env, *args, **kw)
+        with spawn.pool.slot():
+            return _function_execute(self, target, source, env, *args, **kw)
+
+    SCons.Action.FunctionAction.execute = execute
+
+
+def generate(env):
+    global _pool
+    variables = env.GlobalVariables()
+    if 'DISTCOMPILE' not in variables.keys():
+        variables.Add('DISTCOMPILE', """\
+Launcher to dispatch compiles to remote workers, such as distcc or icecc.
+Set it to loopback to test with local workers.""", '')
+        variables.Add('DISTCOMPILE_HOSTS',
+                      'The DISTCC_HOSTS setting for the launcher.', None)
+    variables.Update(env)
+    env.SetDefault(DISTCOMPILE_LOCAL_JOBS=os.cpu_count() or 1)
+
+    launcher = env.subst('$DISTCOMPILE')
+    if not launcher:
+        return
+    if launcher == 'loopback':
+        launcher = _loopback_launcher()
+        env['DISTCOMPILE'] = launcher
+    if env.get('DISTCOMPILE_HOSTS'):
+        env['ENV']['DISTCC_HOSTS'] = env.subst('$DISTCOMPILE_HOSTS')
+    env.PassEnv(r'DISTCC_.*')
+
+    compilercache = env.subst('$COMPILERCACHE') if 'COMPILERCACHE' in env \
+        else ''
+    for com in _compile_commands:
+        command = env.get(com)
+        if not SCons.Util.is_String(command) or \
+                command.startswith('$DISTCOMPILE '):
+            continue
+        if compilercache and command.startswith('$COMPILERCACHE '):
+            continue
+        env[com] = '$DISTCOMPILE ' + command
+    if compilercache:
+        env['ENV']['CCACHE_PREFIX'] = launcher
+
+    if _pool is None:
+        local_jobs = int(env['DISTCOMPILE_LOCAL_JOBS'])
+        slots = _slots(env, launcher)
+        if not _jobs_given():
+            SetOption('num_jobs', slots + local_jobs)
+        env.LogDebug("distcompile: %d slots, %d local jobs, -j %s" %
+                     (slots, local_jobs, GetOption('num_jobs')))
+        _pool = dc.LocalPool(local_jobs)
+        _limit_function_actions()
+    spawn = env['SPAWN']
+    if isinstance(spawn, dc.LocalPoolSpawner):
+        spawn = spawn.spawn
+    env['SPAWN'] = dc.LocalPoolSpawner(spawn, _pool.local_jobs,
+                                       [launcher, compilercache], _pool)
+
+
+def exists(env):
+    return env.WhereIs('distcc') or env.WhereIs('icecc')
@@ -54,10 +54,10 @@ The Doxyfile builder uses these environment variables:
 
     A dictionary of Doxygen configuration parameters which will be
     translated to Doxyfile form and included in the Doxyfile, after the
-    DOXYFILE_TEXT settings.  Parameters which specify files or directory
-    paths should be given relative to the source directory, then this
-    target adjusts them according to the target location of the generated
-    Doxyfile.
+    DOXYFILE_TEXT settings, in the order of the parameter names.  Values
+    can be strings, which are substituted in the environment, nodes, which
+    are replaced by their absolute paths, or lists or sets of them, which
+    are written as separately quoted values.
 
     The order of precedence is DOXYFILE_DICT, DOXYFILE_TEXT, and
     DOXYFILE_FILE.  In other words, parameter settings in DOXYFILE_DICT and
@@ -84,8 +84,22 @@ given defaults:
     env['DOXYGEN'] = 'doxygen'
     env['DOXYGEN_FLAGS'] = ''
     env['DOXYGEN_COM'] = '$DOXYGEN $DOXYGEN_FLAGS $SOURCE'
+    env['DOXYGEN_TAGS_FIRST'] = True
 @endcode
 
+Projects link to each other's documentation through tag files: one Doxyfile
+sets GENERATE_TAGFILE, and the others list that file in TAGFILES, which
+makes the tag file a dependency of their doxygen targets.  When
+DOXYGEN_TAGS_FIRST is true, a Doxyfile which sets GENERATE_TAGFILE gets two
+doxygen runs, each with a small config file next to the Doxyfile which
+includes it: Doxyfile.tags only generates the tag file, without any output
+or TAGFILES, and Doxyfile.main generates the output without the tag file.
+The tag file runs do not depend on each other, so all of them can start at
+once, and each project's main run only waits for the tag files it uses,
+rather than for all of the output of the projects it links to.  So with
+-j, something like "scons -j 8 apidocs" runs independent projects in
+parallel, and projects can even link to each other's tag files.
+
 Here are two typical examples for using the doxygen builders.  The first
 sets the PROJECT_NAME by passing it in the DOXYFILE_DICT construction
 variable.
@@ -171,13 +185,14 @@ site_scons/site_tools/doxygen.py.
 '''
 
 import os
-import hashlib
 import SCons
 import SCons.Node
+import SCons.Node.FS
+import SCons.Node.Python
+import SCons.Util
 from SCons.Script import Builder
 from SCons.Script import Action
 import shutil
-from fnmatch import fnmatch
 
 from io import StringIO
 
@@ -230,27 +245,93 @@ def apidocsdir(env):
     return docsdir
 
 
-def CheckMissingHeaders(subdir, doxfiles, ignores):
-
-    found = []
-    # print "Subdir: ", subdir
-    # print "Files: ", doxfiles
-    # print "Ignores: ", ignores
-    for root, dirs, files in os.walk(subdir):
-        files = filter(lambda f:
-                       not fnmatch(f, "moc_*")
-                       and not fnmatch(f, "ui_*")
-                       and not fnmatch(f, "*.ui*")
-                       and not fnmatch(f, "uic_*")
-                       and fnmatch(f, "*.h"), files)
-        found += [os.path.normpath(os.path.join(root, f)) for f in files]
-        if '.svn' in dirs:
-            dirs.remove('.svn')
-
-    known = [os.path.normpath(os.path.join(subdir, p))
-             for p in doxfiles + ignores]
-    missing = [f for f in found if f not in known]
-    missing.sort()
+# The header files and subdirectories found in each directory, and the
+# header inventories already collected, so each directory is only listed
+# once per scons run no matter how many Doxyfile targets check it.
+_header_dirs = {}
+_header_inventories = {}
+
+
+def _is_header(name):
+    "True if @p name is a header which is not generated by Qt."
+    return (name.endswith('.h') and '.ui' not in name and
+            not name.startswith(('moc_', 'ui_', 'uic_')))
+
+
+def _scan_header_dir(path, node):
+    """
+    Return the header file names and the (name, node) pairs of the
+    subdirectories in directory @p path, whose SCons node is @p node, if
+    there is one.  Hidden directories and variant directories, which hold
+    build output, are skipped.
+    """
+    try:
+        return _header_dirs[path]
+    except KeyError:
+        pass
+    headers = []
+    subdirs = []
+    entries = node.entries if node is not None else {}
+    try:
+        scan = list(os.scandir(path))
+    except OSError:
+        scan = []
+    for entry in scan:
+        name = entry.name
+        # Like os.walk(), do not descend into symlinked directories.
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            continue
+        if is_dir:
+            if name.startswith('.') or name == '__pycache__':
+                continue
+            child = entries.get(os.path.normcase(name))
+            if getattr(child, 'srcdir', None) is not None:
+                continue
+            subdirs.append((name, child))
+        elif _is_header(name):
+            headers.append(name)
+    _header_dirs[path] = (headers, subdirs)
+    return headers, subdirs
+
+
+def HeaderInventory(subdir, prune=()):
+    """
+    Return the set of header files under directory @p subdir, as
+    normalized paths relative to @p subdir, skipping the directories in
+    @p prune and the directories skipped by _scan_header_dir().  The result
+    is cached, so it should not be modified.
+    """
+    top = os.path.abspath(subdir)
+    prune = frozenset(os.path.abspath(p) for p in prune)
+    key = (top, prune)
+    if key in _header_inventories:
+        return _header_inventories[key]
+    found = set()
+    pending = [(top, '', SCons.Node.FS.get_default_fs().Dir(top))]
+    while pending:
+        path, relpath, node = pending.pop()
+        headers, subdirs = _scan_header_dir(path, node)
+        found.update(os.path.join(relpath, h) for h in headers)
+        for name, child in subdirs:
+            cpath = os.path.join(path, name)
+            if cpath not in prune:
+                pending.append((cpath, os.path.join(relpath, name), child))
+    found = frozenset(found)
+    _header_inventories[key] = found
+    return found
+
+
+def CheckMissingHeaders(subdir, doxfiles, ignores, prune=()):
+    """
+    Report and return the headers under @p subdir which are neither in
+    @p doxfiles nor in @p ignores, both given relative to @p subdir.
+    """
+    found = HeaderInventory(subdir, prune)
+    known = set(os.path.normpath(p) for p in doxfiles + ignores)
+    missing = sorted(os.path.normpath(os.path.join(subdir, f))
+                     for f in found - known)
     if len(missing) > 0:
         print("Header files missing in "+subdir+":")
         print("  "+"\n  ".join(missing))
@@ -271,16 +352,21 @@ def Doxyfile_Emitter(target, source, env):
 
     So the Doxyfile should be regenerated only if the Value node contents
     change, meaning environment settings or the source list have changed.
-    However, there are cases (such as in the Aeros source tree) where the
-    Doxyfile is always regenerated, apparently because SCons thinks the
-    Value node depenency changed even though it didn't.  The reason is
-    still a mystery, and the solution evades me.
+    There used to be cases (such as in the Aeros source tree) where the
+    Doxyfile was always regenerated, because the contents depended on things
+    which change from one scons run to the next, like the order of the
+    sources, the directory of the SConscript file when a node was first
+    converted to a string, or the order of python sets and the addresses of
+    python objects in DOXYFILE_DICT.  Doxyfile_contents() now avoids all of
+    those, and the Value node is a DoxyfileValue, whose signature is a hash
+    of the contents.  When the Doxyfile is regenerated anyway, the builder
+    reports which settings changed.
     """
     dprint("entering doxyfile_emitter(%s,%s):" %
            (",".join([str(t) for t in target]),
             ",".join([str(s) for s in source])))
     contents = Doxyfile_contents(target, source, env)
-    source = [env.Value(contents)]
+    source = [DoxyfileValue(contents, target[0])]
     try:
         source.append(env.File(env['DOXYFILE_FILE']))
         dprint("added Doxyfile dependency: " + str(source[-1]))
@@ -290,11 +376,48 @@ def Doxyfile_Emitter(target, source, env):
     if ddebug():
         dprint("leaving doxyfile_emitter: targets=(%s), sources=(%s)" %
                (",".join([str(t) for t in target]),
-                ",".join([hashlib.md5(str(s).encode()).hexdigest()
-                          for s in source])))
+                ",".join([s.get_csig() for s in source])))
     return target, source
 
 
+class DoxyfileValue(SCons.Node.Python.Value):
+    """
+    A Value node for the contents of a generated Doxyfile.  The signature
+    stored in the .sconsign file is a hash of the contents rather than the
+    whole Doxyfile, and the node is named after the Doxyfile it generates,
+    so the dependency keeps the same name when the contents change.
+    """
+
+    def __init__(self, contents, doxyfile):
+        SCons.Node.Python.Value.__init__(
+            self, contents, name="contents of " + doxyfile.get_abspath())
+
+    def get_csig(self, calc=None):
+        try:
+            return self.ninfo.csig
+        except AttributeError:
+            pass
+        csig = SCons.Util.hash_signature(self.get_text_contents())
+        self.get_ninfo().csig = csig
+        return csig
+
+
+def _find_value(nodes):
+    "Return the first Value node in @p nodes, or None."
+    for node in nodes:
+        if isinstance(node, SCons.Node.Python.Value):
+            return node
+    return None
+
+
+def _changed_settings(old, new):
+    "Return the names of the settings which differ between two Doxyfiles."
+    before = _parse_doxyfile_text(old)
+    after = _parse_doxyfile_text(new)
+    return sorted(key for key in set(before) | set(after)
+                  if before.get(key) != after.get(key))
+
+
 def Doxyfile_Builder(target, source, env):
     "The source node should be the Doxyfile contents generated in the emitter."
     docsdir = str(target[0].get_dir())
@@ -305,16 +428,43 @@ def Doxyfile_Builder(target, source, env):
             raise
     dprint(docsdir + " exists")
     doxyfile = target[0].get_abspath()
+    contents = _find_value(source).get_text_contents()
+    if os.path.exists(doxyfile):
+        with open(doxyfile) as ofile:
+            old = ofile.read()
+        changed = _changed_settings(old, contents)
+        if changed:
+            print("Doxyfile %s settings changed: %s" %
+                  (target[0], ", ".join(changed)))
+        else:
+            print("Doxyfile %s regenerated without any settings changed" %
+                  (target[0]))
     if ddebug() and os.path.exists(doxyfile):
         doxyfilebak = doxyfile + '.bak'
         shutil.move(doxyfile, doxyfilebak)
         dprint("saved original Doxyfile as %s" % (doxyfilebak))
     dprint("writing doxyfile: %s" % (doxyfile))
     dfile = open(doxyfile, "w")
-    dfile.write(source[-1].get_text_contents())
+    dfile.write(contents)
     dfile.close()
 
 
+def _doxyfile_values(env, value):
+    """
+    Convert a DOXYFILE_DICT value to the same list of strings every time:
+    nodes are replaced by their absolute paths, lists are flattened, and the
+    members of sets and dictionaries are sorted.
+    """
+    if isinstance(value, SCons.Node.Node):
+        return [value.get_abspath()]
+    if isinstance(value, (set, frozenset, dict)):
+        return sorted(v for member in value
+                      for v in _doxyfile_values(env, member))
+    if isinstance(value, (list, tuple)):
+        return [v for member in value for v in _doxyfile_values(env, member)]
+    return [env.subst(str(value))]
+
+
 def Doxyfile_contents(target, source, env):
     """
     Generate a standard Doxyfile for the Doxygen builder.  This builder expects
@@ -345,10 +495,10 @@ def Doxyfile_contents(target, source, env):
 
     A dictionary of Doxygen configuration parameters which will be
     translated to Doxyfile form and included in the Doxyfile, after the
-    DOXYFILE_TEXT settings.  Parameters which specify files or directory
-    paths should be given relative to the source directory, then this
-    target adjusts them according to the target location of the generated
-    Doxyfile.
+    DOXYFILE_TEXT settings, in the order of the parameter names.  Values
+    can be strings, which are substituted in the environment, nodes, which
+    are replaced by their absolute paths, or lists or sets of them, which
+    are written as separately quoted values.
 
     The order of precedence is DOXYFILE_DICT, DOXYFILE_TEXT, and
     DOXYFILE_FILE.  In other words, parameter settings in DOXYFILE_DICT and
@@ -366,7 +516,9 @@ def Doxyfile_contents(target, source, env):
     excluded explicitly from doxygen input.  The builder will check for
     any header files which are not either in the builder source or in
     the list of ignores.  Those header files will be reported as missing
-    and the build will fail.
+    and the build will fail.  The search skips hidden directories, variant
+    directories, and the APIDOCSDIR output directory, and each directory
+    is only listed once, even when several Doxyfiles check it.
 
     Here are examples of some of the Doxyfile configuration parameters
     which typically need to be set for each documentation target.  Unless
@@ -375,17 +527,23 @@ def Doxyfile_contents(target, source, env):
     PROJECT_NAME        Title of project, defaults to the source directory.
     PROJECT_NUMBER      Version string for the project.  Defaults to 1.0
 
+    The contents only depend on the settings and the sources, not on the
+    order of the sources or the directory of the SConscript file which
+    created the builder, so the Doxyfile is not regenerated unless
+    something actually changed.  The inputs are sorted absolute paths, and
+    the output directory is an absolute path.
     """
 
     dprint("entering doxyfile_contents...")
     subdir = source[0].get_dir()
-    docsdir = str(target[0].get_dir())
+    docsdir = target[0].get_dir().get_abspath()
 
     if 'DOXYFILE_IGNORES' in env:
         ignores = env['DOXYFILE_IGNORES']
-        if CheckMissingHeaders(subdir.get_path(env.Dir('#')),
+        if CheckMissingHeaders(subdir.get_abspath(),
                                [s.get_path(subdir) for s in source],
-                               ignores):
+                               ignores, [env.Dir(env['APIDOCSDIR'])
+                                         .get_abspath()]):
             return -1
 
     doxyfile = None
@@ -449,24 +607,26 @@ EXTENSION_MAPPING = no_extension=C++ dox=C++
     # These are defaults which can be overridden by the DOXYFILE_TEXT
     # or DOXYFILE_DICT sections below.
     #
-    dfile.write("PROJECT_NAME           = %s\n" % subdir)
+    dfile.write("PROJECT_NAME           = %s\n" %
+                (subdir.get_path(env.Dir('#'))))
     dfile.write("PROJECT_NUMBER         = \"Version 0.1\"\n")
 
     # Further customizations which can override the settings above.
     if doxyfile:
-        ifile = open(doxyfile.path)
+        ifile = open(doxyfile.get_abspath())
         dfile.write(ifile.read())
         ifile.close()
 
     # The rest are not defaults.  They are required for things to be put
     # into the right places, thus they are last.
     #
+    # Source files named Doxyfile or index.html are not inputs.
+    inputs = set(os.path.normpath(s.get_abspath()) for s in source
+                 if (not doxyfile or s.path != doxyfile.path) and
+                 s.name != 'index.html')
     dfile.write("INPUT                  = \\\n")
-    for s in source:
-        # Source files named Doxyfile or index.html are not inputs.
-        if ((not doxyfile or
-             s.path != doxyfile.path) and (s.name != 'index.html')):
-            dfile.write("%s \\\n" % s.get_abspath())
+    for ip in sorted(inputs):
+        dfile.write("%s \\\n" % ip)
 
     dfile.write("\n")
     outputdir = docsdir
@@ -482,8 +642,11 @@ EXTENSION_MAPPING = no_extension=C++ dox=C++
     #
     dfile.write(env.subst(env['DOXYFILE_TEXT']))
 
-    for k, v in env['DOXYFILE_DICT'].items():
-        dfile.write('%s = "%s"\n' % (k, env.subst(str(v))))
+    doxdict = env['DOXYFILE_DICT']
+    for k in sorted(doxdict):
+        values = _doxyfile_values(env, doxdict[k])
+        dfile.write('%s = %s\n' % (k, " ".join(['"%s"' % (v)
+                                                 for v in values])))
 
     dprint("leaving doxyfile_contents.")
     doxyfile = dfile.getvalue()
@@ -495,26 +658,28 @@ def doxyfile_message(target, source, env):
     return "creating Doxygen config file '%s'" % target[0]
 
 
-doxyfile_variables = [
-    'DOXYFILE_TEXT',
-    'DOXYFILE_DICT',
-    'DOXYFILE_FILE',
-    ]
-
-
-doxyfile_action = Action(Doxyfile_Builder, doxyfile_message,
-                         varlist=doxyfile_variables)
+# The DOXYFILE_TEXT, DOXYFILE_DICT and DOXYFILE_FILE settings are part of
+# the Doxyfile contents in the DoxyfileValue source, so they are not in the
+# action signature too, where DOXYFILE_DICT would be converted to a string
+# which can differ between runs.
+doxyfile_action = Action(Doxyfile_Builder, doxyfile_message)
 
 doxyfile_builder = Builder(action=doxyfile_action,
                            emitter=Doxyfile_Emitter)
 
 
+doxygen_action = Action(['$DOXYGEN_COM'])
+
+
 def _parse_doxyfile(dfilenode):
     "Parse a Doxyfile into a dictionary."
-    parms = {}
     dprint("parsing doxyfile...")
+    return _parse_doxyfile_text(dfilenode.get_text_contents())
 
-    contents = dfilenode.get_text_contents()
+
+def _parse_doxyfile_text(contents):
+    "Parse the text of a Doxyfile into a dictionary."
+    parms = {}
     dfile = StringIO(contents)
     lines = dfile.readlines()
     dfile.close()
@@ -538,6 +703,67 @@ def _parse_doxyfile(dfilenode):
     return parms
 
 
+def _top_path(path):
+    """
+    Doxygen runs in the top directory, so relative paths in a Doxyfile are
+    relative to the top directory rather than the SConscript directory.
+    """
+    if os.path.isabs(path) or path.startswith('#'):
+        return path
+    return '#' + path
+
+
+def _write_config(target, source, env):
+    with open(target[0].get_abspath(), 'w') as cfile:
+        cfile.write(source[0].read())
+    return None
+
+
+_config_action = Action(_write_config,
+                        "creating Doxygen config file '$TARGET'")
+
+# Settings for the doxygen run which only generates a tag file.  The other
+# projects' tag files are not needed to generate this one, so all the tag
+# file runs can start at once.
+_tags_only = """
+GENERATE_HTML          = NO
+GENERATE_LATEX         = NO
+GENERATE_RTF           = NO
+GENERATE_MAN           = NO
+GENERATE_XML           = NO
+GENERATE_DOCBOOK       = NO
+SOURCE_BROWSER         = NO
+HAVE_DOT               = NO
+TAGFILES               =
+"""
+
+
+def _split_tagfile(env, source, inputs, tagfile):
+    """
+    Build the tag file of the Doxyfile in @p source with its own doxygen
+    run, which only depends on the Doxyfile and the @p inputs, and return
+    the sources for the main run, which is given a config which does not
+    generate the tag file again.  Both configs include the Doxyfile and
+    override a few settings.
+    """
+    doxyfile = source[0]
+    include = '@INCLUDE = "%s"\n' % (doxyfile.get_abspath())
+    tagconfig = doxyfile.get_dir().File(doxyfile.name + '.tags')
+    env.Command(tagconfig,
+                env.Value(include + _tags_only +
+                          "GENERATE_TAGFILE       = %s\n" % (tagfile)),
+                _config_action)
+    tagnode = env.File(_top_path(tagfile))
+    env.Command(tagnode, [tagconfig, doxyfile] + inputs, doxygen_action)
+    dprint("doxygen_emitter: tag file %s generated by %s" %
+           (str(tagnode), str(tagconfig)))
+    mainconfig = doxyfile.get_dir().File(doxyfile.name + '.main')
+    env.Command(mainconfig,
+                env.Value(include + "GENERATE_TAGFILE       =\n"),
+                _config_action)
+    return [mainconfig] + source
+
+
 def Doxygen_Emitter(target, source, env):
     """
     Add the output HTML index file as the doxygen target, representative of
@@ -562,12 +788,7 @@ def Doxygen_Emitter(target, source, env):
     # yet, otherwise SCons rebuilds the doxygen target unnecessarily just
     # because the dependencies get added after the Doxyfile exists.
 
-    children = source[0].children(scan=0)
-    dfilenode = None
-    for cnode in children:
-        if isinstance(cnode, SCons.Node.Python.Value):
-            dfilenode = cnode
-            break
+    dfilenode = _find_value(source[0].children(scan=0))
     if dfilenode:
         dprint("doxyfile contents found in Value node")
     else:
@@ -587,11 +808,16 @@ def Doxygen_Emitter(target, source, env):
     inputs = dfile.get('INPUT', "")
     dprint("%s: INPUT=%s" % (source[0].get_abspath(), inputs))
     inputs = inputs.split()
+    inputnodes = []
     for ip in inputs:
-        if os.path.isdir(ip):
-            source.append(env.Dir(ip))
+        # Relative inputs are relative to the top directory, not to the
+        # SConscript directory which is current while the emitter runs.
+        ip = _top_path(ip)
+        if os.path.isdir(env.Entry(ip).get_abspath()):
+            inputnodes.append(env.Dir(ip))
         else:
-            source.append(env.File(ip))
+            inputnodes.append(env.File(ip))
+    source.extend(inputnodes)
 
     # Tagfiles are also dependencies, and they are especially important
     # because inter-project links will not work if the subproject's tag
@@ -602,7 +828,7 @@ def Doxygen_Emitter(target, source, env):
         # A tag file is a dependency no matter what.  Either it is being
         # generated from this source tree, or it must already exist.
         (tagfile, equals, locn) = spec.partition('=')
-        tagnode = env.File(tagfile)
+        tagnode = env.File(_top_path(tagfile))
         dprint("found tagfile specifier: %s, adding tagfile source: %s" %
                (spec, str(tagnode)))
         source.append(tagnode)
@@ -618,20 +844,22 @@ def Doxygen_Emitter(target, source, env):
     # html output) unless an explicit target was provided.
     t = target
     if str(target[0]) == str(source[0]):
-        t = [env.File(os.path.join(html, "index.html"))]
+        t = [env.File(_top_path(os.path.join(html, "index.html")))]
         dprint("doxygen_emitter: target set to %s" % (str(t[0])))
 
-    # This builder may also generate a tag file.
+    # This builder may also generate a tag file.  Unless disabled, the tag
+    # file is generated by a separate doxygen run, so the projects which
+    # link to this one do not have to wait for all of its output.
     tagfile = dfile.get('GENERATE_TAGFILE')
-    if tagfile:
-        t.append(env.File(tagfile))
+    if tagfile and env.get('DOXYGEN_TAGS_FIRST'):
+        source = _split_tagfile(env, source, inputnodes, tagfile)
+    elif tagfile:
+        t.append(env.File(_top_path(tagfile)))
 
     dprint("leaving Doxygen_Emitter")
     return t, source
 
 
-doxygen_action = Action(['$DOXYGEN_COM'])
-
 doxygen_builder = Builder(action=doxygen_action,
                           emitter=Doxygen_Emitter)
 
@@ -759,6 +987,7 @@ def generate(env):
     env.SetDefault(DOXYGEN='doxygen')
     env.SetDefault(DOXYGEN_FLAGS='')
     env.SetDefault(DOXYGEN_COM='$DOXYGEN $DOXYGEN_FLAGS $SOURCE')
+    env.SetDefault(DOXYGEN_TAGS_FIRST=True)
     env.SetDefault(APIDOCSDIR='#apidocs')
     env.AddMethod(Apidocs, "Apidocs")
     env.AddMethod(ApidocsDisable, "ApidocsDisable")
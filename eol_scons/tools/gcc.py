@@ -16,8 +16,32 @@ AsanFilter() can be replaced with just the same command.  The
 SanitizeSupported() method has been removed also, since afaik it was never
 used, and the same can be achieved by just checking for the existence of the
 required method, eg, hasattr(env, 'SanitizeAddress').
+
+The PrecompiledHeader() method precompiles a header with the compile flags
+of the environment, and adds the flags to include it in every C++ object
+(or C object, with language='c') built by the environment:
+
+    env.PrecompiledHeader('qtheaders.h')
+
+The header is included through a stub header in a pch/<hash> subdirectory,
+where <hash> identifies the compile flags at the time of the call, so
+environments with different flags get their own precompiled header.  The
+pch directory is in the variant directory when the SConscript is read with
+one, otherwise in $BUILD_DIR, which defaults to build in the top directory,
+so precompiled headers are not written into the source tree.  Set PCHDIR to
+use some other directory instead of pch.  The
+stub includes the real header, so if the precompiled header cannot be used,
+gcc warns with -Winvalid-pch and compiles the header as usual.  The objects
+depend on the precompiled header, which is rebuilt whenever the flags
+change.  Call it after the compile flags have been set.  Pass shared=True to
+precompile with the shared object flags instead, if the environment builds
+shared libraries and the static flags do not include -fPIC.
 """
 
+import hashlib
+
+import SCons.Action
+import SCons.Builder
 import SCons.Tool
 import SCons.Tool.gcc
 
@@ -60,6 +84,97 @@ def SanitizeThread(env):
     return env
 
 
+# The variables used for each language: the flags variable which includes
+# the precompiled header flags, the variable holding them, the compile
+# command and the gcc language name.
+_pch_languages = {
+    'c++': ('CXXFLAGS', 'CXXPCHFLAGS', 'CXXPCH',
+            '$CXX -x c++-header -o $TARGET -c $CXXFLAGS $CCFLAGS $_CCCOMCOM '
+            '$SOURCE',
+            '$SHCXX -x c++-header -o $TARGET -c $SHCXXFLAGS $SHCCFLAGS '
+            '$_CCCOMCOM $SOURCE'),
+    'c': ('CFLAGS', 'CPCHFLAGS', 'CPCH',
+          '$CC -x c-header -o $TARGET -c $CFLAGS $CCFLAGS $_CCCOMCOM $SOURCE',
+          '$SHCC -x c-header -o $TARGET -c $SHCFLAGS $SHCCFLAGS $_CCCOMCOM '
+          '$SOURCE'),
+}
+
+
+def _write_pch_stub(target, source, env):
+    with open(target[0].get_abspath(), 'w') as stub:
+        stub.write(source[0].read())
+    return None
+
+
+_pch_stub_action = SCons.Action.Action(_write_pch_stub, "Generating $TARGET")
+
+
+def _pch_emitter(target, source, env):
+    "Make objects depend on the precompiled header for their language."
+    if source and source[0].get_suffix() == '.c':
+        pch = env.get('CPCH')
+    else:
+        pch = env.get('CXXPCH')
+    if pch:
+        env.Depends(target, pch)
+    return target, source
+
+
+def _add_pch_emitters(env):
+    """
+    Chain the precompiled header emitter onto the object emitters for C and
+    C++ sources.  The object builders are shared between environments, but
+    the emitter does nothing unless the environment has a precompiled
+    header.
+    """
+    for builder in SCons.Tool.createObjBuilders(env):
+        for suffix, emitter in list(builder.emitter.items()):
+            if suffix in ('.f', '.s', '.asm', '.d') or \
+                    getattr(emitter, 'pch_chained', False):
+                continue
+            chained = SCons.Builder.ListEmitter([emitter, _pch_emitter])
+            chained.pch_chained = True
+            builder.emitter[suffix] = chained
+
+
+def _pch_dir(env):
+    "Return the directory for the precompiled headers of @p env."
+    if env.get('PCHDIR'):
+        return env.Dir(env.subst('$PCHDIR'))
+    cwd = env.Dir('.')
+    if cwd.srcnode() is not cwd:
+        return cwd.Dir('pch')
+    return env.Dir(env.subst(env.get('BUILD_DIR', '#build'))).Dir('pch')
+
+
+def PrecompiledHeader(env, header, language='c++', shared=False):
+    """
+    Precompile @p header with the current compile flags and include it in
+    all the objects for @p language built with this environment.  Return
+    the precompiled header node.
+    """
+    flagsvar, pchvar, nodevar, command, shcommand = _pch_languages[language]
+    if shared:
+        command = shcommand
+    header = env.File(header)
+    env[pchvar] = []
+    flags = env.subst(command, target=[], source=[])
+    digest = hashlib.md5((flags + header.get_abspath()).encode()).hexdigest()
+    pchdir = _pch_dir(env).Dir(digest[:8])
+    stub = pchdir.File(header.name)
+    env.Command(stub, env.Value('#include "%s"\n' % (header.get_abspath())),
+                _pch_stub_action)
+    gch = env.Command(pchdir.File(header.name + '.gch'), stub,
+                      SCons.Action.Action(command, "Precompiling $SOURCE"),
+                      **{pchvar: []})
+    env.Depends(gch, header)
+    env[pchvar] = ['-Winvalid-pch', '-include', stub]
+    env[nodevar] = gch
+    env.AppendUnique(**{flagsvar: ['$' + pchvar]})
+    _add_pch_emitters(env)
+    return gch
+
+
 def generate(env):
     SCons.Tool.gcc.generate(env)
     env.AddMethod(Optimize)
@@ -68,6 +183,7 @@ def generate(env):
     env.AddMethod(Profile)
     env.AddMethod(SanitizeAddress)
     env.AddMethod(SanitizeThread)
+    env.AddMethod(PrecompiledHeader)
 
 
 def exists(env):
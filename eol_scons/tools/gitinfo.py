@@ -47,19 +47,41 @@ is specified. However, GitInfo does not currently use the source directory in
 any way. It was useful for the earlier svninfo tool, since subversion
 versioning information is dependent upon the directory that svn info is
 applied to. The convention has been retained in gitinfo, as there may be a
-need for this later.
+need for this later.  The 'workdir' option of the 'gitdirty' variable does
+use it, to limit the dirty check to files under the working directory.
+
+Projects with several repositories, such as submodules or vendored trees,
+can gather the info for all of them concurrently before any GitInfo
+builders are called:
+
+    env.PreloadGitInfo(['#', '#/vendor/lib'])
+
+With no arguments, PreloadGitInfo() loads the top directory and all of the
+git submodules listed in .gitmodules files beneath it.  The directories in
+GITINFO_WORKDIRS, if set when the tool is first applied, are preloaded
+along with the top directory.
+
+The 'gitdirty' variable selects options to speed up the check for modified
+files on large working trees, such as gitdirty=tracked to ignore untracked
+files.  See GIT_DIRTY_CHECK in the GitInfo class.  Run with
+eolsconsdebug=gitinfo to print how long the git commands take.
 """
 
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 
 from SCons.Builder import Builder
 from SCons.Script import BoolVariable
+from SCons.Script import ListVariable
 from SCons.Script import COMMAND_LINE_TARGETS
+from SCons.Script import ARGUMENTS
 from SCons.Action import Action
 from SCons.Node import FS
 from SCons.Node.Python import Value
 import SCons.Warnings
-from eol_scons.gitinfo import GitInfo
+from eol_scons.gitinfo import GitInfo, DIRTY_CHECKS
+from eol_scons.debug import LookupDebug
 
 # Set to 1 to enable debugging output
 _debug = 0
@@ -147,6 +169,9 @@ def _load_gitinfo(env, workdir, target=None):
     elif env.get("gitinfo", True):
         pdebug('...loading repo info with git...')
         ginfo.getRepoInfo(workdir)
+        if LookupDebug('gitinfo'):
+            print("gitinfo: timings for %s:" % (workdir))
+            ginfo.dumpTimings()
     elif target:
         path = str(target[0])
         print("Loading repo info from header: %s" % (path))
@@ -237,7 +262,17 @@ def generate(env):
                   "This is useful for building from source distributions "
                   "which already contain generated version files.",
                   default=True))
+    if 'gitdirty' not in variables.keys():
+        variables.Add(ListVariable("gitdirty", """\
+Options to speed up the check for modified files in the git working tree:
+tracked ignores untracked files, cached uses the git untracked cache and
+fsmonitor, and workdir only checks files under the gitinfo directory.""",
+                                   "none", DIRTY_CHECKS))
     variables.Update(env)
+    # A GIT_DIRTY_CHECK set in the environment is only overridden when the
+    # gitdirty variable is given on the command line.
+    if 'gitdirty' in ARGUMENTS or 'GIT_DIRTY_CHECK' not in env:
+        env['GIT_DIRTY_CHECK'] = list(env['gitdirty'])
 
     gitinfobuilder = Builder(
         action=Action(gitinfo_build_value, gitinfo_action_print),
@@ -247,6 +282,9 @@ def generate(env):
     env['GIT'] = "git"
 
     env.AddMethod(LoadGitInfo, "LoadGitInfo")
+    env.AddMethod(PreloadGitInfo, "PreloadGitInfo")
+    if env.get('GITINFO_WORKDIRS'):
+        env.PreloadGitInfo(['#'] + env.Flatten(env['GITINFO_WORKDIRS']))
     env.LoadGitInfo('#')
 
 
@@ -262,6 +300,63 @@ def LoadGitInfo(env, source, target=None):
     _load_gitinfo(env, workdir, target)
 
 
+def _find_submodules(workdir):
+    """
+    Return the paths of the git submodules under @p workdir, listed in its
+    .gitmodules file and recursively in the submodules' own .gitmodules.
+    """
+    workdirs = []
+    try:
+        with open(os.path.join(workdir, '.gitmodules')) as gm:
+            text = gm.read()
+    except OSError:
+        return workdirs
+    for path in re.findall(r"^\s*path\s*=\s*(.+?)\s*$", text, re.M):
+        subdir = os.path.normpath(os.path.join(workdir, path))
+        if os.path.exists(os.path.join(subdir, '.git')):
+            workdirs.append(subdir)
+            workdirs.extend(_find_submodules(subdir))
+    return workdirs
+
+
+def PreloadGitInfo(env, sources=None, jobs=None):
+    """
+    Gather the git info for several working directories concurrently, so
+    later calls to LoadGitInfo() and the GitInfo builder for those
+    directories use the cached results instead of running git one
+    directory at a time.  @p sources is a list of directories, or None to
+    load the top directory and its git submodules.  @p jobs is the number
+    of threads, by default one per directory up to the number of CPUs.
+    Nothing is loaded if gitinfo is disabled.
+    """
+    if not env.get("gitinfo", True):
+        return
+    if sources is None:
+        top = env.Dir('#').get_abspath()
+        workdirs = [top] + _find_submodules(top)
+    else:
+        workdirs = [_get_workdir(env, [env.Dir(s)]) for s in
+                    env.Flatten(sources)]
+    pending = []
+    for workdir in workdirs:
+        ginfo = _gitinfomap.get(workdir)
+        if ginfo is None:
+            ginfo = _create_gitinfo(env, workdir)
+        if not ginfo.repopath and (workdir, ginfo) not in pending:
+            pending.append((workdir, ginfo))
+    if not pending:
+        return
+    jobs = jobs or min(len(pending), os.cpu_count() or 1)
+    pdebug("gitinfo: preloading %d workdirs with %d threads" %
+           (len(pending), jobs))
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        list(pool.map(lambda p: p[1].getRepoInfo(p[0]), pending))
+    if LookupDebug('gitinfo'):
+        for workdir, ginfo in pending:
+            print("gitinfo: timings for %s:" % (workdir))
+            ginfo.dumpTimings()
+
+
 def exists(env):
     git = env.WhereIs('git')
     if not git:
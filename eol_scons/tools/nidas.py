@@ -64,10 +64,9 @@ both cases, so that the same SConscript can work either way.
 
 import sys
 import os
-import subprocess as sp
-import re
 import eol_scons
 import eol_scons.parseconfig as pc
+import eol_scons.ldd as ldd
 import sharedlibrary
 import SCons.Warnings
 from SCons.Script.SConscript import global_exports
@@ -205,10 +204,8 @@ def _NidasRuntimeENV(env):
 
 
 def _check_nc_server(env, lib):
-    lddcmd = ["ldd", lib]
-    lddprocess = sp.Popen(lddcmd, stdout=sp.PIPE, env=env['ENV'])
-    lddout = lddprocess.communicate()[0]
-    return bool(re.search('libnc_server_rpc', lddout))
+    deps = ldd.shared_dependencies(lib, env['ENV'].get('LD_LIBRARY_PATH'))
+    return any('libnc_server_rpc' in name for name in (deps or {}))
 
 
 def _resolve_libpaths(env, paths):
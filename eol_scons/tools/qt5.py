@@ -36,6 +36,14 @@ fail.
 The qt5 tool must be included first to force all the subsequent qt modules to
 be applied as qt5 modules.  The distinctions are in the location of the header
 files and the version-qualified library names like libQt5<Module>.
+
+Headers with Q_OBJECT are found automatically when building programs and
+libraries, and the generated moc sources are each compiled to an object.
+Large applications can instead compile the moc sources together in a few
+consolidated units by setting QT_MOCS_PER_COMPILATION to the maximum number
+of moc sources in each unit:
+
+    env['QT_MOCS_PER_COMPILATION'] = 20
 """
 
 import sys
@@ -55,6 +63,8 @@ import eol_scons.debug as esd
 from eol_scons import Debug
 
 from eol_scons.qt_utils import qualify_module_name, replace_drive_specs
+from eol_scons.qt_utils import pkgconfig_flags, mocs_compilation
+from eol_scons.qt_utils import append_emitters
 
 _options = None
 USE_PKG_CONFIG = "Using pkg-config"
@@ -153,6 +163,11 @@ class _Automoc:
         # make a deep copy for the result; MocH objects will be appended
         out_sources = source[:]
 
+        # If set, the moc sources are compiled together in units of up to
+        # this many sources, rather than each one to its own object.
+        unitsize = int(env.subst('$QT_MOCS_PER_COMPILATION') or 0)
+        mocs = []
+
         Debug("%s: scanning [%s] for Q_OBJECT sources to add targets "
               "to [%s]." %
               (self.objBuilderName,
@@ -206,8 +221,11 @@ class _Automoc:
                       (str(h), str(cpp)), env)
                 # h file with the Q_OBJECT macro found -> add moc_cpp
                 moc_cpp = env.Moc5(h)
-                moc_o = objBuilder(moc_cpp)
-                out_sources.append(moc_o)
+                if unitsize > 0:
+                    mocs.extend(moc_cpp)
+                else:
+                    moc_o = objBuilder(moc_cpp)
+                    out_sources.append(moc_o)
                 # moc_cpp.target_scanner = SCons.Defaults.CScan
                 Debug("scons: qt5: found Q_OBJECT macro in '%s', "
                       "moc'ing to '%s'" % (str(h), str(moc_cpp)), env)
@@ -221,6 +239,10 @@ class _Automoc:
                 Debug("scons: qt5: found Q_OBJECT macro in '%s', "
                       "moc'ing to '%s'" % (str(cpp), str(moc)), env)
                 # moc.source_scanner = SCons.Defaults.CScan
+        if mocs:
+            out_sources.extend(mocs_compilation(
+                env, objBuilder, target, mocs, unitsize,
+                shared=(self.objBuilderName == 'SharedObject')))
         # restore the original env attributes (FIXME)
         objBuilder.env = objBuilderEnv
         env.Moc5.env = mocBuilderEnv
@@ -434,6 +456,10 @@ def generate(env):
     # Should the qt5 tool try to figure out which sources are to be moc'ed ?
     env['QT_AUTOSCAN'] = 1
 
+    # Set to a number of moc sources to compile them together in units of
+    # that size, named <target>_mocs_compilation_<N>.cpp.
+    env.SetDefault(QT_MOCS_PER_COMPILATION=0)
+
     # Some QT specific flags. I don't expect someone wants to
     # manipulate those ...
     env['QT5_UICDECLFLAGS'] = ''
@@ -493,9 +519,9 @@ def generate(env):
     #                 # Of course, we need to link against the qt5 libraries
     #                 CPPPATH=[os.path.join('$QT5DIR', 'include')],
     #                 LIBPATH=[os.path.join('$QT5DIR', 'lib')],
-    env.AppendUnique(PROGEMITTER=[AutomocStatic],
-                     SHLIBEMITTER=[AutomocShared],
-                     LIBEMITTER=[AutomocStatic])
+    append_emitters(env, PROGEMITTER=AutomocStatic,
+                    SHLIBEMITTER=AutomocShared,
+                    LIBEMITTER=AutomocStatic)
 
     # Qt5 requires PIC.  This may have to be adjusted by platform and
     # compiler.
@@ -558,21 +584,52 @@ def enable_modules(env, modules, debug=False):
         env.LogDebug("QT5DIR not set, cannot enable module.")
         return False
 
-    onefailed = False
     for module in modules:
         if module.startswith('Qt5'):
             raise SCons.Errors.StopError(
                 "Qt module names should not be qualified with "
                 "the version: %s" % (module))
+
+    merged = []
+    if (env['PLATFORM'] in ['posix', 'msys', 'win32', 'cygwin'] or
+            sys.platform == "darwin"):
+        merged = _merge_pkgconfig_modules(env, modules, debug)
+
+    onefailed = False
+    for module in modules:
         ok = False
         if env['PLATFORM'] in ['posix', 'msys', 'win32', 'cygwin']:
-            ok = enable_module_linux(env, module, debug)
+            ok = enable_module_linux(env, module, debug, module in merged)
         if sys.platform == "darwin":
-            ok = enable_module_osx(env, module, debug)
+            ok = enable_module_osx(env, module, debug, module in merged)
         onefailed = onefailed or not ok
     return onefailed
 
 
+def _merge_pkgconfig_modules(env, modules, debug=False):
+    """
+    When Qt is found with pkg-config, merge the flags for all of @p modules
+    into @p env from a single pkg-config command, and return the list of
+    modules merged.  If pkg-config fails for the whole set, return an empty
+    list, so each module is tried separately and the missing ones can be
+    reported and handled.
+    """
+    if env['QT5DIR'] != USE_PKG_CONFIG or len(modules) < 2:
+        return []
+    suffix = "_debug" if debug else ""
+    packages = [qualify_module_name(module + suffix, 'Qt5')
+                for module in modules]
+    flags = pkgconfig_flags(env, packages)
+    if flags is None:
+        return []
+    env.LogDebug("Before qt5 mergeflags %s: %s" %
+                 (",".join(packages), esd.Watches(env)))
+    env.MergeFlags(flags, unique=1)
+    env.LogDebug("After qt5 mergeflags %s: %s" %
+                 (",".join(packages), esd.Watches(env)))
+    return list(modules)
+
+
 _qt5_header_path = None
 
 
@@ -597,14 +654,15 @@ def get_header_path(env):
     return hdir
 
 
-def enable_module_linux(env, module, debug=False):
+def enable_module_linux(env, module, debug=False, merged=False):
     """
     On Linux, a Qt5 module is enabled either with the settings from
     pkg-config or else the settings are generated manually here.  The Qt
     module name does not contain the version, however the pkg-config
     packages *are* qualified with a version, so that is handled here.
     Likewise the library names include a version, so that is handled if a
-    library must be added manually, without pkg-config.
+    library must be added manually, without pkg-config.  If @p merged is
+    True, the pkg-config flags have already been merged for this module.
     """
     if debug:
         module = module + "_debug"
@@ -616,27 +674,30 @@ def enable_module_linux(env, module, debug=False):
         modpackage = qualify_module_name(module, 'Qt5')
         hdir = get_header_path(env)
 
-        # The pkg-config should at least return a library name, so if
-        # RunConfig() returns nothing, treat that the same as if a
-        # CheckConfig() had failed, to avoid running pkg-config twice.
-        pkgc = 'pkg-config --cflags --libs ' + modpackage
-        cflags = pc.RunConfig(env, pkgc)
-        if cflags:
-            env.LogDebug("Before qt5 mergeflags '%s': %s" %
-                         (pkgc, esd.Watches(env)))
-            env.MergeFlags(cflags, unique=1)
-            env.LogDebug("After qt5 mergeflags '%s': %s" %
-                         (cflags, esd.Watches(env)))
+        if merged:
+            Debug("pkg-config flags for %s already merged" % (modpackage), env)
         else:
-            # warn if we haven't already
-            if module not in no_pkgconfig_warned:
-                print("Warning: No pkgconfig package " + modpackage +
-                      " for Qt5/" + module + ", doing what I can...")
-                no_pkgconfig_warned.append(module)
-            # By default, the libraries are named with prefix Qt5
-            # rather than Qt, just like the module package name we
-            # built above.
-            env.Append(LIBS=[modpackage])
+            # The pkg-config should at least return a library name, so if
+            # RunConfig() returns nothing, treat that the same as if a
+            # CheckConfig() had failed, to avoid running pkg-config twice.
+            pkgc = 'pkg-config --cflags --libs ' + modpackage
+            cflags = pc.RunConfig(env, pkgc)
+            if cflags:
+                env.LogDebug("Before qt5 mergeflags '%s': %s" %
+                             (pkgc, esd.Watches(env)))
+                env.MergeFlags(cflags, unique=1)
+                env.LogDebug("After qt5 mergeflags '%s': %s" %
+                             (cflags, esd.Watches(env)))
+            else:
+                # warn if we haven't already
+                if module not in no_pkgconfig_warned:
+                    print("Warning: No pkgconfig package " + modpackage +
+                          " for Qt5/" + module + ", doing what I can...")
+                    no_pkgconfig_warned.append(module)
+                # By default, the libraries are named with prefix Qt5
+                # rather than Qt, just like the module package name we
+                # built above.
+                env.Append(LIBS=[modpackage])
 
         # On MSYS2 pkg-config is returning C: in the path, which scons then
         # adds a prefix (e.g. "plotlib/" in aeros).  Replace C: with /c,
@@ -728,7 +789,7 @@ def enable_module_win(env, module, debug=False):
     return True
 
 
-def enable_module_osx(env, module, debug=False):
+def enable_module_osx(env, module, debug=False, merged=False):
     """
     Use the frameworks on OSX.  Homebrew installs the frameworks in
     /usr/local/opt.  There is no support for enabling debug modules as on
@@ -738,7 +799,7 @@ def enable_module_osx(env, module, debug=False):
         print("Enabling debug for Qt5 modules has no effect on OSX.")
 
     # At this time we believe we can just use the enable_module_linux.
-    return enable_module_linux(env, module, debug)
+    return enable_module_linux(env, module, debug, merged)
 
 
 def deploy_linux(env):
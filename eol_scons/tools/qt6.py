@@ -36,6 +36,14 @@ fail.
 The qt6 tool must be included first to force all the subsequent qt modules
 to be applied as qt6 modules.  The biggest difference is the location of the
 header files and the version-qualified library names like libQt6<Module>.
+
+Headers with Q_OBJECT are found automatically when building programs and
+libraries, and the generated moc sources are each compiled to an object.
+Large applications can instead compile the moc sources together in a few
+consolidated units by setting QT_MOCS_PER_COMPILATION to the maximum number
+of moc sources in each unit:
+
+    env['QT_MOCS_PER_COMPILATION'] = 20
 """
 
 # Notes on install locations for each environment
@@ -88,6 +96,8 @@ import eol_scons.debug as esd
 from eol_scons import Debug
 
 from eol_scons.qt_utils import qualify_module_name, replace_drive_specs
+from eol_scons.qt_utils import pkgconfig_flags, mocs_compilation
+from eol_scons.qt_utils import append_emitters
 
 _options = None
 USE_PKG_CONFIG = "Using pkg-config"
@@ -191,6 +201,11 @@ class _Automoc:
         # make a deep copy for the result; MocH objects will be appended
         out_sources = source[:]
 
+        # If set, the moc sources are compiled together in units of up to
+        # this many sources, rather than each one to its own object.
+        unitsize = int(env.subst('$QT_MOCS_PER_COMPILATION') or 0)
+        mocs = []
+
         Debug("%s: scanning [%s] for Q_OBJECT sources to add targets "
               "to [%s]." %
               (self.objBuilderName,
@@ -244,8 +259,11 @@ class _Automoc:
                       (str(h), str(cpp)), env)
                 # h file with the Q_OBJECT macro found -> add moc_cpp
                 moc_cpp = env.Moc6(h)
-                moc_o = objBuilder(moc_cpp)
-                out_sources.append(moc_o)
+                if unitsize > 0:
+                    mocs.extend(moc_cpp)
+                else:
+                    moc_o = objBuilder(moc_cpp)
+                    out_sources.append(moc_o)
                 # moc_cpp.target_scanner = SCons.Defaults.CScan
                 Debug("scons: qt6: found Q_OBJECT macro in '%s', "
                       "moc'ing to '%s'" % (str(h), str(moc_cpp)), env)
@@ -259,6 +277,10 @@ class _Automoc:
                 Debug("scons: qt6: found Q_OBJECT macro in '%s', "
                       "moc'ing to '%s'" % (str(cpp), str(moc)), env)
                 # moc.source_scanner = SCons.Defaults.CScan
+        if mocs:
+            out_sources.extend(mocs_compilation(
+                env, objBuilder, target, mocs, unitsize,
+                shared=(self.objBuilderName == 'SharedObject')))
         # restore the original env attributes (FIXME)
         objBuilder.env = objBuilderEnv
         env.Moc6.env = mocBuilderEnv
@@ -481,6 +503,10 @@ def generate(env):
     # Should the qt6 tool try to figure out which sources are to be moc'ed ?
     env['QT_AUTOSCAN'] = 1
 
+    # Set to a number of moc sources to compile them together in units of
+    # that size, named <target>_mocs_compilation_<N>.cpp.
+    env.SetDefault(QT_MOCS_PER_COMPILATION=0)
+
     # Some QT specific flags. I don't expect someone wants to
     # manipulate those ...
     env['QT6_UICDECLFLAGS'] = ''
@@ -540,9 +566,9 @@ def generate(env):
     #                 # Of course, we need to link against the qt6 libraries
     #                 CPPPATH=[os.path.join('$QT6DIR', 'include')],
     #                 LIBPATH=[os.path.join('$QT6DIR', 'lib')],
-    env.AppendUnique(PROGEMITTER=[AutomocStatic],
-                     SHLIBEMITTER=[AutomocShared],
-                     LIBEMITTER=[AutomocStatic])
+    append_emitters(env, PROGEMITTER=AutomocStatic,
+                    SHLIBEMITTER=AutomocShared,
+                    LIBEMITTER=AutomocStatic)
 
     # Qt6 requires PIC.  This may have to be adjusted by platform and
     # compiler.
@@ -605,17 +631,23 @@ def enable_modules(env, modules, debug=False):
         env.LogDebug("QT6DIR not set, cannot enable module.")
         return False
 
-    onefailed = False
     for module in modules:
         if module.startswith('Qt6'):
             raise SCons.Errors.StopError(
                 "Qt module names should not be qualified with "
                 "the version: %s" % (module))
+
+    merged = []
+    if env['PLATFORM'] in ['posix', 'msys', 'win32', 'cygwin', 'darwin']:
+        merged = _merge_pkgconfig_modules(env, modules, debug)
+
+    onefailed = False
+    for module in modules:
         ok = False
         if env['PLATFORM'] in ['posix', 'msys', 'win32', 'cygwin']:
-            ok = enable_module_linux(env, module, debug)
+            ok = enable_module_linux(env, module, debug, module in merged)
         if env['PLATFORM'] == "darwin":
-            ok = enable_module_osx(env, module, debug)
+            ok = enable_module_osx(env, module, debug, module in merged)
 # Unused at moment.
 #        if env['PLATFORM'] == 'win32':
 #            ok = enable_module_win(env, module, debug)
@@ -624,6 +656,30 @@ def enable_modules(env, modules, debug=False):
     return onefailed
 
 
+def _merge_pkgconfig_modules(env, modules, debug=False):
+    """
+    When Qt is found with pkg-config, merge the flags for all of @p modules
+    into @p env from a single pkg-config command, and return the list of
+    modules merged.  If pkg-config fails for the whole set, return an empty
+    list, so each module is tried separately and the missing ones can be
+    reported and handled.
+    """
+    if env['QT6DIR'] != USE_PKG_CONFIG or len(modules) < 2:
+        return []
+    suffix = "_debug" if debug else ""
+    packages = [qualify_module_name(module + suffix, 'Qt6')
+                for module in modules]
+    flags = pkgconfig_flags(env, packages)
+    if flags is None:
+        return []
+    env.LogDebug("Before qt6 mergeflags %s: %s" %
+                 (",".join(packages), esd.Watches(env)))
+    env.MergeFlags(flags, unique=1)
+    env.LogDebug("After qt6 mergeflags %s: %s" %
+                 (",".join(packages), esd.Watches(env)))
+    return list(modules)
+
+
 _qt6_header_path = None
 
 
@@ -648,14 +704,15 @@ def get_header_path(env):
     return hdir
 
 
-def enable_module_linux(env, module, debug=False):
+def enable_module_linux(env, module, debug=False, merged=False):
     """
     On Linux, a Qt6 module is enabled either with the settings from
     pkg-config or else the settings are generated manually here.  The Qt
     module name does not contain the version, however the pkg-config
     packages *are* qualified with a version, so that is handled here.
     Likewise the library names include a version, so that is handled if a
-    library must be added manually, without pkg-config.
+    library must be added manually, without pkg-config.  If @p merged is
+    True, the pkg-config flags have already been merged for this module.
     """
     if debug:
         module = module + "_debug"
@@ -667,27 +724,30 @@ def enable_module_linux(env, module, debug=False):
         modpackage = qualify_module_name(module, 'Qt6')
         hdir = get_header_path(env)
 
-        # The pkg-config should at least return a library name, so if
-        # RunConfig() returns nothing, treat that the same as if a
-        # CheckConfig() had failed, to avoid running pkg-config twice.
-        pkgc = 'pkg-config --cflags --libs ' + modpackage
-        cflags = pc.RunConfig(env, pkgc)
-        if cflags:
-            env.LogDebug("Before qt6 mergeflags '%s': %s" %
-                         (pkgc, esd.Watches(env)))
-            env.MergeFlags(cflags, unique=1)
-            env.LogDebug("After qt6 mergeflags '%s': %s" %
-                         (cflags, esd.Watches(env)))
+        if merged:
+            Debug("pkg-config flags for %s already merged" % (modpackage), env)
         else:
-            # warn if we haven't already
-            if module not in no_pkgconfig_warned:
-                print("Warning: No pkgconfig package " + modpackage +
-                      " for Qt6/" + module + ", doing what I can...")
-                no_pkgconfig_warned.append(module)
-            # By default, the libraries are named with prefix Qt6
-            # rather than Qt, just like the module package name we
-            # built above.
-            env.Append(LIBS=[modpackage])
+            # The pkg-config should at least return a library name, so if
+            # RunConfig() returns nothing, treat that the same as if a
+            # CheckConfig() had failed, to avoid running pkg-config twice.
+            pkgc = 'pkg-config --cflags --libs ' + modpackage
+            cflags = pc.RunConfig(env, pkgc)
+            if cflags:
+                env.LogDebug("Before qt6 mergeflags '%s': %s" %
+                             (pkgc, esd.Watches(env)))
+                env.MergeFlags(cflags, unique=1)
+                env.LogDebug("After qt6 mergeflags '%s': %s" %
+                             (cflags, esd.Watches(env)))
+            else:
+                # warn if we haven't already
+                if module not in no_pkgconfig_warned:
+                    print("Warning: No pkgconfig package " + modpackage +
+                          " for Qt6/" + module + ", doing what I can...")
+                    no_pkgconfig_warned.append(module)
+                # By default, the libraries are named with prefix Qt6
+                # rather than Qt, just like the module package name we
+                # built above.
+                env.Append(LIBS=[modpackage])
 
         # On MSYS2 pkg-config is returning C: in the path, which scons then
         # adds a prefix (e.g. "plotlib/" in aeros).  Replace C: with /c,
@@ -779,7 +839,7 @@ def enable_module_win(env, module, debug=False):
     return True
 
 
-def enable_module_osx(env, module, debug=False):
+def enable_module_osx(env, module, debug=False, merged=False):
     """
     Use the frameworks on OSX.  Homebrew installs the frameworks in
     /usr/local/opt.  There is no support for enabling debug modules as on
@@ -791,7 +851,7 @@ def enable_module_osx(env, module, debug=False):
         print("Enabling debug for Qt6 modules has no effect on OSX.")
 
     # At this time we believe we can just use the enable_module_linux.
-    return enable_module_linux(env, module, debug)
+    return enable_module_linux(env, module, debug, merged)
 
 
 def deploy_linux(env):
@@ -30,6 +30,11 @@ and Linux.
 
 ...and I suppose it's more likely to work on Windows also, if that turns
 out to be necessary also.
+
+Since _LIBFLAGS is expanded for every link command, the archive found for
+each library and the rewritten flags are cached, keyed on the library
+flags, the search paths and STATIC_LIBRARY_NAMES, so the library paths are
+only searched again when one of those changes.
 """
 
 import SCons
@@ -59,20 +64,12 @@ def _insert_static_flags(env):
 # than just getting an error message from the compiler that a library could
 # not be found.
 
-def _replace_static_libraries(env):
+def _static_search_dirs(env):
     """
-    Replace the library link options for static libraries with the actual
-    path to the static archive library.
+    Return the absolute paths of the directories to search for static
+    archives: LIBPATH followed by the fallback system paths.
     """
-    libs = env.subst("$save_for_static_LIBFLAGS").split()
-    modlibs = []
-    libprefix = env.get("LIBPREFIX")  # eg 'lib'
-    libsuffix = env.get("LIBSUFFIX")  # eg '.a'
-    liblinkprefix = env.get("LIBLINKPREFIX")  # eg '-l'
-    liblinksuffix = env.get("LIBLINKSUFFIX")  # eg ''
-
-    libpath = env.get('LIBPATH', [])
-    searchpaths = libpath[:]
+    searchpaths = list(env.get('LIBPATH', []))
     # This is a kludge but a sort of failsafe, since the primary motivation
     # for this tool is to get static linking of boost_serialization, and so
     # on OSX this is equivalent to the original working fix of hardcoding
@@ -82,9 +79,58 @@ def _replace_static_libraries(env):
     if env['PLATFORM'] == 'darwin':
         searchpaths.append('/usr/local/opt/boost/lib')
     searchpaths.extend(_syspaths)
+    # Relative LIBPATH entries are relative to the SConscript directory, so
+    # resolve them to nodes before using them in cache keys.
+    return tuple(d.get_abspath()
+                 for d in env.arg2nodes(searchpaths, env.fs.Dir))
 
-    staticlibnames = env.get('STATIC_LIBRARY_NAMES', [])
-    for libopt in libs:
+
+# Static archives which have been found, keyed by the search directories,
+# the static library names, and the archive file name.  Only successful
+# lookups are cached, since a missing archive stops the build anyway.
+_archive_cache = {}
+
+# The rewritten link flags, keyed by everything they are computed from, so
+# each distinct combination of libraries, search paths and static library
+# names is only rewritten once no matter how many programs link with it.
+_flags_cache = {}
+
+
+def _find_static_archive(env, libfile, searchdirs, staticlibnames):
+    key = (searchdirs, staticlibnames, libfile)
+    path = _archive_cache.get(key)
+    if path is None:
+        libnode = env.FindFile(libfile, list(searchdirs))
+        if libnode:
+            path = libnode.get_abspath()
+            _archive_cache[key] = path
+    return path
+
+
+def _replace_static_libraries(env):
+    """
+    Replace the library link options for static libraries with the actual
+    path to the static archive library.
+    """
+    libflags = env.subst("$save_for_static_LIBFLAGS")
+    staticlibnames = tuple(env.get('STATIC_LIBRARY_NAMES', []))
+    if not staticlibnames:
+        return libflags.split()
+
+    libprefix = env.get("LIBPREFIX")  # eg 'lib'
+    libsuffix = env.get("LIBSUFFIX")  # eg '.a'
+    liblinkprefix = env.get("LIBLINKPREFIX")  # eg '-l'
+    liblinksuffix = env.get("LIBLINKSUFFIX")  # eg ''
+    searchdirs = _static_search_dirs(env)
+
+    key = (libflags, searchdirs, staticlibnames, libprefix, libsuffix,
+           liblinkprefix, liblinksuffix)
+    modlibs = _flags_cache.get(key)
+    if modlibs is not None:
+        return list(modlibs)
+
+    modlibs = []
+    for libopt in libflags.split():
         found = [libname for libname in staticlibnames if libname in libopt]
 
         # It's possible this is already a file path and not a link option.
@@ -94,19 +140,21 @@ def _replace_static_libraries(env):
 
         # So we have a library option that matches, build up the static
         # library name and look for it in the paths.
-        libname = libopt.lstrip(liblinkprefix)
-        libname = libname.rstrip(liblinksuffix)
+        libname = libopt[len(liblinkprefix):]
+        if liblinksuffix and libname.endswith(liblinksuffix):
+            libname = libname[:-len(liblinksuffix)]
         libfile = libprefix + libname + libsuffix
 
-        libnode = env.FindFile(libfile, searchpaths)
-        if not libnode:
+        path = _find_static_archive(env, libfile, searchdirs, staticlibnames)
+        if not path:
             msg = str("Static library archive %s could "
                       "not be found." % (libfile))
             if "boost" in found[0]:
                 msg += "  Install boost-static?"
             raise SCons.Errors.StopError(msg)
-        modlibs.append(libnode.get_abspath())
+        modlibs.append(path)
 
+    _flags_cache[key] = tuple(modlibs)
     return modlibs
 
 
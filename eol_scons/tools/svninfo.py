@@ -58,9 +58,25 @@ with definitions for those values.
 # target.  The source for this version information is implicitly the
 # directory of the SConscript file.
 
+# The revision information is now gathered for the working copy and all of
+# its externals with a single 'svn info --xml -R --include-externals',
+# parsed as it streams from svn, and computing the same revision summary as
+# svnversion.  That result is cached in the .svn directory and only
+# refreshed when the wc.db of the working copy or one of its externals
+# changes, since svn operations like update, commit, and switch all write
+# to wc.db.  Local modifications do not touch wc.db, so 'svn status --xml
+# -q' is still run each time to add the 'M' modifier.  If svn is too old
+# for --include-externals (before 1.9), the individual svn info,
+# svnversion, and svn status commands are run instead.
+
 import os
 import re
+import json
+import datetime
 import subprocess as sp
+import tempfile
+import xml.etree.ElementTree as ET
+from urllib.parse import unquote
 
 from SCons.Builder import Builder
 from SCons.Action import Action
@@ -139,7 +155,238 @@ class SubversionInfo:
                 externals += [relativeSubdir]
         return externals
 
+    def _iter_xml(self, cmd):
+        """
+        Run @p cmd and generate (event, element) pairs from its XML output
+        as it is read.  Elements are cleared after the end event, so the
+        whole document is never held in memory.  Raise OSError if the
+        command fails.  The error output goes to a temporary file, so the
+        command cannot block on a full stderr pipe while its output is read.
+        """
+        pdebug("svninfo: running '%s'" % (" ".join(cmd)))
+        with tempfile.TemporaryFile() as errfile:
+            child = sp.Popen(cmd, stdout=sp.PIPE, stderr=errfile)
+            try:
+                for event, elem in ET.iterparse(child.stdout,
+                                                events=('start', 'end')):
+                    yield event, elem
+                    if event == 'end' and elem.tag == 'entry':
+                        elem.clear()
+            except ET.ParseError as ex:
+                child.kill()
+                child.wait()
+                raise OSError("'%s' output could not be parsed: %s" %
+                              (" ".join(cmd), ex))
+            finally:
+                child.stdout.close()
+            status = child.wait()
+            errfile.seek(0)
+            eout = errfile.read().decode(errors='replace').strip()
+        if status != 0:
+            raise OSError("'%s' failed: %s" % (" ".join(cmd), eout))
+
+    def _scan_info(self, stream):
+        """
+        Summarize the entries from 'svn info --xml -R --include-externals'
+        by working copy root: the root of the working directory itself and
+        then each external.  Return a dictionary with the URL and last
+        changed date of the working directory, and a list of the working
+        copies with their paths and revision summaries.
+        """
+        wcs = {}
+        order = []
+        info = {'url': None, 'date': None}
+        dirurls = {}
+        for event, elem in stream:
+            if event != 'end' or elem.tag != 'entry':
+                continue
+            path = elem.get('path')
+            url = elem.findtext('url')
+            wcroot = elem.findtext('wc-info/wcroot-abspath')
+            if info['url'] is None:
+                # The first entry is the working directory itself.
+                info['url'] = url
+                info['date'] = elem.findtext('commit/date')
+            wcpath = path if not order else None
+            if wcroot not in wcs:
+                wcs[wcroot] = {'path': wcpath, 'min': None, 'max': None,
+                               'switched': False, 'sparse': False}
+                order.append(wcroot)
+            wc = wcs[wcroot]
+            if wc['path'] is None:
+                # The first entry under an external is its top directory.
+                wc['path'] = path
+            schedule = elem.findtext('wc-info/schedule')
+            revision = int(elem.get('revision', '-1'))
+            if schedule != 'add' and revision >= 0:
+                if wc['min'] is None or revision < wc['min']:
+                    wc['min'] = revision
+                if wc['max'] is None or revision > wc['max']:
+                    wc['max'] = revision
+            if elem.get('kind') == 'dir':
+                dirurls[path] = url
+                depth = elem.findtext('wc-info/depth')
+                if depth and depth != 'infinity':
+                    wc['sparse'] = True
+            parent = os.path.dirname(path)
+            if (path != wc['path'] and parent in dirurls and url and
+                    unquote(url) != unquote(dirurls[parent]) + '/' +
+                    os.path.basename(path)):
+                wc['switched'] = True
+        info['wcs'] = [dict(wcs[root], root=root) for root in order]
+        return info
+
+    def _scan_modified(self, stream):
+        """
+        Return the set of working copy paths with local modifications, from
+        the targets in 'svn status --xml -q' output.  svn status reports
+        each external as its own target.
+        """
+        modified = set()
+        target = None
+        for event, elem in stream:
+            if event == 'start' and elem.tag == 'target':
+                target = elem.get('path')
+            elif event == 'end' and elem.tag == 'entry':
+                status = elem.find('wc-status')
+                if status is None:
+                    continue
+                item = status.get('item')
+                props = status.get('props')
+                if (item not in ('normal', 'unversioned', 'ignored',
+                                 'external', 'none') or
+                        props in ('modified', 'conflicted')):
+                    modified.add(target)
+        return modified
+
+    def _revision(self, wc, modified):
+        "Format the revision summary like svnversion."
+        if wc['min'] is None:
+            return "Unversioned directory"
+        rev = str(wc['min'])
+        if wc['min'] != wc['max']:
+            rev = "%d:%d" % (wc['min'], wc['max'])
+        if modified:
+            rev += "M"
+        if wc['switched']:
+            rev += "S"
+        if wc['sparse']:
+            rev += "P"
+        return rev
+
+    def _wcdb_signature(self, roots):
+        stamps = []
+        for root in roots:
+            try:
+                st = os.stat(os.path.join(root, '.svn', 'wc.db'))
+                stamps.append("%s:%d" % (root, st.st_mtime_ns))
+            except OSError:
+                return None
+        return ",".join(stamps)
+
+    def _cache_path(self, wcroot):
+        return os.path.join(wcroot, '.svn', 'eol_scons_svninfo.json')
+
+    def _find_wcroot(self):
+        path = os.path.abspath(self.workdir)
+        while not os.path.exists(os.path.join(path, '.svn', 'wc.db')):
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+        return path
+
+    def _load_xml_info(self):
+        """
+        Return the info summary for the working directory, from the cache
+        if none of the wc.db files have changed, otherwise by running svn
+        info.  Return None if svn info cannot provide it.
+        """
+        wcroot = self._find_wcroot()
+        if wcroot is None:
+            return None
+        cache = {}
+        try:
+            with open(self._cache_path(wcroot)) as cf:
+                cache = json.load(cf).get(self.workdir, {})
+        except (OSError, ValueError):
+            pass
+        roots = [wc['root'] for wc in cache.get('wcs', [])]
+        if cache and cache.get('key') == self._wcdb_signature(roots):
+            pdebug("svninfo: using cached info for %s" % (self.workdir))
+            return cache
+        cmd = [self.svncmd, "info", "--xml", "-R", "--depth", "infinity",
+               "--include-externals", self.workdir]
+        try:
+            info = self._scan_info(self._iter_xml(cmd))
+        except OSError as ex:
+            pdebug("svninfo: %s" % (ex))
+            return None
+        if not info['wcs']:
+            return None
+        info['key'] = self._wcdb_signature(
+            [wc['root'] for wc in info['wcs']])
+        try:
+            allcache = {}
+            if os.path.exists(self._cache_path(wcroot)):
+                with open(self._cache_path(wcroot)) as cf:
+                    allcache = json.load(cf)
+            allcache[self.workdir] = info
+            with open(self._cache_path(wcroot) + '.tmp', 'w') as cf:
+                json.dump(allcache, cf)
+            os.replace(self._cache_path(wcroot) + '.tmp',
+                       self._cache_path(wcroot))
+        except (OSError, ValueError) as ex:
+            pdebug("svninfo: could not write cache: %s" % (ex))
+        return info
+
+    def _format_date(self, date):
+        """
+        Format the UTC commit date from the XML output in local time like
+        the svn info text output: 2014-12-03 13:45:13 -0700 (Wed, 03 Dec
+        2014).
+        """
+        utc = datetime.datetime.strptime(date[:19], "%Y-%m-%dT%H:%M:%S")
+        local = utc.replace(tzinfo=datetime.timezone.utc).astimezone()
+        return local.strftime("%Y-%m-%d %H:%M:%S %z (%a, %d %b %Y)")
+
     def loadInfo(self):
+        """
+        Load the svn info for the working directory, using the cached or
+        XML info when possible, otherwise running the individual commands.
+        Return self.
+        """
+        info = self._load_xml_info()
+        if info is None:
+            return self._loadInfoCommands()
+        cmd = [self.svncmd, "status", "--xml", "-q", self.workdir]
+        try:
+            modified = self._scan_modified(self._iter_xml(cmd))
+        except OSError as ex:
+            pdebug("svninfo: %s" % (ex))
+            return self._loadInfoCommands()
+        workdir = self.workdir
+        main = info['wcs'][0]
+        self.values["SVNREVISION"] = self._revision(
+            main, main['path'] in modified)
+        externals = []
+        for wc in info['wcs'][1:]:
+            subdir = os.path.relpath(wc['path'], workdir)
+            externals.append(subdir + ":" + self._revision(
+                wc, wc['path'] in modified))
+        self.values["SVNEXTERNALREVS"] = ",".join(externals)
+        if info['url']:
+            self.values["SVNURL"] = "URL: %s" % (info['url'])
+        if info['date']:
+            self.values["SVNLASTCHANGEDDATE"] = (
+                "Last Changed Date: %s" % (self._format_date(info['date'])))
+        self.values["SVNWORKDIRSPEC"] = "Working Directory: %s" % workdir
+        self.values["SVNWORKDIR"] = workdir
+        for k in self.values:
+            self.values[k] = self.values[k].replace("\\", "/").strip()
+        return self
+
+    def _loadInfoCommands(self):
         workdir = self.workdir
         svncmd = [self.svncmd, "info", workdir]
         svndict = {
@@ -5,8 +5,43 @@
 """
 SConscript tool which adds a pseudo-builder to embed a text file in C++
 code.
+
+    env.EmbedTextCC('schema.xsd.cc', 'schema.xsd', 'SCHEMA_TEXT')
+
+generates schema.xsd.cc which defines the C string variable
+"const char* SCHEMA_TEXT" with the contents of schema.xsd.  The
+TEXT_DATA_FORMAT construction variable, or the data_format argument to
+EmbedTextCC(), selects how the contents are written into the source file:
+
+string: The default, a string literal with the text escaped.  This is the
+  easiest to read, but compilers are slow and use a lot of memory to parse
+  string literals of more than a few megabytes, and some compilers limit
+  their length.
+
+bytes: An array of the file bytes in hexadecimal, with a terminating null
+  byte.  The file is read and written in fixed-size blocks, so it works for
+  files of any size and any contents.
+
+incbin: A small source file with an assembler .incbin directive which
+  includes the file directly in the object file, so the compiler never
+  parses the contents, and large files compile quickly in constant memory.
+  It requires the GNU assembler or a compatible one like clang's, with ELF
+  object files, as on Linux.  The source file contains a hash of the
+  embedded file, so it is recompiled whenever the embedded file changes.
+  The assembler reads the file by its absolute path on the build host, so
+  the object must be compiled locally, not by a remote worker.  With the
+  distcompile tool, compile it with DISTCOMPILE set to an empty string, and
+  without a CCACHE_PREFIX in ENV if compilercache is used too:
+
+    env.Object('schema.xsd.cc', DISTCOMPILE='')
+
+In every format the variable points to the contents followed by a null
+byte, so the formats can be switched without changing the code which uses
+the variable.
 """
 
+import hashlib
+import os
 import re
 import sys
 
@@ -49,6 +84,70 @@ def text2cc(text, vname):
     return text
 
 
+# The size of the blocks read and written by the streaming formats.
+_block_size = 64 * 1024
+
+# The number of bytes in each line of an array.
+_bytes_per_line = 16
+
+
+def bytes2cc(infile, outfile, vname, block_size=_block_size):
+    """
+    Read binary file object @p infile in blocks of @p block_size and write
+    C++ code to @p outfile which defines @p vname as a pointer to an array
+    of the bytes, followed by a null byte.
+    """
+    array = vname + "_bytes"
+    outfile.write("/***** DO NOT EDIT *****/\n")
+    outfile.write("static const unsigned char %s[] = {\n" % (array))
+    while True:
+        block = infile.read(block_size)
+        if not block:
+            break
+        for i in range(0, len(block), _bytes_per_line):
+            line = block[i:i+_bytes_per_line]
+            outfile.write("".join(["0x%02x," % (b) for b in line]))
+            outfile.write("\n")
+    outfile.write("0 };\n")
+    outfile.write("const char* %s = reinterpret_cast<const char*>(%s);\n" %
+                  (vname, array))
+
+
+def _file_hash(path, block_size=_block_size):
+    "Return the sha256 hash of the file at @p path, reading it in blocks."
+    digest = hashlib.sha256()
+    with open(path, "rb") as infile:
+        for block in iter(lambda: infile.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def incbin2cc(path, vname):
+    """
+    Return C++ code which defines @p vname as a pointer to the contents of
+    the file at @p path, followed by a null byte, included in the object
+    file with the assembler .incbin directive.
+    """
+    path = os.path.abspath(path)
+    symbol = "eol_scons_text2cc_" + vname
+    asmpath = path.replace('\\', '\\\\').replace('"', '\\"')
+    code = StringIO()
+    code.write("/***** DO NOT EDIT *****/\n")
+    code.write("/* sha256 of embedded file: %s */\n" % (_file_hash(path)))
+    code.write("__asm__(\".section .rodata\\n\"\n")
+    code.write("        \".balign 16\\n\"\n")
+    code.write("        \"%s:\\n\"\n" % (symbol))
+    code.write("        \".incbin \\\"%s\\\"\\n\"\n" %
+               (asmpath.replace('\\', '\\\\').replace('"', '\\"')))
+    code.write("        \".byte 0\\n\"\n")
+    code.write("        \".previous\\n\");\n")
+    code.write('extern "C" const char %s[];\n' % (symbol))
+    code.write("const char* %s = %s;\n" % (vname, symbol))
+    text = code.getvalue()
+    code.close()
+    return text
+
+
 def _embedded_text_emitter(target, source, env):
     if str(target[0]) == str(source[0]):
         target = [ str(source[0]) + '.cc']
@@ -56,9 +155,28 @@ def _embedded_text_emitter(target, source, env):
 
 
 def _embedded_text_builder(target, source, env):
-    text = source[0].get_text_contents()
+    vname = env['TEXT_DATA_VARIABLE_NAME']
+    fmt = env.get('TEXT_DATA_FORMAT', 'string')
+    if fmt not in _formats:
+        from SCons.Errors import StopError
+        raise StopError(
+            "text2cc: unknown TEXT_DATA_FORMAT '%s', expected one of: %s" %
+            (fmt, ", ".join(_formats)))
+    if fmt == 'bytes':
+        with open(source[0].get_abspath(), "rb") as infile:
+            with open(str(target[0]), "w") as outfile:
+                bytes2cc(infile, outfile, vname)
+        return None
+    if fmt == 'incbin':
+        code = incbin2cc(source[0].get_abspath(), vname)
+    else:
+        code = text2cc(source[0].get_text_contents(), vname)
     with open(str(target[0]), "w") as outfile:
-        outfile.write(text2cc(text, env['TEXT_DATA_VARIABLE_NAME']))
+        outfile.write(code)
+    return None
+
+
+_formats = ['string', 'bytes', 'incbin']
 
 
 def _message(target, source, env):
@@ -76,8 +194,9 @@ def _get_builder():
     if not _have_embedded_builder:
         from SCons.Script import Builder
         from SCons.Script import Action
-        etaction = Action(_embedded_text_builder, _message, 
-                          varlist=['TEXT_DATA_VARIABLE_NAME'])
+        etaction = Action(_embedded_text_builder, _message,
+                          varlist=['TEXT_DATA_VARIABLE_NAME',
+                                   'TEXT_DATA_FORMAT'])
         _embedded_builder = Builder(action=etaction,
                                     emitter=_embedded_text_emitter)
         _have_embedded_builder = True
@@ -85,14 +204,17 @@ def _get_builder():
     return _embedded_builder
 
 
-def _EmbedTextCC(env, target, source, variable):
-    return env.EmbeddedTextCC(target, source,
-                              TEXT_DATA_VARIABLE_NAME=variable)
+def _EmbedTextCC(env, target, source, variable, data_format=None):
+    kw = {'TEXT_DATA_VARIABLE_NAME': variable}
+    if data_format:
+        kw['TEXT_DATA_FORMAT'] = data_format
+    return env.EmbeddedTextCC(target, source, **kw)
 
 
 def generate(env):
     env['BUILDERS']['EmbeddedTextCC'] = _get_builder()
     env.SetDefault(TEXT_DATA_VARIABLE_NAME="EMBEDDED_TEXT_DATA")
+    env.SetDefault(TEXT_DATA_FORMAT="string")
     env.AddMethod(_EmbedTextCC, "EmbedTextCC")
 
 
@@ -0,0 +1,71 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+"""
+Record a timeline of every command run by the build, to find the compiles
+and links which dominate the wall time of parallel builds.
+
+Add this tool to GLOBAL_TOOLS, after any tools which replace SPAWN, like
+distcompile, and set TIMELINE to the path of the trace file:
+
+    scons -j 8 TIMELINE=build-trace.json
+
+Every command is timestamped when it starts and finishes, and on posix
+systems its CPU time and maximum resident set size are collected too.  When
+scons exits, the commands are matched to the targets they built, and the
+trace is written as Chrome trace-event JSON, which can be opened in
+chrome://tracing or https://ui.perfetto.dev.  The critical path, the chain
+of dependent commands which took the longest, is printed and saved in the
+otherData section of the trace.  No command on the critical path can start
+until the one before it finishes, so those are the commands to speed up or
+break up to make the whole build faster.
+"""
+
+import atexit
+
+import SCons.Script
+
+import eol_scons.timeline as tl
+
+_variables = None
+
+# There is one spawner for the whole build, so one trace includes the
+# commands from all environments.
+_spawner = None
+_tracepath = None
+
+
+def _write_timeline():
+    if not _spawner.records:
+        return
+    _spawner.resolve_targets()
+    summary = tl.write_trace(_tracepath, _spawner.records)
+    print("timeline: wrote %d commands to %s" %
+          (len(_spawner.records), _tracepath))
+    path = summary['critical_path']
+    if path:
+        print("timeline: critical path %.1fs: %s" %
+              (summary['critical_path_seconds'], " -> ".join(path)))
+
+
+def generate(env):
+    global _variables, _spawner, _tracepath
+    if _variables is None:
+        _variables = env.GlobalVariables()
+        _variables.Add('TIMELINE', """\
+Write a Chrome trace-event file of the build commands to this path, and
+print the critical path when scons exits.""", '')
+    _variables.Update(env)
+    tracepath = env.subst('$TIMELINE')
+    if not tracepath or SCons.Script.GetOption('no_exec'):
+        return
+    if _spawner is None:
+        _spawner = tl.TimelineSpawner(env['SPAWN'])
+        _tracepath = env.File(tracepath).get_abspath()
+        atexit.register(_write_timeline)
+    env['SPAWN'] = _spawner
+
+
+def exists(env):
+    return True
@@ -0,0 +1,237 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+"""
+The unity tool compiles the C and C++ sources of programs and libraries in
+unity (jumbo) units, each of which includes several source files, so the
+headers shared by those sources are only parsed once per unit.
+
+Unity builds are enabled by setting UNITY_SIZE to the maximum number of
+sources in each unit, either on the command line or in the environment:
+
+    scons UNITY_SIZE=16
+
+The tool adds an emitter to the Program, StaticLibrary and SharedLibrary
+builders, which replaces the objects for the target's sources with objects
+compiled from generated <target>_unity_<N>.c or .cpp files.  Only objects
+built from C or C++ sources with the same environment and builder are
+grouped together, so sources compiled with different flags stay separate.
+Generated sources, like the moc, uic and qrc outputs of the Qt tools, are
+always compiled separately, as are sources matching a pattern in
+UNITY_EXCLUDE, which can be file names, paths or fnmatch patterns:
+
+    env.Append(UNITY_EXCLUDE=['legacy_*.c', 'src/conflicts.cc'])
+
+Sources are opted out because they define static symbols or macros which
+conflict with another source in the same unit.
+
+When UNITY_ADAPTIVE is true, which is the default, sources which git reports
+as modified in the working tree are also compiled separately, so repeatedly
+editing and rebuilding a file only recompiles that file.  The sources are
+assigned to units in order of their paths before the modified sources are
+taken out, so the other units keep the same sources, and only the unit the
+file was taken from is recompiled once after the first edit.
+
+The units of shared libraries are named <target>_shared_unity_<N>, so a
+static and a shared library with the same name can be built in the same
+directory.
+
+The separate objects which were replaced are still nodes in the build, so
+they are built if they are used by another target, but they are ignored by
+their directory so they are not built by default.
+"""
+
+import fnmatch
+import os
+import subprocess as sp
+
+import SCons.Action
+import SCons.Node.FS
+import SCons.Util
+
+from eol_scons import Debug
+
+_variables = None
+
+_c_suffixes = ['.c']
+_cxx_suffixes = ['.cpp', '.cc', '.cxx', '.c++', '.C']
+
+# The files reported modified by git, keyed by the top directory, so git
+# is only run once per build.
+_modified = {}
+
+
+def _modified_sources(env):
+    "Return the set of absolute paths of files modified in the git tree."
+    top = env.Dir('#').get_abspath()
+    if top not in _modified:
+        modified = set()
+        try:
+            git = env.subst('$GIT') or 'git'
+            output = sp.run([git, 'status', '--porcelain', '-z',
+                             '--untracked-files=no'],
+                            cwd=top, stdout=sp.PIPE, stderr=sp.DEVNULL,
+                            universal_newlines=True).stdout
+            gittop = sp.run([git, 'rev-parse', '--show-toplevel'],
+                            cwd=top, stdout=sp.PIPE, stderr=sp.DEVNULL,
+                            universal_newlines=True).stdout.strip()
+        except OSError:
+            output = gittop = ''
+        for entry in output.split('\0'):
+            # Each entry is a two-letter status, a space, and the path
+            # relative to the top of the git tree.
+            if len(entry) > 3 and gittop:
+                modified.add(os.path.join(gittop, entry[3:]))
+        _modified[top] = modified
+    return _modified[top]
+
+
+def _language(source):
+    suffix = os.path.splitext(source.name)[1]
+    if suffix in _c_suffixes:
+        return 'c'
+    if suffix in _cxx_suffixes:
+        return 'c++'
+    return None
+
+
+def _excluded(env, source):
+    "Return True if @p source matches one of the UNITY_EXCLUDE patterns."
+    srcnode = source.srcnode()
+    path = srcnode.get_path(env.Dir('#'))
+    abspath = srcnode.get_abspath()
+    for pattern in env.Flatten(env.get('UNITY_EXCLUDE', [])):
+        if not SCons.Util.is_String(pattern):
+            if pattern.srcnode().get_abspath() == abspath:
+                return True
+            continue
+        if (fnmatch.fnmatch(source.name, pattern) or
+                fnmatch.fnmatch(path, pattern) or
+                os.path.abspath(env.subst(pattern)) == abspath):
+            return True
+    return False
+
+
+def _write_unity_source(target, source, env):
+    with open(target[0].get_abspath(), 'w') as unit:
+        unit.write(source[0].read())
+    return None
+
+
+_unity_source_action = SCons.Action.Action(_write_unity_source,
+                                           "Generating $TARGET")
+
+
+def _unity_object(target, members, number):
+    """
+    Generate the unity source for @p members and return the object built
+    from it with the builder and environment of the member objects.
+    """
+    first = members[0]
+    env = first.get_env()
+    tnode = target[0]
+    base = SCons.Util.splitext(tnode.name)[0]
+    if getattr(first.attributes, 'shared', None):
+        base += "_shared"
+    suffix = os.path.splitext(first.sources[0].name)[1]
+    unit = tnode.get_dir().File("%s_unity_%d%s" % (base, number, suffix))
+    udir = unit.get_dir().get_abspath()
+    lines = ["/* Generated by eol_scons from the sources for %s. */" %
+             (tnode.name)]
+    for obj in members:
+        srcpath = obj.sources[0].srcnode().get_abspath()
+        lines.append('#include "%s"' % (os.path.relpath(srcpath, udir)))
+    env.Command(unit, env.Value("\n".join(lines) + "\n"),
+                _unity_source_action)
+    objects = first.builder(env, None, unit)
+    env.Depends(objects, [obj.sources[0] for obj in members])
+    for obj in members:
+        # Keep the replaced objects from being built as part of their
+        # directory, unless another target needs them.
+        env.Ignore(obj.get_dir(), obj)
+    Debug("unity: compiling %s in %s" %
+          (",".join([str(obj.sources[0]) for obj in members]), str(unit)),
+          env)
+    return objects
+
+
+def UnityEmitter(target, source, env):
+    """
+    Replace the objects in @p source built from C and C++ sources with
+    objects built from unity sources of up to UNITY_SIZE sources each.
+    """
+    size = int(env.subst('$UNITY_SIZE') or 0)
+    if size < 2:
+        return target, source
+    modified = set()
+    if env.get('UNITY_ADAPTIVE'):
+        modified = _modified_sources(env)
+
+    # Group the objects, keyed by language, builder and environment, since
+    # only objects which would be compiled by the same command can be
+    # compiled together.  Modified sources are kept in their group until
+    # the groups are divided into units, so they do not change which unit
+    # the other sources are in.
+    groups = {}
+    order = []
+    out_sources = []
+    for obj in env.Flatten(source):
+        if not isinstance(obj, SCons.Node.FS.Base) or not obj.has_builder():
+            out_sources.append(obj)
+            continue
+        src = obj.sources[0] if obj.sources else None
+        language = _language(src) if src is not None else None
+        if (language is None or len(obj.sources) != 1 or src.has_builder() or
+                _excluded(env, src)):
+            out_sources.append(obj)
+            continue
+        key = (language, id(obj.builder), id(obj.get_env()))
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        groups[key].append(obj)
+
+    number = 0
+    for key in order:
+        members = sorted(groups[key],
+                         key=lambda obj: obj.sources[0].srcnode().get_path())
+        for start in range(0, len(members), size):
+            chunk = []
+            for obj in members[start:start + size]:
+                if obj.sources[0].srcnode().get_abspath() in modified:
+                    out_sources.append(obj)
+                else:
+                    chunk.append(obj)
+            if len(chunk) == 1:
+                out_sources.extend(chunk)
+            elif chunk:
+                out_sources.extend(_unity_object(target, chunk, number))
+            # Every slot keeps its number, so the later units keep their
+            # names when a slot has less than two sources left.
+            number += 1
+    return target, out_sources
+
+
+# The qt tools add their emitters ahead of this one, since the Qt emitters
+# look for Q_OBJECT in the headers of each source of the target.
+UnityEmitter.runs_last = True
+
+
+def generate(env):
+    global _variables
+    if _variables is None:
+        _variables = env.GlobalVariables()
+        _variables.Add('UNITY_SIZE', """\
+Compile C and C++ sources in unity units of up to this many sources.
+0 disables unity builds.""", 0)
+    _variables.Update(env)
+    env.SetDefault(UNITY_EXCLUDE=[])
+    env.SetDefault(UNITY_ADAPTIVE=True)
+    env.AppendUnique(PROGEMITTER=[UnityEmitter],
+                     SHLIBEMITTER=[UnityEmitter],
+                     LIBEMITTER=[UnityEmitter])
+
+
+def exists(env):
+    return True
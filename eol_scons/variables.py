@@ -23,6 +23,8 @@ from SCons.Script import AddOption
 from SCons.Script import DefaultEnvironment
 
 import eol_scons.debug
+import eol_scons.memprofile
+import eol_scons.readprofile
 from eol_scons.methods import PrintProgress
 
 _global_variables = None
@@ -95,6 +97,8 @@ def _GlobalVariables(cfile=None, env=None):
         cfile = env.File(cfile).get_abspath()
         _global_variables = BriefVariables(cfile)
         eol_scons.debug.AddVariables(_global_variables)
+        eol_scons.memprofile.AddVariables(_global_variables)
+        eol_scons.readprofile.AddVariables(_global_variables)
         PrintProgress("Config files: %s" % (_global_variables.files))
     return _global_variables
 
@@ -0,0 +1,358 @@
+#! /usr/bin/env python3
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+"""
+Generate a synthetic eol_scons source tree and measure how long scons takes
+to start up and to run a build with nothing to do, so changes to eol_scons
+startup cost can be compared across commits.
+
+Generate a tree, then run the benchmark on it:
+
+    ./benchmark.py generate /tmp/bench --dirs 200 --sources 20
+    ./benchmark.py run /tmp/bench --repeat 5 --output results.json
+
+The tree has a SConstruct which sets a global tool, group directories whose
+SConscript files add their own global tools and build a program, and
+library directories each with a tool_*.py file which builds the library and
+exports a tool to link against it.  Each library tool requires the previous
+library in its group and a pkg-config package from the local pkgconfig
+directory.  Each library also has a header with a Q_OBJECT class, which is
+only compiled and moc'ed when the tree is generated with --qt.
+
+The run command builds the tree once, then runs scons the given number of
+times with nothing to build, and records the time to import eol_scons, the
+time to read the SConscript files, the wall time of each no-op build, and
+the peak memory of the scons process.  The results are written as JSON,
+with the eol_scons commit and the parameters of the tree.  Compare two
+result files with:
+
+    ./benchmark.py compare before.json after.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess as sp
+import sys
+import time
+from pathlib import Path
+
+_topdir = Path(__file__).resolve().parent.parent
+
+_sconstruct = """\
+# -*- python -*-
+# Generated by eol_scons tests/benchmark.py.
+import time
+_start = time.perf_counter()
+import eol_scons
+print("eol_scons import time: %.6f" % (time.perf_counter() - _start))
+
+from SCons.Script import Environment, SConscript
+
+
+def bench_global(env):
+    env.AppendUnique(CXXFLAGS=['-std=c++11'])
+    env.AppendUnique(CPPPATH=['#'])
+    env.PrependENVPath('PKG_CONFIG_PATH', env.Dir('#/pkgconfig').abspath)
+
+
+env = Environment(tools=['default'], GLOBAL_TOOLS=['prefixoptions'])
+env.RequireGlobal(bench_global)
+
+for group in {groups!r}:
+    SConscript(group + '/SConscript')
+"""
+
+_group_sconscript = """\
+# -*- python -*-
+from SCons.Script import Environment
+
+
+def {group}_global(env):
+    env.AppendUnique(CPPDEFINES=[('BENCH_GROUP', {number})])
+
+
+env = Environment(tools=['default'], GLOBAL_TOOLS=[{group}_global])
+env.Require({tools!r})
+env.Program('{group}', ['main.cc'])
+"""
+
+_tool_file = """\
+# -*- python -*-
+from SCons.Script import Environment, Export
+
+import eol_scons.parseconfig as pc
+
+env = Environment(tools=['default'{qt_tools}])
+{requires}{qt_modules}lib = env.Library('{name}', {sources!r})
+
+
+def {name}(env):
+    env.Append(LIBS=[lib])
+{requires_indented}    pc.ParseConfig(env, 'pkg-config --cflags --libs {package}')
+
+
+Export('{name}')
+"""
+
+_header = """\
+#pragma once
+
+int {function}(int value);
+"""
+
+_source = """\
+#include "{header}"
+
+int {function}(int value)
+{{
+    return value + {index};
+}}
+"""
+
+_widget_header = """\
+#pragma once
+
+#include <QObject>
+
+class {cls} : public QObject
+{{
+    Q_OBJECT
+public:
+    int value() const {{ return 1; }}
+signals:
+    void changed();
+}};
+"""
+
+_widget_source = """\
+#include "{header}"
+"""
+
+_main = """\
+#include <iostream>
+{includes}
+int main()
+{{
+    int value = 0;
+{calls}    std::cout << BENCH_GROUP << " " << value << std::endl;
+    return 0;
+}}
+"""
+
+_pcfile = """\
+Name: {name}
+Description: benchmark stub package
+Version: 1.0
+Cflags: -D{define}
+Libs:
+"""
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def generate(root, dirs, sources, groups, packages, qt):
+    """
+    Write a tree under @p root with @p dirs library directories of
+    @p sources sources each, split among @p groups group directories, and
+    @p packages pkg-config files.
+    """
+    root = Path(root)
+    packages = max(packages, 1)
+    site = root / 'site_scons'
+    site.mkdir(parents=True, exist_ok=True)
+    link = site / 'eol_scons'
+    if not link.exists():
+        link.symlink_to(_topdir)
+    for package in range(packages):
+        _write(root / 'pkgconfig' / ('benchdep%d.pc' % (package)),
+               _pcfile.format(name='benchdep%d' % (package),
+                              define='BENCHDEP%d' % (package)))
+    groupnames = ['group%02d' % (g) for g in range(groups)]
+    _write(root / 'SConstruct', _sconstruct.format(groups=groupnames))
+    qt_tools = ", 'qt5'" if qt else ""
+    for g, group in enumerate(groupnames):
+        libs = ['bench%04d' % (d) for d in range(g, dirs, groups)]
+        gdir = root / group
+        _write(gdir / 'SConscript',
+               _group_sconscript.format(group=group, number=g, tools=libs))
+        includes = ""
+        calls = ""
+        previous = None
+        for d, name in enumerate(libs):
+            ldir = gdir / name
+            srcs = []
+            for s in range(sources):
+                function = '%s_f%d' % (name, s)
+                header = '%s_%d.h' % (name, s)
+                _write(ldir / header, _header.format(function=function))
+                _write(ldir / ('%s_%d.cc' % (name, s)),
+                       _source.format(header=header, function=function,
+                                      index=s))
+                srcs.append('%s_%d.cc' % (name, s))
+            cls = '%sWidget' % (name.capitalize())
+            _write(ldir / (cls + '.h'), _widget_header.format(cls=cls))
+            _write(ldir / (cls + '.cc'),
+                   _widget_source.format(header=cls + '.h'))
+            if qt:
+                srcs.append(cls + '.cc')
+            requires = ""
+            requires_indented = ""
+            if previous:
+                requires = "env.Require(['%s'])\n" % (previous)
+                requires_indented = "    env.Require(['%s'])\n" % (previous)
+            _write(ldir / ('tool_%s.py' % (name)), _tool_file.format(
+                name=name, sources=srcs, qt_tools=qt_tools,
+                qt_modules=("env.EnableQtModules(['QtCore'])\n"
+                            if qt else ""),
+                requires=requires, requires_indented=requires_indented,
+                package='benchdep%d' % (d % packages)))
+            includes += '#include "%s/%s/%s_0.h"\n' % (group, name, name)
+            calls += "    value += %s_f0(%d);\n" % (name, d)
+            previous = name
+        _write(gdir / 'main.cc', _main.format(includes=includes,
+                                              calls=calls))
+    parameters = {'dirs': dirs, 'sources': sources, 'groups': groups,
+                  'packages': packages, 'qt': qt}
+    _write(root / 'benchmark.json', json.dumps(parameters, indent=2) + "\n")
+    return parameters
+
+
+def _run_scons(root, args):
+    """
+    Run scons in @p root and return the output, the wall time, and the
+    maximum resident set size in kilobytes.
+    """
+    cmd = ['scons', '--site-dir=site_scons', '--debug=time'] + args
+    start = time.perf_counter()
+    child = sp.Popen(cmd, cwd=str(root), stdout=sp.PIPE, stderr=sp.STDOUT,
+                     universal_newlines=True)
+    output = child.stdout.read()
+    _, status, usage = os.wait4(child.pid, 0)
+    elapsed = time.perf_counter() - start
+    child.stdout.close()
+    child.returncode = os.WEXITSTATUS(status)
+    if child.returncode != 0:
+        sys.stderr.write(output)
+        raise sp.CalledProcessError(child.returncode, cmd)
+    return output, elapsed, usage.ru_maxrss
+
+
+def _find_seconds(pattern, output):
+    match = re.search(pattern + r'\s*([0-9.]+)', output)
+    return float(match.group(1)) if match else None
+
+
+def _commit():
+    try:
+        return sp.run(['git', 'describe', '--always', '--dirty'],
+                      cwd=str(_topdir), stdout=sp.PIPE, stderr=sp.DEVNULL,
+                      universal_newlines=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def run(root, repeat, jobs):
+    """
+    Build the tree in @p root, then time @p repeat no-op builds, and return
+    the results as a dictionary.
+    """
+    root = Path(root)
+    parameters = json.loads((root / 'benchmark.json').read_text())
+    _, build_time, _ = _run_scons(root, ['-j', str(jobs)])
+    samples = {'import': [], 'read': [], 'noop': [], 'maxrss_kb': []}
+    for _ in range(repeat):
+        output, elapsed, maxrss = _run_scons(root, ['-j', str(jobs)])
+        samples['import'].append(
+            _find_seconds(r'eol_scons import time:', output))
+        samples['read'].append(
+            _find_seconds(r'Total SConscript file execution time:', output))
+        samples['noop'].append(elapsed)
+        samples['maxrss_kb'].append(maxrss)
+    summary = {key: statistics.median(values)
+               for key, values in samples.items()
+               if None not in values}
+    return {'commit': _commit(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'host': platform.node(),
+            'parameters': parameters,
+            'build': build_time,
+            'median': summary,
+            'samples': samples}
+
+
+def compare(before, after):
+    "Return lines comparing the medians of two result dictionaries."
+    lines = ["%-10s %12s %12s %8s" % ('', before.get('commit', 'before'),
+                                     after.get('commit', 'after'), 'ratio')]
+    for key in sorted(set(before['median']) | set(after['median'])):
+        old = before['median'].get(key)
+        new = after['median'].get(key)
+        ratio = "%.2f" % (new / old) if old and new is not None else "-"
+        lines.append("%-10s %12.3f %12.3f %8s" %
+                     (key, old or 0, new or 0, ratio))
+    if before['parameters'] != after['parameters']:
+        lines.append("warning: the trees were generated with different "
+                     "parameters")
+    return lines
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Generate and time synthetic eol_scons source trees.")
+    commands = parser.add_subparsers(dest='command')
+    gen = commands.add_parser('generate', help="Generate a source tree.")
+    gen.add_argument('root', help="Directory for the tree.")
+    gen.add_argument('--dirs', type=int, default=100,
+                     help="Number of library directories.")
+    gen.add_argument('--sources', type=int, default=10,
+                     help="Number of sources in each library.")
+    gen.add_argument('--groups', type=int, default=None,
+                     help="Number of group directories, default dirs/10.")
+    gen.add_argument('--packages', type=int, default=4,
+                     help="Number of local pkg-config packages.")
+    gen.add_argument('--qt', action='store_true',
+                     help="Compile the Q_OBJECT classes with the qt5 tool.")
+    runp = commands.add_parser('run', help="Time builds of a tree.")
+    runp.add_argument('root', help="Directory of a generated tree.")
+    runp.add_argument('--repeat', type=int, default=3,
+                      help="Number of no-op builds to time.")
+    runp.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                      help="Number of scons jobs.")
+    runp.add_argument('--output', help="Write the results to this file.")
+    comp = commands.add_parser('compare', help="Compare two result files.")
+    comp.add_argument('before')
+    comp.add_argument('after')
+    args = parser.parse_args(argv[1:])
+
+    if args.command == 'generate':
+        groups = args.groups or max(1, (args.dirs + 9) // 10)
+        generate(args.root, args.dirs, args.sources, min(groups, args.dirs),
+                 args.packages, args.qt)
+    elif args.command == 'run':
+        results = run(args.root, args.repeat, args.jobs)
+        text = json.dumps(results, indent=2) + "\n"
+        if args.output:
+            Path(args.output).write_text(text)
+        sys.stdout.write(text)
+    elif args.command == 'compare':
+        before = json.loads(Path(args.before).read_text())
+        after = json.loads(Path(args.after).read_text())
+        print("\n".join(compare(before, after)))
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
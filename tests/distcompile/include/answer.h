@@ -0,0 +1 @@
+int answer(void);
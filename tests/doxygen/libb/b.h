@@ -0,0 +1,2 @@
+/** A function in libb. */
+int b();
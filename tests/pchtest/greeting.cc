@@ -0,0 +1,7 @@
+#include "common.h"
+
+std::string
+greeting()
+{
+    return "hello";
+}
@@ -0,0 +1,11 @@
+#include "common.h"
+
+std::string greeting();
+
+int
+main()
+{
+    std::vector<std::string> words{greeting(), "world"};
+    std::cout << words[0] << " " << words[1] << std::endl;
+    return 0;
+}
@@ -0,0 +1,36 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+import json
+import shutil
+
+import pytest
+
+import benchmark
+
+
+def test_generate(tmp_path):
+    params = benchmark.generate(tmp_path, 5, 3, 2, 2, False)
+    assert params == {'dirs': 5, 'sources': 3, 'groups': 2,
+                      'packages': 2, 'qt': False}
+    tools = sorted(p.name for p in tmp_path.glob('group*/*/tool_*.py'))
+    assert tools == ['tool_bench%04d.py' % (d) for d in range(5)]
+    assert len(list(tmp_path.glob('group01/bench0001/*.cc'))) == 4
+    assert 'Q_OBJECT' in (tmp_path / 'group00' / 'bench0000' /
+                          'Bench0000Widget.h').read_text()
+    assert (tmp_path / 'pkgconfig' / 'benchdep1.pc').exists()
+    assert json.loads((tmp_path / 'benchmark.json').read_text()) == params
+
+
+@pytest.mark.skipif(not shutil.which('g++') or not shutil.which('scons'),
+                    reason="requires g++ and scons")
+def test_run(tmp_path):
+    benchmark.generate(tmp_path, 2, 2, 1, 1, False)
+    results = benchmark.run(tmp_path, 1, 2)
+    assert results['parameters']['dirs'] == 2
+    for key in ['import', 'read', 'noop', 'maxrss_kb']:
+        assert results['median'][key] > 0
+    assert results['median']['read'] < results['median']['noop']
+    lines = benchmark.compare(results, results)
+    assert lines[1].split()[-1] == '1.00'
@@ -0,0 +1,75 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+
+import os
+import subprocess as sp
+
+import pytest
+from SCons.Environment import Environment
+
+import eol_scons.tools.boost as boost
+
+
+def _fake_boost(root, version):
+    header = root / "boost" / "version.hpp"
+    header.parent.mkdir(parents=True, exist_ok=True)
+    header.write_text("#define BOOST_VERSION %d\n" % (version))
+    return header
+
+
+@pytest.fixture
+def popen_calls(monkeypatch):
+    calls = []
+    popen = sp.Popen
+
+    def counting_popen(cmd, *args, **kw):
+        if '-E' in cmd:
+            calls.append(cmd)
+        return popen(cmd, *args, **kw)
+
+    monkeypatch.setattr(sp, 'Popen', counting_popen)
+    monkeypatch.setattr(boost, '_version_cache', None)
+    return calls
+
+
+def test_boost_version_cached(tmp_path, popen_calls, monkeypatch):
+    include = tmp_path / "include"
+    header = _fake_boost(include, 107500)
+    confdir = str(tmp_path / "sconf")
+
+    def make_env():
+        return Environment(tools=['default'], CPPPATH=[str(include)],
+                           CONFIGUREDIR=confdir)
+
+    assert boost.boost_version(make_env()) == 107500
+    assert len(popen_calls) == 1
+    assert os.path.exists(os.path.join(confdir, boost._VERSION_CACHE_FILE))
+
+    # Another environment reuses the in-memory result.
+    env = make_env()
+    assert boost.boost_version(env) == 107500
+    assert env['BOOST_VERSION'] == 107500
+    assert len(popen_calls) == 1
+
+    # A new process reads the result from the cache file.
+    monkeypatch.setattr(boost, '_version_cache', None)
+    assert boost.boost_version(make_env()) == 107500
+    assert len(popen_calls) == 1
+
+    # Updating version.hpp probes the compiler again.
+    _fake_boost(include, 108300)
+    stat = header.stat()
+    os.utime(str(header), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert boost.boost_version(make_env()) == 108300
+    assert len(popen_calls) == 2
+
+
+def test_boost_version_string_cpppath(tmp_path, popen_calls):
+    include = tmp_path / "include"
+    _fake_boost(include, 107500)
+    env = Environment(tools=['default'], CPPPATH=str(include),
+                      CONFIGUREDIR=str(tmp_path / "sconf"))
+    assert boost._version_cache_key(env, ['g++']) is not None
+    assert boost.boost_version(env) == 107500
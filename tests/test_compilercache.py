@@ -0,0 +1,48 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+
+import os
+
+from SCons.Script import Environment
+
+import eol_scons.tools.compilercache as compilercache
+
+
+def test_compilercache(tmpdir, capsys, monkeypatch):
+    stats = tmpdir.join('stats')
+    stats.write('direct_cache_hit\t3\npreprocessed_cache_hit\t1\n'
+                'cache_miss\t2\nversion\t4.8\n')
+    fake = tmpdir.join('ccache')
+    fake.write('#!/bin/sh\ncat "$FAKE_CCACHE_STATS"\n')
+    fake.chmod(0o755)
+    monkeypatch.setattr(compilercache, '_start_stats', {})
+    monkeypatch.setattr(compilercache.atexit, 'register', lambda f: None)
+
+    env = Environment(tools=['default'],
+                      ENV={'PATH': str(tmpdir) + ':' + os.environ['PATH'],
+                           'FAKE_CCACHE_STATS': str(stats)})
+    compilercache.generate(env)
+    assert env['COMPILERCACHE'] == str(fake)
+    assert env.subst('$CXXCOM', target=[env.File('x.o')],
+                     source=[env.File('x.cc')]).startswith(str(fake) + ' ')
+    assert env['ENV']['CCACHE_BASEDIR'] == env.Dir('#').get_abspath()
+    assert 'include_file_mtime' in env['ENV']['CCACHE_SLOPPINESS']
+    assert env['ENV']['CCACHE_NOHASHDIR'] == '1'
+
+    # Applying the tool again does not prefix the commands again.
+    clone = env.Clone()
+    compilercache.generate(clone)
+    assert clone['CCCOM'].count('$COMPILERCACHE') == 1
+
+    stats.write('direct_cache_hit\t10\npreprocessed_cache_hit\t1\n'
+                'cache_miss\t5\n')
+    compilercache._print_stats()
+    out = capsys.readouterr().out
+    assert "7 hits, 3 misses, 70% hit rate" in out
+
+    # Disabled with an empty launcher.
+    env['COMPILERCACHE'] = ''
+    assert env.subst('$CCCOM', target=[env.File('x.o')],
+                     source=[env.File('x.c')]).startswith('gcc ')
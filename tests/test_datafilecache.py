@@ -8,8 +8,13 @@
 # env PYTHONPATH=/usr/lib/scons py.test datafilecache.py
 
 import os
+import http.server
+import threading
+import time
+from email.utils import formatdate
 from pathlib import Path
-from eol_scons.datafilecache import DataFileCache
+import pytest
+from eol_scons.datafilecache import DataFileCache, HttpFetcher
 
 
 def test_datafilecache(tmpdir):
@@ -72,3 +77,266 @@ def test_cachepaths():
     assert dfcache.localDownloadPath() == os.getenv('HOME')
     if not envhome:
         del os.environ['HOME']
+
+
+class _DataHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serve one in-memory file with ETag, Last-Modified and Range support, and
+    count requests and connections on the server.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    content = b'0123456789' * 100000
+    etag = '"v1"'
+    mtime = 1500000000
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.path.startswith('/moved/'):
+            self.send_response(302)
+            self.send_header('Location', self.path[len('/moved'):])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        lastmod = formatdate(self.mtime, usegmt=True)
+        if (self.headers.get('If-None-Match') == self.etag or
+                self.headers.get('If-Modified-Since') == lastmod):
+            self.send_response(304)
+            self.send_header('ETag', self.etag)
+            self.end_headers()
+            return
+        body = self.content
+        status = 200
+        brange = self.headers.get('Range')
+        if brange and self.headers.get('If-Range') == self.etag:
+            start = int(brange[len('bytes='):].rstrip('-'))
+            body = body[start:]
+            status = 206
+        self.send_response(status)
+        self.send_header('ETag', self.etag)
+        self.send_header('Last-Modified', lastmod)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def httpserver():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _DataHandler)
+    server.connections = 0
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_download(tmpdir, httpserver):
+    dfcache = DataFileCache(str(tmpdir))
+    port = httpserver.server_address[1]
+    dfcache.setRemotePrefix(f"http://127.0.0.1:{port}/data")
+    target = 'project/file.nc'
+    xpath = str(tmpdir.join(target))
+    assert dfcache.download(target) == xpath
+    assert dfcache.http_url == f"http://127.0.0.1:{port}/data/{target}"
+    assert Path(xpath).read_bytes() == _DataHandler.content
+    assert os.path.getmtime(xpath) == _DataHandler.mtime
+    assert Path(xpath + '.etag').read_text() == _DataHandler.etag
+    fetcher = dfcache.getHttpFetcher()
+    assert fetcher.last_status == 200
+
+    # an unchanged file just gets a 304 on the same connection
+    assert dfcache.download(target) == xpath
+    assert fetcher.last_status == 304
+    assert httpserver.requests[-1]['If-None-Match'] == _DataHandler.etag
+    assert httpserver.connections == 1
+
+    # redirects are followed
+    dfcache.setRemotePrefix(f"http://127.0.0.1:{port}/moved/data")
+    assert dfcache.download(target) == xpath
+    assert fetcher.last_status == 304
+    assert httpserver.connections == 1
+
+
+def test_http_resume(tmpdir, httpserver):
+    fetcher = HttpFetcher()
+    port = httpserver.server_address[1]
+    url = f"http://127.0.0.1:{port}/data/file.nc"
+    destpath = str(tmpdir.join('file.nc'))
+    Path(destpath + '.part').write_bytes(_DataHandler.content[:12345])
+    Path(destpath + '.etag').write_text(_DataHandler.etag)
+    assert fetcher.fetch(url, destpath) == destpath
+    assert fetcher.last_status == 206
+    assert httpserver.requests[-1]['Range'] == 'bytes=12345-'
+    assert Path(destpath).read_bytes() == _DataHandler.content
+    assert not os.path.exists(destpath + '.part')
+
+    # a partial file with a stale validator is replaced with the whole file
+    Path(destpath + '.part').write_bytes(b'stale')
+    Path(destpath + '.etag').write_text('"v0"')
+    assert fetcher.fetch(url, destpath) == destpath
+    assert fetcher.last_status == 200
+    assert Path(destpath).read_bytes() == _DataHandler.content
+    fetcher.close()
+
+
+def test_http_failure(tmpdir, httpserver):
+    fetcher = HttpFetcher()
+    port = httpserver.server_address[1]
+    destpath = str(tmpdir.join('file.nc'))
+    # nothing listening on the port once the server is closed
+    httpserver.shutdown()
+    httpserver.server_close()
+    assert fetcher.fetch(f"http://127.0.0.1:{port}/f", destpath) is None
+    assert not os.path.exists(destpath)
+
+
+def _master_setup(tmpdir):
+    master = tmpdir.mkdir('master')
+    cache = tmpdir.mkdir('cache')
+    mfile = Path(str(master.join('project/data.nc')))
+    mfile.parent.mkdir()
+    mfile.write_bytes(b'x' * 100000)
+    os.utime(mfile, (1500000000, 1500000000))
+    dfcache = DataFileCache(str(cache))
+    dfcache.setRemotePrefix(f"nosuchhost:{master}")
+    return dfcache, mfile, Path(str(cache.join('project/data.nc')))
+
+
+@pytest.mark.parametrize('policy', ['symlink', 'hardlink', 'copy'])
+def test_materialize(tmpdir, policy):
+    dfcache, mfile, cfile = _master_setup(tmpdir)
+    dfcache.setMaterializePolicy(policy)
+    assert dfcache.download('project/data.nc') == str(cfile)
+    assert cfile.read_bytes() == mfile.read_bytes()
+    assert cfile.is_symlink() == (policy == 'symlink')
+    assert os.path.samefile(cfile, mfile) == (policy != 'copy')
+    assert not os.path.exists(str(cfile) + '.tmp')
+    # second download finds the cache entry current
+    ino = cfile.lstat().st_ino
+    assert dfcache.download('project/data.nc') == str(cfile)
+    assert cfile.lstat().st_ino == ino
+
+
+def test_materialize_auto(tmpdir):
+    dfcache, mfile, cfile = _master_setup(tmpdir)
+    assert dfcache.getMaterializePolicy() == 'auto'
+    # an old symlink is replaced with a local file
+    cfile.parent.mkdir()
+    cfile.symlink_to(mfile)
+    assert dfcache.download('project/data.nc') == str(cfile)
+    assert not cfile.is_symlink()
+    # never a hard link, which would share the master
+    assert not os.path.samefile(cfile, mfile)
+    assert cfile.read_bytes() == mfile.read_bytes()
+    assert os.path.getmtime(cfile) == os.path.getmtime(mfile)
+
+    # an out of date copy is replaced
+    dfcache.setMaterializePolicy('copy')
+    mfile.write_bytes(b'y' * 100)
+    assert dfcache.download('project/data.nc') == str(cfile)
+    assert cfile.read_bytes() == mfile.read_bytes()
+
+    # switching to symlink replaces the copy
+    dfcache.setMaterializePolicy('symlink')
+    assert dfcache.download('project/data.nc') == str(cfile)
+    assert cfile.is_symlink()
+    assert os.path.samefile(cfile, mfile)
+
+    with pytest.raises(Exception):
+        dfcache.setMaterializePolicy('move')
+
+
+def test_materialize_symlink_keeps_files(tmpdir):
+    dfcache, mfile, cfile = _master_setup(tmpdir)
+    dfcache.setMaterializePolicy('symlink')
+    # a file which is not a copy of the master is left alone
+    cfile.parent.mkdir()
+    cfile.write_bytes(b'z' * 10)
+    assert dfcache.download('project/data.nc') is None
+    assert not cfile.is_symlink()
+    assert cfile.read_bytes() == b'z' * 10
+
+    # the master is never replaced when the cache is the master directory
+    dfcache = DataFileCache(str(mfile.parent.parent))
+    dfcache.setRemotePrefix(f"nosuchhost:{mfile.parent.parent}")
+    dfcache.setMaterializePolicy('symlink')
+    assert dfcache.download('project/data.nc') is None
+    assert not mfile.is_symlink()
+    assert mfile.read_bytes() == b'x' * 100000
+
+
+def test_register_benchmark(tmpdir, monkeypatch):
+    "Register 10k files against several cache dirs without a stat apiece."
+    cdirs = [tmpdir.mkdir(f"cache{i}") for i in range(3)]
+    files = []
+    for d in range(100):
+        ddir = cdirs[-1].mkdir(f"dir{d}")
+        for f in range(100):
+            ddir.join(f"file{f}.nc").write("")
+            files.append(f"dir{d}/file{f}.nc")
+    dfcache = DataFileCache()
+    for cdir in cdirs:
+        dfcache.appendCachePath(str(cdir))
+
+    scandir = os.scandir
+    calls = []
+
+    def counting_scandir(path):
+        calls.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', counting_scandir)
+    monkeypatch.setattr(os.path, 'exists', None)
+    start = time.time()
+    for filepath in files:
+        assert dfcache.getFile(filepath) == str(cdirs[-1].join(filepath))
+    elapsed = time.time() - start
+    # missing files resolve to the first existing cache directory
+    assert dfcache.getFile('dir0/missing.nc') == str(cdirs[0].join(
+        'dir0/missing.nc'))
+    monkeypatch.undo()
+    print("registered %d files in %.3f seconds with %d directory reads" %
+          (len(files), elapsed, len(calls)))
+    # every directory is read once: 3 cache dirs plus the 100 subdirs
+    assert len(calls) == 103
+
+    # a refreshed index sees files added since
+    cdirs[0].mkdir('new').join('file.nc').write("")
+    dfcache.refreshIndex()
+    assert dfcache.getFile('new/file.nc') == str(cdirs[0].join('new/file.nc'))
+
+
+def test_register_symlinks(tmpdir, monkeypatch):
+    "Symlinks in the cache are only checked when a lookup finds them."
+    master = tmpdir.mkdir('master')
+    cache = tmpdir.mkdir('cache')
+    for f in range(10):
+        master.join(f"file{f}.nc").write("")
+        cache.join(f"file{f}.nc").mksymlinkto(master.join(f"file{f}.nc"))
+    cache.join('broken.nc').mksymlinkto(master.join('nosuchfile.nc'))
+    dfcache = DataFileCache(str(cache))
+
+    exists = os.path.exists
+    checked = []
+
+    def counting_exists(path):
+        checked.append(path)
+        return exists(path)
+
+    monkeypatch.setattr(os.path, 'exists', counting_exists)
+    assert dfcache.getFile('file0.nc') == str(cache.join('file0.nc'))
+    assert checked == [str(cache.join('file0.nc'))]
+    assert dfcache._exists(str(cache), 'file0.nc')
+    assert not dfcache._exists(str(cache), 'broken.nc')
+    assert not dfcache._exists(str(cache), 'broken.nc')
+    assert checked == [str(cache.join('file0.nc')),
+                       str(cache.join('broken.nc'))]
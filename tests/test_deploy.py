@@ -0,0 +1,51 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+from pathlib import Path
+import shutil
+import sys
+
+import eol_scons
+from SCons.Script import Environment
+
+import pytest
+import conftest
+
+
+_this_file = "test_deploy.py"
+
+
+# SConstruct file begins here
+if not conftest.called_from_test:
+    print("Executing SConstruct %s" % (_this_file))
+    env = Environment(tools=['default', 'deploy'],
+                      DEPLOY_DIRECTORY='#deploytest',
+                      DEPLOY_SHARED_LIBS=['c'])
+    hello = env.Program('deploy_hello', 'subdir/helloworld.c',
+                        OBJPREFIX='deploy_')
+    env.DeployProgram(hello)
+
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'),
+                                reason="deploy resolves ELF dependencies")
+
+
+@pytest.fixture(scope="module")
+def deploy_tasks():
+    shutil.rmtree('deploytest', ignore_errors=True)
+    first = conftest.run_scons(_this_file)
+    second = conftest.run_scons(_this_file)
+    return first, second
+
+
+def test_deploy(deploy_tasks):
+    first, second = deploy_tasks
+    program = Path('deploytest/bin/deploy_hello')
+    assert program.exists()
+    assert program.read_bytes() == Path('deploy_hello').read_bytes()
+    libc = list(Path('deploytest/lib').glob('libc.so*'))
+    assert len(libc) == 1
+    assert "Deploying" in first.stdout
+    # nothing changed, so nothing is deployed again
+    assert "Deploying" not in second.stdout
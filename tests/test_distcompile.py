@@ -0,0 +1,138 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+from pathlib import Path
+import shutil
+import subprocess as sp
+import threading
+import time
+
+import eol_scons
+from SCons.Script import Environment, ARGUMENTS
+
+import pytest
+import conftest
+
+import eol_scons.distcompile as dc
+
+
+_this_file = "test_distcompile.py"
+
+
+def _spawn_here(sh, escape, cmd, args, env):
+    print("spawned here: %s" % (cmd))
+    return env['SPAWN_DEFAULT'](sh, escape, cmd, args, env)
+
+
+def _report_slot(target, source, env):
+    print("python action holds slot: %s" %
+          (getattr(env['SPAWN'].pool._held, 'slot', False)))
+
+
+# SConstruct file begins here
+if not conftest.called_from_test:
+    print("Executing SConstruct %s" % (_this_file))
+    ARGUMENTS['DISTCOMPILE'] = 'loopback'
+    env = Environment(tools=['default', 'distcompile'],
+                      DISTCOMPILE_SLOTS=3, DISTCOMPILE_LOCAL_JOBS=1,
+                      CPPPATH=['distcompile/include'],
+                      CPPDEFINES=[('ANSWER', 42)])
+    env.Program('distcompile/answer', ['distcompile/main.c',
+                                       'distcompile/answer.c'])
+    env.AlwaysBuild(env.Command('distcompile/slot', [], _report_slot))
+    print("jobs: %s" % (env.GetOption('num_jobs')))
+    custom = env.Clone(SPAWN_DEFAULT=env['SPAWN'].spawn)
+    custom['SPAWN'] = _spawn_here
+    custom.Tool('distcompile')
+    print("custom spawn kept: %s" % (custom['SPAWN'].spawn is _spawn_here))
+    print("pool shared: %s" % (custom['SPAWN'].pool is env['SPAWN'].pool))
+
+
+def test_split_compile():
+    args = ['g++', '-o', 'x.o', '-c', '-O2', '-Iinc', '-I', 'other',
+            '-DX=1', '-include', 'pch.h', 'x.cc']
+    preprocess, compile, source, output = dc.split_compile(args)
+    assert preprocess == ['g++', '-O2', '-Iinc', '-I', 'other', '-DX=1',
+                          '-include', 'pch.h']
+    assert compile == ['g++', '-O2']
+    assert source == 'x.cc'
+    assert output == 'x.o'
+    assert dc.split_compile(['g++', '-o', 'x', 'x.o', 'y.o']) is None
+    assert dc.host_slots("localhost/4 build1 --randomize") == 6
+
+
+def test_local_pool_spawner():
+    running = {'local': 0, 'distributed': 0}
+    peak = {'local': 0, 'distributed': 0}
+    lock = threading.Lock()
+
+    def spawn(sh, escape, cmd, args, env):
+        kind = 'distributed' if cmd == 'distcc' else 'local'
+        with lock:
+            running[kind] += 1
+            peak[kind] = max(peak[kind], running[kind])
+        time.sleep(0.05)
+        with lock:
+            running[kind] -= 1
+        return 0
+
+    spawner = dc.LocalPoolSpawner(spawn, 2, ['distcc', ''])
+    threads = []
+    for i in range(4):
+        for args in (['ld', '-o', 'x%d' % i], ['distcc', 'gcc', '-c']):
+            threads.append(threading.Thread(
+                target=spawner, args=('sh', None, args[0], args, {})))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert 1 <= peak['local'] <= 2
+    assert peak['distributed'] >= 1
+
+
+def test_local_pool_reentrant():
+    pool = dc.LocalPool(1)
+    spawner = dc.LocalPoolSpawner(lambda *args: 0, 1, [], pool)
+    # a python action holding the only slot can still run a command
+    with pool.slot():
+        assert spawner('sh', None, 'ld', ['ld'], {}) == 0
+    assert spawner.pool is pool
+
+
+def test_launcher_with_spaces():
+    spawner = dc.LocalPoolSpawner(None, 1, ["'/opt/my tools/python' dc.py"])
+    # scons escapes arguments with spaces, or splits them if the launcher
+    # was substituted into the command as a string.
+    assert spawner.is_distributed(['"/opt/my tools/python"', 'dc.py', 'gcc'])
+    assert spawner.is_distributed(["'/opt/my", "tools/python'", 'dc.py',
+                                   'gcc'])
+    assert not spawner.is_distributed(['gcc', '-o', 'x'])
+
+
+@pytest.mark.skipif(not shutil.which('gcc'), reason="requires gcc")
+def test_distcompile_loopback():
+    for built in Path('distcompile').glob('*.o'):
+        built.unlink()
+    task = conftest.run_scons(_this_file)
+    compiles = [line for line in task.stdout.splitlines()
+                if line.endswith('.c')]
+    assert len(compiles) == 2
+    assert all(dc.__file__ in line for line in compiles)
+    assert "jobs: 4" in task.stdout
+    assert "custom spawn kept: True" in task.stdout
+    assert "pool shared: True" in task.stdout
+    assert "python action holds slot: True" in task.stdout
+    output = sp.run(['distcompile/answer'], stdout=sp.PIPE,
+                    universal_newlines=True).stdout
+    assert output.strip() == "42"
+
+
+@pytest.mark.skipif(not shutil.which('gcc'), reason="requires gcc")
+def test_explicit_jobs():
+    task = sp.run(['scons', f'--site-dir={conftest.sitepath}', '-f',
+                   _this_file, '-n', '-j1', '.'], universal_newlines=True,
+                  stdout=sp.PIPE, stderr=sp.STDOUT)
+    print(task.stdout)
+    task.check_returncode()
+    assert "jobs: 1" in task.stdout
@@ -0,0 +1,107 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import eol_scons
+import eol_scons.tools.doxygen as doxygen
+from SCons.Script import Environment, Export, SConscript
+
+import conftest
+
+
+_this_file = "test_doxygen.py"
+
+
+# SConstruct file begins here
+if not conftest.called_from_test:
+    print("Executing SConstruct %s" % (_this_file))
+    env = Environment(tools=['default', 'doxygen'],
+                      DOXYGEN=sys.executable + ' doxygen/fake_doxygen.py',
+                      APIDOCSDIR='#doxygen/apidocs',
+                      DOXYFILE_DICT={
+                          'PROJECT_NUMBER':
+                          os.environ.get('DOXYGEN_TEST_VERSION', '1.0'),
+                          'EXCLUDE_PATTERNS':
+                          {'moc_*', 'ui_*', '*_p.h', '*_private.h'}})
+    env.SetOption('num_jobs', 4)
+    Export('env')
+    SConscript(['doxygen/liba/SConscript', 'doxygen/libb/SConscript'])
+
+
+def test_tagfiles_first():
+    shutil.rmtree('doxygen/apidocs', ignore_errors=True)
+    Path('doxygen/runs.log').unlink(missing_ok=True)
+    conftest.run_scons(_this_file)
+    runs = {run['config']: run for run in
+            (json.loads(line) for line in
+             Path('doxygen/runs.log').read_text().splitlines())}
+    apidocs = 'doxygen/apidocs/doxygen_'
+    assert sorted(runs) == [apidocs + 'liba/Doxyfile.main',
+                            apidocs + 'liba/Doxyfile.tags',
+                            apidocs + 'libb/Doxyfile.main',
+                            apidocs + 'libb/Doxyfile.tags']
+    atags = runs[apidocs + 'liba/Doxyfile.tags']
+    btags = runs[apidocs + 'libb/Doxyfile.tags']
+    # the tag files do not depend on each other, so they are generated at
+    # the same time, and then the projects can link to each other.
+    assert atags['start'] < btags['end'] and btags['start'] < atags['end']
+    for project in ['liba', 'libb']:
+        assert runs[apidocs + project + '/Doxyfile.main']['start'] >= \
+            max(atags['end'], btags['end'])
+    index = Path(apidocs + 'libb/html/index.html').read_text()
+    assert index == "index for doxygen_libb\ntags for doxygen_liba\n"
+    index = Path(apidocs + 'liba/html/index.html').read_text()
+    assert index == "index for doxygen_liba\ntags for doxygen_libb\n"
+
+
+def test_stable_doxyfile(monkeypatch):
+    # the order of a set changes with the hash seed, but the Doxyfile
+    # contents should not.
+    monkeypatch.setenv('PYTHONHASHSEED', '1')
+    conftest.run_scons(_this_file)
+    runs = Path('doxygen/runs.log').read_text()
+    monkeypatch.setenv('PYTHONHASHSEED', '2')
+    task = conftest.run_scons(_this_file)
+    assert "creating Doxygen config file" not in task.stdout
+    assert Path('doxygen/runs.log').read_text() == runs
+    doxyfile = Path('doxygen/apidocs/doxygen_liba/Doxyfile').read_text()
+    assert ('EXCLUDE_PATTERNS = "*_p.h" "*_private.h" "moc_*" "ui_*"\n'
+            in doxyfile)
+    assert 'PROJECT_NUMBER = "1.0"\n' in doxyfile
+    monkeypatch.setenv('DOXYGEN_TEST_VERSION', '2.0')
+    task = conftest.run_scons(_this_file)
+    assert ("Doxyfile doxygen/apidocs/doxygen_liba/Doxyfile settings "
+            "changed: PROJECT_NUMBER") in task.stdout
+
+
+def test_missing_headers(tmp_path):
+    for path in ['a.h', 'b.h', 'moc_a.h', 'ui_form.h', 'form.ui.h',
+                 'uic_form.h', 'a.cc', 'sub/c.h', '.hidden/d.h',
+                 'apidocs/e.h']:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("")
+    inventory = doxygen.HeaderInventory(str(tmp_path),
+                                        [str(tmp_path / 'apidocs')])
+    assert inventory == {'a.h', 'b.h', os.path.join('sub', 'c.h')}
+    missing = doxygen.CheckMissingHeaders(str(tmp_path), ['a.h'], ['./b.h'],
+                                          [str(tmp_path / 'apidocs')])
+    assert missing == [str(tmp_path / 'sub' / 'c.h')]
+    # the inventory is cached, so a new header is not seen in this run.
+    (tmp_path / 'sub' / 'f.h').write_text("")
+    assert doxygen.CheckMissingHeaders(
+        str(tmp_path / 'sub'), [], []) == [str(tmp_path / 'sub' / 'c.h')]
+
+
+def test_missing_headers_symlinks(tmp_path):
+    (tmp_path / 'src' / 'sub').mkdir(parents=True)
+    (tmp_path / 'src' / 'sub' / 'c.h').write_text("")
+    (tmp_path / 'src' / 'link').symlink_to('sub')
+    (tmp_path / 'src' / 'sub' / 'up').symlink_to('..')
+    inventory = doxygen.HeaderInventory(str(tmp_path / 'src'))
+    assert inventory == {os.path.join('sub', 'c.h')}
@@ -0,0 +1,157 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+
+import os
+import shutil
+import subprocess as sp
+
+import pytest
+from SCons.Environment import Environment
+
+from eol_scons.gitinfo import GitInfo, GitRepo, CACHE_FILE
+
+pytestmark = pytest.mark.skipif(not shutil.which('git'),
+                                reason="requires git")
+
+
+def _git(repo, *args):
+    sp.run(['git'] + list(args), cwd=str(repo), check=True,
+           stdout=sp.PIPE, stderr=sp.PIPE)
+
+
+@pytest.fixture
+def repo(tmpdir, monkeypatch):
+    for var in ['AUTHOR', 'COMMITTER']:
+        monkeypatch.setenv(f'GIT_{var}_NAME', 'Tester')
+        monkeypatch.setenv(f'GIT_{var}_EMAIL', 'tester@example.com')
+    repo = tmpdir.mkdir('repo')
+    _git(repo, 'init', '-q')
+    _git(repo, 'remote', 'add', 'origin', 'https://example.com/repo.git')
+    repo.join('file.txt').write('one\n')
+    _git(repo, 'add', 'file.txt')
+    _git(repo, 'commit', '-q', '-m', 'first')
+    _git(repo, 'tag', '-a', 'v1.0', '-m', 'v1.0')
+    repo.join('file.txt').write('two\n')
+    _git(repo, 'commit', '-q', '-a', '-m', 'second')
+    GitInfo._commit_cache.clear()
+    return repo
+
+
+def _command_values(path):
+    ginfo = GitInfo(repopath=path)
+    ginfo._set_values(ginfo._git_info_commands())
+    return ginfo.values
+
+
+class CountingGitInfo(GitInfo):
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.commands = []
+
+    def _get_output(self, cmd):
+        self.commands.append(cmd[1])
+        return super()._get_output(cmd)
+
+
+def test_matches_commands(repo):
+    ginfo = CountingGitInfo(repopath=str(repo)).getRepoInfo()
+    assert ginfo.values == _command_values(str(repo))
+    assert ginfo.values['REPO_REVISION'] == 'v1.0-1'
+    assert ginfo.values['REPO_URL'] == 'https://example.com/repo.git'
+    assert ginfo.commands == ['log', 'status']
+
+    # subdirectories, detached heads, and exact tags
+    subdir = repo.mkdir('subdir')
+    _git(repo, 'checkout', '-q', 'v1.0')
+    ginfo = GitInfo(repopath=str(subdir)).getRepoInfo()
+    assert ginfo.values == _command_values(str(subdir))
+    assert ginfo.values['REPO_BRANCH'] == 'HEAD'
+    assert ginfo.values['REPO_REVISION'] == 'v1.0'
+
+
+def test_cache(repo):
+    GitInfo(repopath=str(repo)).getRepoInfo()
+    assert repo.join('.git', CACHE_FILE).exists()
+    # a new process only needs git status
+    GitInfo._commit_cache.clear()
+    ginfo = CountingGitInfo(repopath=str(repo)).getRepoInfo()
+    assert ginfo.commands == ['status']
+    assert ginfo.values['REPO_REVISION'] == 'v1.0-1'
+
+    # new tags and commits invalidate the cache
+    _git(repo, 'tag', '-a', 'v1.1', '-m', 'v1.1')
+    ginfo = CountingGitInfo(repopath=str(repo)).getRepoInfo()
+    assert ginfo.commands == ['log', 'status']
+    assert ginfo.values['REPO_REVISION'] == 'v1.1'
+    _git(repo, 'pack-refs', '--all')
+    _git(repo, 'commit', '-q', '--allow-empty', '-m', 'third')
+    ginfo = GitInfo(repopath=str(repo)).getRepoInfo()
+    assert ginfo.values['REPO_REVISION'] == 'v1.1-1'
+    assert ginfo.values == _command_values(str(repo))
+
+    # working tree changes are always seen
+    repo.join('file.txt').write('three\n')
+    ginfo = GitInfo(repopath=str(repo)).getRepoInfo()
+    assert ginfo.values['REPO_REVISION'] == 'v1.1-1M'
+
+
+def test_worktree(repo, tmpdir):
+    wtree = tmpdir.join('wtree')
+    _git(repo, 'worktree', 'add', '-q', '-b', 'feature', str(wtree))
+    repository = GitRepo.find(str(wtree))
+    assert repository.commondir == os.path.realpath(str(repo.join('.git')))
+    ginfo = GitInfo(repopath=str(wtree)).getRepoInfo()
+    assert ginfo.values == _command_values(str(wtree))
+    assert ginfo.values['REPO_BRANCH'] == 'feature'
+
+
+def test_dirty_checks(repo):
+    subdir = repo.mkdir('subdir')
+    repo.join('untracked.txt').write('new\n')
+    subdir.join('untracked.txt').write('new\n')
+    repo.join('file.txt').write('changed\n')
+
+    def dirty(checks):
+        ginfo = GitInfo({'GIT_DIRTY_CHECK': checks}, repopath=str(subdir))
+        ginfo.getRepoInfo()
+        assert 'status' in ginfo.timings
+        return ginfo.values['REPO_DIRTY'].split(',')
+
+    assert dirty([]) == ['M file.txt', '?? subdir/', '?? untracked.txt']
+    assert dirty('tracked') == ['M file.txt']
+    assert dirty(['workdir']) == ['?? subdir/']
+    assert dirty('tracked,workdir') == ['']
+    assert dirty('cached') == dirty('none')
+    with pytest.raises(ValueError):
+        GitInfo({'GIT_DIRTY_CHECK': 'fast'})
+
+
+def test_preload(repo, tmpdir, monkeypatch):
+    import eol_scons.tools.gitinfo as gtool
+
+    monkeypatch.setattr(gtool, '_gitinfomap', {})
+    sub = tmpdir.mkdir('sub')
+    _git(sub, 'init', '-q')
+    _git(sub, 'commit', '-q', '--allow-empty', '-m', 'sub')
+    _git(repo, '-c', 'protocol.file.allow=always', 'submodule', 'add', '-q',
+         str(sub), 'lib/sub')
+    subdir = os.path.realpath(str(repo.join('lib', 'sub')))
+    assert gtool._find_submodules(str(repo)) == [subdir]
+
+    env = Environment(tools=['default'])
+    gtool.PreloadGitInfo(env, [str(repo), subdir], jobs=2)
+    for workdir in [str(repo), subdir]:
+        ginfo = gtool._gitinfomap[workdir]
+        assert ginfo.repopath == workdir
+        assert ginfo.values == _command_values(workdir)
+
+
+def test_dirty_check_setting():
+    env = Environment(tools=['default'], GIT_DIRTY_CHECK=['tracked'])
+    env.Tool('gitinfo')
+    assert env['GIT_DIRTY_CHECK'] == ['tracked']
+    env = Environment(tools=['default', 'gitinfo'])
+    assert env['GIT_DIRTY_CHECK'] == []
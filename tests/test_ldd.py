@@ -0,0 +1,52 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+
+import os
+import re
+import shutil
+import subprocess as sp
+import sys
+
+import pytest
+from SCons.Environment import Environment
+
+import eol_scons.ldd as ldd
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux') or
+                                not shutil.which('ldd'),
+                                reason="requires linux and ldd")
+
+
+def _run_ldd(path):
+    out = sp.run(['ldd', path], stdout=sp.PIPE, universal_newlines=True)
+    return {m.group(1): os.path.realpath(m.group(2)) for m in
+            re.finditer(r"^\s*(\S+) => (\S+) \(", out.stdout, re.M)}
+
+
+def test_matches_ldd():
+    program = sys.executable
+    deps = ldd.shared_dependencies(program)
+    resolved = {name: os.path.realpath(path)
+                for name, path in deps.items()
+                if path and not name.startswith('ld-linux')}
+    assert resolved == _run_ldd(program)
+    # the result is memoized
+    assert ldd.shared_dependencies(program) is deps
+
+
+def test_not_elf(tmpdir):
+    script = tmpdir.join('script.sh')
+    script.write("#! /bin/sh\n")
+    assert ldd.read_elf(str(script)) is None
+    assert ldd.shared_dependencies(str(script)) is None
+
+
+def test_ldd_names():
+    env = Environment(tools=['default'])
+    libs = ldd.ldd(env.File(shutil.which('ls')), env)
+    assert 'c' in libs
+    assert os.path.exists(libs['c'].get_abspath())
+    libs = ldd.ldd(env.File(shutil.which('ls')), env, ['c'])
+    assert list(libs.keys()) == ['c']
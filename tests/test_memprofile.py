@@ -0,0 +1,57 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+import tracemalloc
+
+import eol_scons
+from SCons.Script import SConscript
+
+import conftest
+
+import eol_scons.memprofile as esm
+import eol_scons.profiling as esp
+
+
+_this_file = "test_memprofile.py"
+
+
+# SConstruct file begins here
+if not conftest.called_from_test:
+    print("Executing SConstruct %s" % (_this_file))
+    esm.Start()
+    SConscript('memprofile/SConscript')
+
+
+def test_scopes():
+    tracemalloc.start()
+    try:
+        profile = esm.MemoryProfile()
+        profile.enter('sconscript', 'top/SConscript')
+        outer = [bytearray(1024) for _ in range(64)]
+        profile.enter('tool', 'inner')
+        inner = [bytearray(1024) for _ in range(128)]
+        esp.counters.nodes += 3
+        profile.exit()
+        profile.exit()
+    finally:
+        tracemalloc.stop()
+    top = profile.totals[('sconscript', 'top')]
+    tool = profile.totals[('tool', 'inner')]
+    assert tool.inclusive == tool.exclusive >= 128 * 1024
+    assert top.inclusive >= 192 * 1024
+    assert 64 * 1024 <= top.exclusive < tool.exclusive
+    assert top.nodes == 3 and top.exclusive_nodes == 0
+    del outer, inner
+
+
+def test_memprofile_report():
+    task = conftest.run_scons(_this_file)
+    lines = task.stdout.splitlines()
+    assert any(line.startswith("eol_scons memory profile: peak")
+               for line in lines)
+    scopes = {line.split()[-1]: line.split() for line in lines
+              if " sconscript " in line or " tool " in line}
+    assert int(scopes['memprofile'][4]) == 100
+    assert 'symlink' in scopes
+    assert "top allocation sites still in use:" in lines
@@ -0,0 +1,53 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+from pathlib import Path
+import shutil
+import subprocess as sp
+
+import eol_scons
+from SCons.Script import Environment
+
+import pytest
+import conftest
+
+
+_this_file = "test_pch.py"
+
+
+# SConstruct file begins here
+if not conftest.called_from_test:
+    print("Executing SConstruct %s" % (_this_file))
+    env = Environment(tools=['default', 'gcc'])
+    env.Append(CXXFLAGS=['-std=c++11'])
+    env.PrecompiledHeader('pchtest/common.h')
+    # -H lists the headers used, showing whether the .gch was used.
+    env.Program('pchtest/pch_hello',
+                ['pchtest/main.cc', 'pchtest/greeting.cc'],
+                CXXFLAGS=env['CXXFLAGS'] + ['-H'])
+
+
+pytestmark = pytest.mark.skipif(not shutil.which('g++'),
+                                reason="requires g++")
+
+
+@pytest.fixture(scope="module")
+def pch_tasks():
+    shutil.rmtree('build/pch', ignore_errors=True)
+    first = conftest.run_scons(_this_file)
+    second = conftest.run_scons(_this_file)
+    return first, second
+
+
+def test_precompiled_header(pch_tasks):
+    first, second = pch_tasks
+    gch = list(Path('build/pch').glob('*/common.h.gch'))
+    assert len(gch) == 1
+    assert "Precompiling" in first.stdout
+    # both objects used the precompiled header
+    assert first.stdout.count("! ./%s" % (gch[0])) == 2
+    assert "Precompiling" not in second.stdout
+    output = sp.run(['pchtest/pch_hello'], stdout=sp.PIPE,
+                    universal_newlines=True).stdout
+    assert output.strip() == "hello world"
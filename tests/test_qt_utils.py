@@ -18,3 +18,112 @@ def test_replace_drive():
     qtu.replace_drive_specs(l1)
     assert l1 == ["/c/a", "/c/b", c, u, "/c"]
     assert l2 == l1
+
+
+def _write_pc(pcdir, name, requires=""):
+    module = name[3:].lower()
+    pcdir.join(name + ".pc").write(
+        "prefix=/opt/qt6\n"
+        "includedir=${prefix}/include\n"
+        "Name: %s\nDescription: test\nVersion: 6.5.0\n"
+        "Requires: %s\n"
+        "Libs: -L${prefix}/lib -l%s\n"
+        "Cflags: -DQT_%s_LIB -I${includedir}/Qt%s -I${includedir}\n" %
+        (name, requires, name, module.upper(), name[3:]))
+
+
+def test_pkgconfig_modules_batched(tmpdir, monkeypatch):
+    import subprocess as sp
+    import eol_scons.parseconfig as pc
+    import eol_scons.tools.qt6 as qt6
+    from SCons.Script import Environment as SConsEnvironment
+
+    pcdir = tmpdir.mkdir("pkgconfig")
+    _write_pc(pcdir, "Qt6Core")
+    _write_pc(pcdir, "Qt6Gui", "Qt6Core")
+    _write_pc(pcdir, "Qt6Widgets", "Qt6Gui")
+    _write_pc(pcdir, "Qt6Network", "Qt6Core")
+
+    calls = []
+    popen = sp.Popen
+
+    def counting_popen(cmd, *args, **kw):
+        if '--cflags' in cmd:
+            calls.append(cmd)
+        return popen(cmd, *args, **kw)
+
+    monkeypatch.setattr(sp, 'Popen', counting_popen)
+    monkeypatch.setattr(pc, '_cache', {})
+    monkeypatch.setattr(qtu, '_parsed_flags', {})
+
+    def make_env():
+        env = SConsEnvironment(tools=['default'], QT6DIR=qt6.USE_PKG_CONFIG)
+        env['ENV']['PKG_CONFIG_PATH'] = str(pcdir)
+        return env
+
+    modules = ['QtGui', 'QtWidgets', 'QtNetwork']
+    env = make_env()
+    qt6.enable_modules(env, modules)
+    assert len(calls) == 1
+    assert calls[0][-3:] == ['Qt6Gui', 'Qt6Widgets', 'Qt6Network']
+    assert set(env['LIBS']) == set(['Qt6Gui', 'Qt6Widgets', 'Qt6Network',
+                                    'Qt6Core'])
+    assert '/opt/qt6/include/QtWidgets' in env['CPPPATH']
+    assert 'QT_WIDGETS_LIB' in env['CPPDEFINES']
+    assert '-I/opt/qt6/include' in env['QT6_MOCFROMHFLAGS']
+
+    # The same module set in another environment is not run again.
+    env2 = make_env()
+    qt6.enable_modules(env2, modules)
+    assert len(calls) == 1
+    assert env2['LIBS'] == env['LIBS']
+    assert env2['CPPPATH'] == env['CPPPATH']
+
+    # If a module is missing, each module is enabled separately.
+    env3 = make_env()
+    qt6.enable_modules(env3, ['QtGui', 'QtMissing'])
+    assert 'Qt6Gui' in env3['LIBS']
+    assert 'Qt6Missing' in env3['LIBS']
+
+
+def test_mocs_compilation(tmpdir):
+    env = Environment(tools=['default'], CXXFILESUFFIX='.cpp')
+    build = env.Dir(str(tmpdir))
+    mocs = [build.File("moc_%s.cpp" % (name)) for name in "abc"]
+    target = [build.File("app")]
+    objects = qtu.mocs_compilation(env, env.StaticObject, target, mocs, 2)
+    assert [str(obj.sources[0].name) for obj in objects] == [
+        "app_mocs_compilation_0.cpp", "app_mocs_compilation_1.cpp"]
+    unit = objects[0].sources[0]
+    text = unit.sources[0].read()
+    assert '#include "moc_a.cpp"\n#include "moc_b.cpp"\n' in text
+    assert 'moc_c.cpp' not in text
+    assert mocs[2] in objects[1].depends
+
+
+def test_append_emitters():
+    def unity(target, source, env):
+        return target, source
+    unity.runs_last = True
+
+    def automoc(target, source, env):
+        return target, source
+
+    env = Environment(tools=['default'], PROGEMITTER=[unity])
+    qtu.append_emitters(env, PROGEMITTER=automoc, LIBEMITTER=automoc)
+    qtu.append_emitters(env, PROGEMITTER=automoc)
+    assert env['PROGEMITTER'] == [automoc, unity]
+    assert env['LIBEMITTER'] == [automoc]
+
+
+def test_mocs_compilation_shared_and_static(tmpdir):
+    env = Environment(tools=['default'], CXXFILESUFFIX='.cpp')
+    build = env.Dir(str(tmpdir))
+    mocs = [build.File("moc_%s.cpp" % (name)) for name in "ab"]
+    static = qtu.mocs_compilation(env, env.StaticObject,
+                                  [build.File("libfoo.a")], mocs, 2)
+    shared = qtu.mocs_compilation(env, env.SharedObject,
+                                  [build.File("libfoo.so")], mocs, 2,
+                                  shared=True)
+    assert static[0].sources[0].name == "libfoo_mocs_compilation_0.cpp"
+    assert shared[0].sources[0].name == "libfoo_shared_mocs_compilation_0.cpp"
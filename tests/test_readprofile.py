@@ -0,0 +1,68 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+from pathlib import Path
+
+import eol_scons
+from SCons.Script import SConscript
+
+import conftest
+
+import eol_scons.profiling as esp
+import eol_scons.readprofile as esr
+
+
+_this_file = "test_readprofile.py"
+
+
+# SConstruct file begins here
+if not conftest.called_from_test:
+    print("Executing SConstruct %s" % (_this_file))
+    esr.readprofile = 'readprofile/profile'
+    esr.Start()
+    SConscript('readprofile/SConscript')
+
+
+def test_read_profile():
+    for output in Path('readprofile').glob('profile.*'):
+        output.unlink()
+    task = conftest.run_scons(_this_file)
+    assert "eol_scons read profile:" in task.stdout
+
+    lines = Path('readprofile/profile.tsv').read_text().splitlines()
+    header = lines[0].split('\t')
+    rows = {(row[0], row[1]): dict(zip(header, row)) for row in
+            (line.split('\t') for line in lines[1:])}
+    top = rows[('sconscript', 'readprofile/SConscript')]
+    sub = rows[('sconscript', 'readprofile/sub/SConscript')]
+    assert float(sub['exclusive']) >= 0.2
+    assert float(top['inclusive']) >= float(sub['inclusive'])
+    assert float(top['exclusive']) < float(sub['exclusive'])
+    assert (top['environments'], top['clones']) == ('1', '1')
+    assert sub['environments'] == '1'
+    assert int(sub['nodes']) >= 10
+    assert ('tool', 'symlink') in rows
+
+    stacks = dict(line.rsplit(' ', 1) for line in
+                  Path('readprofile/profile.collapsed').read_text()
+                  .splitlines())
+    assert int(stacks['readprofile/SConscript;readprofile/sub/SConscript']) \
+        >= 200000
+    assert 'readprofile/SConscript;readprofile/sub/SConscript;tool:symlink' \
+        in stacks
+
+
+def test_profiler_added_inside_scope(monkeypatch):
+    outer = esr.ReadProfile()
+    monkeypatch.setattr(esp, '_profilers', [outer])
+    with esp.Scope('sconscript', 'SConstruct'):
+        # a profiler started by a SConscript file only sees the scopes
+        # which start after it.
+        inner = esr.ReadProfile()
+        esp._profilers.append(inner)
+        with esp.Scope('sconscript', 'sub/SConscript'):
+            pass
+    assert sorted(outer.times) == [('sconscript', 'SConstruct'),
+                                   ('sconscript', 'sub/SConscript')]
+    assert sorted(inner.times) == [('sconscript', 'sub/SConscript')]
@@ -0,0 +1,51 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+
+import os
+
+from SCons.Environment import Environment
+
+import eol_scons.tools.staticlink as staticlink
+
+
+def test_static_library_cached(tmp_path, monkeypatch):
+    libdir = tmp_path / "lib"
+    libdir.mkdir()
+    (libdir / "liblzma.a").write_bytes(b"!<arch>\n")
+    env = Environment(tools=['default'], LIBPATH=[str(libdir)],
+                      LIBS=['lzma', 'm'])
+    staticlink.generate(env)
+    env.StaticLink('lzma')
+    archive = os.path.join(str(libdir), "liblzma.a")
+    assert env.subst("$_LIBFLAGS").split() == [archive, '-lm']
+
+    calls = []
+    findfile = env.FindFile
+
+    def counting_findfile(*args, **kw):
+        calls.append(args)
+        return findfile(*args, **kw)
+
+    monkeypatch.setattr(env, 'FindFile', counting_findfile, raising=False)
+    clone = env.Clone()
+    monkeypatch.setattr(clone, 'FindFile', counting_findfile, raising=False)
+    assert env.subst("$_LIBFLAGS").split() == [archive, '-lm']
+    assert clone.subst("$_LIBFLAGS").split() == [archive, '-lm']
+    assert calls == []
+
+    # A different library list is rewritten again, but the archive lookup
+    # is still cached.
+    clone.Append(LIBS=['z'])
+    assert clone.subst("$_LIBFLAGS").split() == [archive, '-lm', '-lz']
+    assert calls == []
+
+    # Changing the search path invalidates the cache.
+    otherdir = tmp_path / "other"
+    otherdir.mkdir()
+    (otherdir / "liblzma.a").write_bytes(b"!<arch>\n")
+    clone.Prepend(LIBPATH=[str(otherdir)])
+    assert clone.subst("$_LIBFLAGS").split() == [
+        os.path.join(str(otherdir), "liblzma.a"), '-lm', '-lz']
+    assert len(calls) == 1
@@ -0,0 +1,113 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from SCons.Environment import Environment
+
+import eol_scons.tools.svninfo as svninfo
+
+
+_info_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<info>
+<entry kind="dir" path="{wd}" revision="120">
+<url>https://svn.example.com/repo/trunk</url>
+<wc-info><wcroot-abspath>{wd}</wcroot-abspath>
+<schedule>normal</schedule><depth>infinity</depth></wc-info>
+<commit revision="118"><date>2014-12-03T20:45:13.123456Z</date></commit>
+</entry>
+<entry kind="file" path="{wd}/a.c" revision="115">
+<url>https://svn.example.com/repo/trunk/a.c</url>
+<wc-info><wcroot-abspath>{wd}</wcroot-abspath>
+<schedule>normal</schedule></wc-info>
+</entry>
+<entry kind="file" path="{wd}/new.c" revision="0">
+<url>https://svn.example.com/repo/trunk/new.c</url>
+<wc-info><wcroot-abspath>{wd}</wcroot-abspath>
+<schedule>add</schedule></wc-info>
+</entry>
+<entry kind="dir" path="{wd}/ext" revision="45">
+<url>https://svn.example.com/other/branches/b1</url>
+<wc-info><wcroot-abspath>{wd}/ext</wcroot-abspath>
+<schedule>normal</schedule><depth>infinity</depth></wc-info>
+</entry>
+<entry kind="dir" path="{wd}/ext/sub" revision="45">
+<url>https://svn.example.com/other/branches/b2/sub</url>
+<wc-info><wcroot-abspath>{wd}/ext</wcroot-abspath>
+<schedule>normal</schedule><depth>files</depth></wc-info>
+</entry>
+</info>
+"""
+
+_status_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<status>
+<target path="{wd}">
+<entry path="{wd}/a.c"><wc-status item="modified" props="none"/></entry>
+<entry path="{wd}/ext"><wc-status item="external" props="none"/></entry>
+</target>
+<target path="{wd}/ext">
+</target>
+</status>
+"""
+
+
+@pytest.fixture
+def fakesvn(tmpdir):
+    "Create a working copy and an svn script which prints the fixtures."
+    wd = tmpdir.mkdir('wc')
+    wd.mkdir('.svn').join('wc.db').write('')
+    wd.mkdir('ext').mkdir('.svn').join('wc.db').write('')
+    tmpdir.join('info.xml').write(_info_xml.format(wd=wd))
+    tmpdir.join('status.xml').write(_status_xml.format(wd=wd))
+    svn = tmpdir.join('svn')
+    svn.write(f"""#! /bin/sh
+echo "$1" >> {tmpdir}/calls
+exec cat {tmpdir}/$1.xml
+""")
+    svn.chmod(0o755)
+    return str(svn), str(wd), tmpdir
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="uses a shell script")
+def test_svninfo_xml(fakesvn):
+    svn, wd, tmpdir = fakesvn
+    env = Environment(tools=[], SVN=svn, SVNVERSION='/bin/false')
+    sinfo = svninfo.SubversionInfo(env, wd).loadInfo()
+    assert sinfo.values['SVNREVISION'] == '115:120M'
+    assert sinfo.values['SVNEXTERNALREVS'] == 'ext:45SP'
+    assert sinfo.values['SVNURL'] == 'URL: https://svn.example.com/repo/trunk'
+    assert sinfo.values['SVNLASTCHANGEDDATE'].startswith(
+        'Last Changed Date: 2014-12-0')
+    assert sinfo.values['SVNWORKDIR'] == wd
+    assert tmpdir.join('calls').read().split() == ['info', 'status']
+
+    # the info is cached until a wc.db changes
+    sinfo = svninfo.SubversionInfo(env, wd).loadInfo()
+    assert sinfo.values['SVNREVISION'] == '115:120M'
+    assert tmpdir.join('calls').read().split() == ['info', 'status',
+                                                   'status']
+    dbpath = Path(wd, 'ext', '.svn', 'wc.db')
+    stat = dbpath.stat()
+    os.utime(dbpath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+    sinfo = svninfo.SubversionInfo(env, wd).loadInfo()
+    assert tmpdir.join('calls').read().split()[-2:] == ['info', 'status']
+
+
+def test_iter_xml_large_stderr(fakesvn):
+    svn, wd, tmpdir = fakesvn
+    env = Environment(tools=[], SVN=svn, SVNVERSION='/bin/false')
+    sinfo = svninfo.SubversionInfo(env, wd)
+    # more warnings than fit in a pipe, written before any output
+    script = ("import sys; sys.stderr.write('warning\\n' * 200000); "
+              "sys.stderr.flush(); print('<info><entry path=\"x\"/></info>')")
+    events = list(sinfo._iter_xml([sys.executable, '-c', script]))
+    assert [event for event, _ in events] == ['start', 'start', 'end', 'end']
+    with pytest.raises(OSError, match="failed: oops"):
+        list(sinfo._iter_xml([sys.executable, '-c',
+                              "import sys; print('<info/>'); "
+                              "sys.exit('oops')"]))
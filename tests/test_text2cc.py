@@ -2,6 +2,11 @@
 #
 # This source code is licensed under the MIT license found in the LICENSE
 # file in the root directory of this source tree.
+import io
+import shutil
+import subprocess as sp
+
+import pytest
 
 import eol_scons.tools.text2cc as t2c
 
@@ -25,3 +30,57 @@ def test_text2cc():
     code = t2c.text2cc(_example, "EXAMPLE")
     print(code)
     assert code == _code
+
+
+def test_bytes2cc():
+    code = io.StringIO()
+    t2c.bytes2cc(io.BytesIO(bytes(range(20))), code, "EXAMPLE", block_size=8)
+    assert code.getvalue() == (
+        "/***** DO NOT EDIT *****/\n"
+        "static const unsigned char EXAMPLE_bytes[] = {\n"
+        "0x00,0x01,0x02,0x03,0x04,0x05,0x06,0x07,\n"
+        "0x08,0x09,0x0a,0x0b,0x0c,0x0d,0x0e,0x0f,\n"
+        "0x10,0x11,0x12,0x13,\n"
+        "0 };\n"
+        "const char* EXAMPLE = reinterpret_cast<const char*>(EXAMPLE_bytes);\n")
+
+
+def test_incbin2cc(tmp_path):
+    data = tmp_path / 'data.txt'
+    data.write_text(_example)
+    code = t2c.incbin2cc(str(data), "EXAMPLE")
+    assert '".incbin \\"%s\\"\\n"' % (data) in code
+    assert "const char* EXAMPLE = eol_scons_text2cc_EXAMPLE;" in code
+    # the code changes when the file does, so it will be compiled again.
+    data.write_text(_example + "third line\n")
+    assert t2c.incbin2cc(str(data), "EXAMPLE") != code
+
+
+_main = """
+#include <cstring>
+extern const char* STRING;
+extern const char* BYTES;
+extern const char* INCBIN;
+const char* EXPECTED = "%s";
+int main()
+{
+    return std::strcmp(STRING, EXPECTED) || std::strcmp(BYTES, EXPECTED) ||
+        std::strcmp(INCBIN, EXPECTED);
+}
+"""
+
+
+@pytest.mark.skipif(not shutil.which('g++'), reason="g++ is not installed")
+def test_compile_formats(tmp_path):
+    data = tmp_path / 'data.txt'
+    data.write_text(_example)
+    (tmp_path / 'string.cc').write_text(t2c.text2cc(_example, "STRING"))
+    with open(data, 'rb') as infile:
+        with open(tmp_path / 'bytes.cc', 'w') as outfile:
+            t2c.bytes2cc(infile, outfile, "BYTES")
+    (tmp_path / 'incbin.cc').write_text(t2c.incbin2cc(str(data), "INCBIN"))
+    (tmp_path / 'main.cc').write_text(
+        _main % (_example.replace('"', '\\"').replace('\n', '\\n')))
+    sp.run(['g++', '-o', 'embed', 'main.cc', 'string.cc', 'bytes.cc',
+            'incbin.cc'], cwd=str(tmp_path), check=True)
+    sp.run([str(tmp_path / 'embed')], check=True)
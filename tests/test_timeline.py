@@ -0,0 +1,48 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+import json
+from pathlib import Path
+
+import eol_scons
+from SCons.Script import Environment, ARGUMENTS
+
+import conftest
+
+
+_this_file = "test_timeline.py"
+
+
+# SConstruct file begins here
+if not conftest.called_from_test:
+    print("Executing SConstruct %s" % (_this_file))
+    ARGUMENTS['TIMELINE'] = 'timeline/trace.json'
+    env = Environment(tools=['default', 'timeline'])
+    env.SetOption('num_jobs', 2)
+    sleep = 'sleep %s && cat $SOURCES > $TARGET && echo $TARGET >> $TARGET'
+    env.Command('timeline/a.txt', _this_file, sleep % 0.3)
+    env.Command('timeline/b.txt', 'timeline/a.txt', sleep % 0.3)
+    env.Command('timeline/c.txt', 'timeline/b.txt', sleep % 0.1)
+    env.Command('timeline/d.txt', _this_file, sleep % 0.2)
+
+
+def test_timeline():
+    for built in Path('timeline').glob('*'):
+        built.unlink()
+    task = conftest.run_scons(_this_file)
+    assert "timeline: wrote 4 commands" in task.stdout
+    trace = json.loads(Path('timeline/trace.json').read_text())
+    events = {event['name']: event for event in trace['traceEvents']}
+    assert sorted(events) == ['timeline/%s.txt' % (t) for t in 'abcd']
+    for event in events.values():
+        assert event['ph'] == 'X'
+        assert event['args']['status'] == 0
+        assert event['args']['max_rss_kb'] > 0
+        assert event['tid'] in (0, 1)
+    assert events['timeline/b.txt']['ts'] >= \
+        events['timeline/a.txt']['ts'] + events['timeline/a.txt']['dur']
+    assert trace['otherData']['critical_path'] == [
+        'timeline/a.txt', 'timeline/b.txt', 'timeline/c.txt']
+    assert trace['otherData']['critical_path_seconds'] >= 0.7
+    assert "critical path" in task.stdout
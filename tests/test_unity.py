@@ -0,0 +1,89 @@
+# Copyright (c) 2007-present, NSF NCAR, UCAR
+#
+# This source code is licensed under the MIT license found in the LICENSE
+# file in the root directory of this source tree.
+from pathlib import Path
+import shutil
+import subprocess as sp
+
+import eol_scons
+import eol_scons.tools.unity as unity
+from SCons.Script import Environment
+
+import pytest
+import conftest
+
+
+_this_file = "test_unity.py"
+
+
+# SConstruct file begins here
+if not conftest.called_from_test:
+    print("Executing SConstruct %s" % (_this_file))
+    env = Environment(tools=['default', 'unity'], UNITY_SIZE=2)
+    env.Append(UNITY_EXCLUDE=['three.cpp'])
+    sources = ['unity/main.cpp', 'unity/one.cpp', 'unity/two.cpp',
+               'unity/three.cpp']
+    env.Program('unity/unity_hello', sources)
+    # a static and a shared library with the same name get their own units
+    env.StaticLibrary('unity/hello', ['unity/one.cpp', 'unity/two.cpp'])
+    env.SharedLibrary('unity/hello', ['unity/one.cpp', 'unity/two.cpp'])
+
+
+pytestmark = pytest.mark.skipif(not shutil.which('g++'),
+                                reason="requires a C++ compiler")
+
+
+@pytest.fixture(scope="module")
+def unity_tasks():
+    for pattern in ['*.o', '*.os', 'libhello.*']:
+        for built in Path('unity').glob(pattern):
+            built.unlink()
+    first = conftest.run_scons(_this_file)
+    second = conftest.run_scons(_this_file)
+    return first, second
+
+
+def test_unity(unity_tasks):
+    first, second = unity_tasks
+    unit = Path('unity/unity_hello_unity_0.cpp')
+    assert unit.read_text().splitlines()[1:] == [
+        '#include "main.cpp"', '#include "one.cpp"']
+    assert Path('unity/unity_hello_unity_0.o').exists()
+    # two.cpp is left alone in its group after three.cpp is excluded
+    assert Path('unity/two.o').exists()
+    assert Path('unity/three.o').exists()
+    # the replaced objects are not built
+    assert not Path('unity/main.o').exists()
+    assert not Path('unity/one.o').exists()
+    output = sp.run(['unity/unity_hello'], stdout=sp.PIPE,
+                    universal_newlines=True).stdout
+    assert output.strip() == "6"
+    assert "unity_hello_unity_0" in first.stdout
+    assert "unity_hello_unity_0" not in second.stdout
+
+
+def test_unity_libraries(unity_tasks):
+    assert Path('unity/libhello_unity_0.o').exists()
+    assert Path('unity/libhello_shared_unity_0.os').exists()
+    assert Path('unity/libhello.a').exists()
+    assert Path('unity/libhello.so').exists()
+
+
+def test_adaptive_units_keep_their_slots(monkeypatch):
+    env = Environment(tools=['default', 'unity'])
+    env['UNITY_SIZE'] = 2
+    objects = env.Object(['unity/two.cpp', 'unity/one.cpp',
+                          'unity/three.cpp', 'unity/main.cpp'])
+    target = [env.File('unity/slots')]
+    one = env.File('unity/one.cpp').get_abspath()
+    monkeypatch.setitem(unity._modified, env.Dir('#').get_abspath(), {one})
+    _, sources = unity.UnityEmitter(target, objects, env)
+    names = sorted(obj.sources[0].name for obj in sources)
+    # one.cpp is taken out of the first unit, which leaves main.cpp alone,
+    # and the second unit keeps its number and its sources.
+    assert names == ['main.cpp', 'one.cpp', 'slots_unity_1.cpp']
+    unit = [obj for obj in sources
+            if obj.sources[0].name == 'slots_unity_1.cpp'][0]
+    assert unit.sources[0].sources[0].read().splitlines()[1:] == [
+        '#include "three.cpp"', '#include "two.cpp"']
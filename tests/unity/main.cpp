@@ -0,0 +1,12 @@
+#include <iostream>
+
+int one();
+int two();
+int three();
+
+int
+main()
+{
+    std::cout << one() + two() + three() << std::endl;
+    return 0;
+}
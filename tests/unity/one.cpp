@@ -0,0 +1,6 @@
+namespace
+{
+    int value() { return 1; }
+}
+
+int one() { return value(); }
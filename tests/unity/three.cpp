@@ -0,0 +1,5 @@
+// This defines the same static function as two.cpp, so it cannot be
+// compiled in the same unity source.
+static int twice(int x) { return x + x; }
+
+int three() { return twice(1) + 1; }